@@ -0,0 +1,188 @@
+"""
+Benchmark runner for semsql views and ontlib APIs
+
+Times every view in sql_schema/semsql.sql, extract_subgraph for each traversal
+direction, term_search and edges_to_obograph, against synthetic dbs at several
+scales, and writes the results as JSON.
+
+Example:
+
+    python benchmarks/run.py --scale 1e4 --scale 1e5 -o results.json
+"""
+import json
+import logging
+import platform
+import random
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import click
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from semsql.builder.synthetic import DDL, SyntheticConfig, generate_db
+from semsql.ontlib.common_queries import term_search
+from semsql.ontlib.subgraph import TRAVERSAL_VIEWS, edges_to_obograph, extract_subgraph
+from semsql.sqla.semsql import RdfsLabelStatement
+
+NUM_SEEDS = 10
+
+
+def view_names() -> List[str]:
+    """
+    :return: names of all views in the semsql DDL
+    """
+    return re.findall(r"^CREATE VIEW (\w+)", DDL.read_text(), re.M)
+
+
+def _result(scale: int, kind: str, name: str, fn: Callable[[], int]) -> Dict:
+    start = time.perf_counter()
+    result = {"scale": scale, "benchmark": kind, "name": name}
+    try:
+        result["rows"] = fn()
+        result["status"] = "ok"
+    except sqlite3.OperationalError as e:
+        result["status"] = "timeout" if "interrupted" in str(e) else "error"
+        result["error"] = str(e)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    logging.info(f"{kind} {name} @ {scale}: {result['status']} {result['seconds']:.3f}s")
+    return result
+
+
+def bench_views(db: str, scale: int, timeout: float, only: List[str] = None) -> List[Dict]:
+    """
+    Time fetching all rows of each view
+
+    :param db:
+    :param scale:
+    :param timeout: seconds per view; slower views are interrupted
+    :param only: restrict to these views
+    :return:
+    """
+    con = sqlite3.connect(db)
+    results = []
+    for view in view_names():
+        if only and view not in only:
+            continue
+        deadline = time.monotonic() + timeout
+        con.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+
+        def run():
+            n = 0
+            for _ in con.execute(f"SELECT * FROM {view}"):
+                n += 1
+            return n
+
+        results.append(_result(scale, "view", view, run))
+    con.close()
+    return results
+
+
+def bench_ontlib(db: str, scale: int, seed: int = 42) -> List[Dict]:
+    """
+    Time extract_subgraph in each direction, term_search and edges_to_obograph
+
+    :param db:
+    :param scale:
+    :param seed: for choosing seed terms
+    :return:
+    """
+    engine = create_engine(f"sqlite:///{db}")
+    session = sessionmaker(bind=engine)()
+    rng = random.Random(seed)
+    con = sqlite3.connect(db)
+    ids = [r[0] for r in con.execute("SELECT id FROM class_node ORDER BY id")]
+    terms = rng.sample(ids, min(NUM_SEEDS, len(ids)))
+    labels = [
+        r[0]
+        for t in terms
+        for r in con.execute("SELECT value FROM rdfs_label_statement WHERE subject=?", (t,))
+    ]
+    con.close()
+    results = []
+    edges = {}
+    for direction, view in TRAVERSAL_VIEWS.items():
+
+        def run():
+            edges[direction] = list(extract_subgraph(session, terms, view=view))
+            return len(edges[direction])
+
+        results.append(_result(scale, "extract_subgraph", direction, run))
+    results.append(
+        _result(scale, "term_search", "exact", lambda: len(term_search(session, labels, RdfsLabelStatement)))
+    )
+    results.append(
+        _result(scale, "term_search", "like", lambda: len(term_search(session, ["cell %"], RdfsLabelStatement)))
+    )
+    for direction in ["up", "updown"]:
+        results.append(
+            _result(
+                scale,
+                "edges_to_obograph",
+                direction,
+                lambda: len(edges_to_obograph(session, edges.get(direction, []), definitions=True)["nodes"]),
+            )
+        )
+    session.close()
+    return results
+
+
+@click.command()
+@click.option("--scale", "-s", multiple=True, default=["1e4"], show_default=True, help="Number of statements")
+@click.option("--output", "-o", type=click.File("w"), default="-", help="JSON output")
+@click.option("--directory", "-d", default="benchmarks/dbs", show_default=True, help="Where to cache generated dbs")
+@click.option("--timeout", default=60.0, show_default=True, help="Seconds per view")
+@click.option("--view", "-V", multiple=True, help="Only benchmark these views")
+@click.option("--skip-views/--no-skip-views", default=False, show_default=True)
+@click.option("-v", "--verbose", count=True)
+def main(scale, output, directory, timeout, view, skip_views, verbose):
+    """
+    Run benchmarks at one or more scales
+    """
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    try:
+        semsql_version = version("semsql")
+    except PackageNotFoundError:
+        semsql_version = None
+    report = {
+        "semsql_version": semsql_version,
+        "sqlite_version": sqlite3.sqlite_version,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "results": [],
+    }
+    for s in scale:
+        n = int(float(s))
+        db = Path(directory) / f"synthetic-{n}.db"
+        if not db.exists():
+            start = time.perf_counter()
+            generate_db(str(db), SyntheticConfig.for_statements(n))
+            report["results"].append(
+                {
+                    "scale": n,
+                    "benchmark": "generate",
+                    "name": "generate",
+                    "status": "ok",
+                    "seconds": time.perf_counter() - start,
+                }
+            )
+        if not skip_views:
+            report["results"] += bench_views(str(db), n, timeout, list(view))
+        report["results"] += bench_ontlib(str(db), n)
+    json.dump(report, output, indent=2)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
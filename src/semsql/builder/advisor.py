@@ -0,0 +1,445 @@
+"""
+Query-plan driven index advisor
+
+The workload is every view in a db, probed with lookups on its subject, object
+and value columns, plus any queries from a user-supplied log. Each query is run
+through ``EXPLAIN QUERY PLAN`` and the plan is costed with a simple nested-loop
+model, using row estimates from ``sqlite_stat1``:
+
+- a full scan of a table costs the number of rows in the table
+- an index search costs the estimated rows per key for the number of
+  equality constraints used
+- a temp b-tree (for ORDER BY, DISTINCT, UNION) costs n log n of its input
+- the cost of an inner loop is multiplied by the rows produced by outer loops
+
+Candidate indexes are built from the columns constrained in the workload
+(including the view definitions). Each candidate is tried inside a savepoint:
+it is created and analyzed, timing the build, and the workload is re-costed.
+Indexes are chosen greedily by estimated benefit; the db is left unchanged
+unless the chosen indexes are applied.
+"""
+import itertools
+import logging
+import math
+import re
+import sqlite3
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+PROBE_COLUMNS = ["subject", "object", "value"]
+PROBE_VALUE = "'x'"
+
+# SQLite's own assumption when there are no statistics for an index
+DEFAULT_ROWS_PER_KEY = 10
+
+IDENTIFIER = r"[A-Za-z_][A-Za-z0-9_]*"
+ALIAS_PATTERN = re.compile(
+    rf"\b(?:FROM|JOIN)\s+({IDENTIFIER})(?:\s+AS)?\s+({IDENTIFIER})|,\s*({IDENTIFIER})\s+AS\s+({IDENTIFIER})",
+    re.I,
+)
+LHS_PATTERN = re.compile(rf"(?:({IDENTIFIER})\.)?({IDENTIFIER})\s*(?:=|\bIN\b|\bIS\b)", re.I)
+RHS_PATTERN = re.compile(rf"=\s*(?:({IDENTIFIER})\.)?({IDENTIFIER})\b(?!\s*\()", re.I)
+DETAIL_PATTERN = re.compile(r"^(SCAN|SEARCH) (\S+)(?: AS \S+)?(.*)$")
+
+
+@dataclass
+class PlanIssue:
+    """
+    A potentially expensive step in the plan for a query
+    """
+
+    query: str
+    detail: str
+    """e.g. SCAN statements, or USE TEMP B-TREE FOR ORDER BY"""
+
+
+@dataclass
+class IndexProposal:
+    """
+    A proposed index, with its estimated benefit and measured cost
+    """
+
+    table: str
+    columns: Tuple[str, ...]
+    benefit: float
+    """reduction in estimated cost of the workload, as a fraction of the current cost"""
+    build_seconds: float
+    queries_improved: int = 0
+
+    @property
+    def name(self) -> str:
+        return f"{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def ddl(self) -> str:
+        return f"CREATE INDEX {self.name} ON {self.table}({','.join(self.columns)});"
+
+
+def read_query_log(path: str) -> List[str]:
+    """
+    Read SQL statements from a file, one or more lines per statement
+
+    :param path:
+    :return: statements, without trailing semicolons
+    """
+    queries = []
+    buf = ""
+    with open(path) as stream:
+        for line in stream:
+            if not buf and (not line.strip() or line.strip().startswith("--")):
+                continue
+            buf += line
+            if sqlite3.complete_statement(buf):
+                queries.append(buf.strip().rstrip(";"))
+                buf = ""
+    if buf.strip():
+        queries.append(buf.strip().rstrip(";"))
+    return queries
+
+
+def view_probes(con: sqlite3.Connection) -> List[str]:
+    """
+    Generate queries that look up each view by subject, object and value
+
+    :param con:
+    :return:
+    """
+    queries = []
+    views = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='view' ORDER BY name")]
+    for view in views:
+        try:
+            cols = [r[1] for r in con.execute(f"PRAGMA table_info({view})")]
+        except sqlite3.DatabaseError as e:
+            logging.warning(f"Skipping view {view}: {e}")
+            continue
+        queries.append(f"SELECT * FROM {view}")
+        for col in PROBE_COLUMNS:
+            if col in cols:
+                queries.append(f"SELECT * FROM {view} WHERE {col}={PROBE_VALUE}")
+    return queries
+
+
+class IndexAdvisor:
+    """
+    Proposes indexes for a db and workload
+    """
+
+    def __init__(self, con: sqlite3.Connection, queries: List[str]):
+        """
+        :param con: connection, in autocommit mode (isolation_level=None)
+        :param queries: workload
+        """
+        self.con = con
+        self.queries = queries
+        self.tables = {
+            r[0]
+            for r in con.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+        }
+        self.views = {
+            r[0]: r[1] for r in con.execute("SELECT name, sql FROM sqlite_master WHERE type='view'")
+        }
+        self.columns = {t: [r[1] for r in con.execute(f"PRAGMA table_info({t})")] for t in self.tables}
+        self._table_rows = {}
+        self._index_stats = {}
+        self._index_tables = {}
+        self._aliases = {}
+
+    # -- costing
+
+    def _load_stats(self):
+        self._index_stats = {}
+        self._table_rows = {}
+        self._index_tables = {
+            r[0]: r[1] for r in self.con.execute("SELECT name, tbl_name FROM sqlite_master WHERE type='index'")
+        }
+        has_stats = self.con.execute(
+            "SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'"
+        ).fetchone()
+        if has_stats:
+            for tbl, idx, stat in self.con.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+                nums = [int(x) for x in stat.split() if x.isdigit()]
+                if nums:
+                    self._table_rows[tbl] = nums[0]
+                    if idx:
+                        self._index_stats[idx] = nums
+
+    def table_rows(self, table: str) -> int:
+        if table not in self._table_rows:
+            (n,) = self.con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+            self._table_rows[table] = n
+        return self._table_rows[table]
+
+    def plan(self, query: str) -> List[Tuple[int, int, str]]:
+        """
+        :param query:
+        :return: (id, parent, detail) rows from EXPLAIN QUERY PLAN
+        """
+        return [(r[0], r[1], r[3]) for r in self.con.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+    def cost(self, query: str) -> float:
+        """
+        Estimate the cost of a query from its plan
+
+        :param query:
+        :return:
+        """
+        rows = self.plan(query)
+        children = defaultdict(list)
+        for id, parent, detail in rows:
+            children[parent].append((id, detail))
+        cost, _ = self._cost_block(children, 0, {})
+        return cost
+
+    def _cost_block(self, children, parent: int, outputs: Dict[str, float]) -> Tuple[float, float]:
+        cost = 0.0
+        m = 1.0
+        loops = False
+        for id, detail in children.get(parent, []):
+            match = DETAIL_PATTERN.match(detail)
+            if match:
+                loops = True
+                loop_cost, out = self._cost_loop(match, outputs)
+                cost += m * loop_cost
+                m *= max(out, 1.0)
+            elif detail.startswith("USE TEMP B-TREE"):
+                cost += m * math.log2(m + 1)
+            elif detail.startswith(("CO-ROUTINE", "MATERIALIZE")):
+                sub_cost, sub_rows = self._cost_block(children, id, outputs)
+                cost += sub_cost
+                outputs[detail.split(" ", 1)[1]] = sub_rows
+            elif detail.startswith("COMPOUND QUERY"):
+                total_rows = 0.0
+                for sub_id, sub_detail in children.get(id, []):
+                    sub_cost, sub_rows = self._cost_block(children, sub_id, outputs)
+                    cost += sub_cost
+                    total_rows += sub_rows
+                    if "TEMP B-TREE" in sub_detail:
+                        cost += total_rows * math.log2(total_rows + 1)
+                m *= max(total_rows, 1.0)
+                loops = True
+            else:
+                sub_cost, _ = self._cost_block(children, id, outputs)
+                cost += m * sub_cost if detail.startswith("CORRELATED") else sub_cost
+        return cost, m if loops else 0.0
+
+    def _cost_loop(self, match: re.Match, outputs: Dict[str, float]) -> Tuple[float, float]:
+        op, name, rest = match.groups()
+        index_match = re.search(r"INDEX (\S+)", rest)
+        index = index_match.group(1) if index_match else None
+        table = self._index_tables.get(index) if index else None
+        if table is None:
+            table = name if name in self.tables else None
+        if table is None:
+            if name in outputs:
+                return outputs[name], outputs[name]
+            table = self._alias_table(name)
+        n = self.table_rows(table) if table else DEFAULT_ROWS_PER_KEY
+        if op == "SCAN":
+            return float(n), float(n)
+        log_n = math.log2(n + 1)
+        if "PRIMARY KEY" in rest:
+            return log_n, 1.0
+        constraints = re.search(r"\((.*)\)\s*$", rest)
+        terms = constraints.group(1).split(" AND ") if constraints else []
+        eq = sum(1 for t in terms if re.search(r"=\?$", t) and "<" not in t and ">" not in t)
+        stats = self._index_stats.get(index)
+        if stats and 0 < eq < len(stats):
+            out = float(stats[eq])
+        else:
+            out = max(n / DEFAULT_ROWS_PER_KEY**eq, 1.0) if eq else n / 4
+        if len(terms) > eq:
+            out = max(out / 4, 1.0)
+        extra = n if "AUTOMATIC" in rest else 0.0
+        return log_n + out + extra, out
+
+    def _alias_table(self, alias: str) -> Optional[str]:
+        if not self._aliases:
+            for sql in itertools.chain(self.views.values(), self.queries):
+                for m in ALIAS_PATTERN.finditer(sql):
+                    tbl, a = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+                    if tbl in self.tables:
+                        self._aliases.setdefault(a, tbl)
+        return self._aliases.get(alias)
+
+    def workload_costs(self) -> List[float]:
+        self._load_stats()
+        costs = []
+        for q in self.queries:
+            try:
+                costs.append(self.cost(q))
+            except sqlite3.DatabaseError as e:
+                logging.warning(f"Cannot plan {q}: {e}")
+                costs.append(0.0)
+        return costs
+
+    def issues(self) -> List[PlanIssue]:
+        """
+        Find full table scans and temp b-trees in the workload
+
+        :return:
+        """
+        issues = []
+        for q in self.queries:
+            try:
+                rows = self.plan(q)
+            except sqlite3.DatabaseError:
+                continue
+            for _, _, detail in rows:
+                m = DETAIL_PATTERN.match(detail)
+                scan = m and m.group(1) == "SCAN" and "INDEX" not in m.group(3)
+                if scan and (m.group(2) in self.tables or self._alias_table(m.group(2))):
+                    issues.append(PlanIssue(q, detail))
+                elif detail.startswith("USE TEMP B-TREE") or "AUTOMATIC" in detail:
+                    issues.append(PlanIssue(q, detail))
+        return issues
+
+    # -- candidates
+
+    def _expand(self, sql: str, seen: Set[str]) -> List[str]:
+        texts = [sql]
+        for ident in set(re.findall(IDENTIFIER, sql)):
+            if ident in self.views and ident not in seen:
+                seen.add(ident)
+                texts.extend(self._expand(self.views[ident], seen))
+        return texts
+
+    def constrained_columns(self, sql: str) -> Dict[str, Set[str]]:
+        """
+        Find columns of tables that are constrained by equality or joins in a query or the views it uses
+
+        :param sql:
+        :return: columns keyed by table
+        """
+        cols = defaultdict(set)
+        for text in self._expand(sql, set()):
+            aliases = {}
+            tables_in_text = set()
+            for m in ALIAS_PATTERN.finditer(text):
+                tbl, a = (m.group(1), m.group(2)) if m.group(1) else (m.group(3), m.group(4))
+                aliases[a] = tbl
+            for ident in set(re.findall(IDENTIFIER, text)):
+                if ident in self.tables:
+                    tables_in_text.add(ident)
+            tables_in_text.update(t for t in aliases.values() if t in self.tables)
+            for pattern in (LHS_PATTERN, RHS_PATTERN):
+                for m in pattern.finditer(text):
+                    qualifier, col = m.groups()
+                    if qualifier:
+                        tbl = aliases.get(qualifier, qualifier)
+                        if tbl in self.tables and col in self.columns[tbl]:
+                            cols[tbl].add(col)
+                    else:
+                        for tbl in tables_in_text:
+                            if col in self.columns[tbl]:
+                                cols[tbl].add(col)
+        return cols
+
+    def candidates(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        Candidate indexes: single columns and ordered pairs of constrained columns,
+        excluding those already served by an existing index
+
+        :return: (table, columns) tuples
+        """
+        existing = defaultdict(list)
+        for tbl, sql in self.con.execute(
+            "SELECT tbl_name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+        ):
+            m = re.search(r"\((.*)\)", sql)
+            existing[tbl].append(tuple(c.strip() for c in m.group(1).split(",")))
+        cands = []
+        for q in self.queries:
+            for tbl, cols in self.constrained_columns(q).items():
+                for k in (1, 2):
+                    for combo in itertools.permutations(sorted(cols), k):
+                        if (tbl, combo) in cands:
+                            continue
+                        if any(ix[: len(combo)] == combo for ix in existing[tbl]):
+                            continue
+                        cands.append((tbl, combo))
+        return cands
+
+    # -- search
+
+    def advise(self, max_indexes: int = 5, min_benefit: float = 0.01) -> List[IndexProposal]:
+        """
+        Greedily choose indexes by estimated benefit
+
+        Chosen indexes are left in place in the current transaction; the caller
+        should commit to apply them or roll back
+
+        :param max_indexes:
+        :param min_benefit: minimum fractional reduction of the workload cost
+        :return: chosen indexes, in order of selection
+        """
+        baseline = self.workload_costs()
+        total = sum(baseline) or 1.0
+        candidates = self.candidates()
+        logging.info(f"Evaluating {len(candidates)} candidates over {len(self.queries)} queries")
+        chosen = []
+        while candidates and len(chosen) < max_indexes:
+            best = None
+            for tbl, cols in candidates:
+                proposal = IndexProposal(tbl, cols, 0.0, 0.0)
+                self.con.execute("SAVEPOINT candidate")
+                try:
+                    start = time.perf_counter()
+                    self.con.execute(proposal.ddl)
+                    self.con.execute(f"ANALYZE {proposal.name}")
+                    proposal.build_seconds = time.perf_counter() - start
+                    costs = self.workload_costs()
+                finally:
+                    self.con.execute("ROLLBACK TO candidate")
+                    self.con.execute("RELEASE candidate")
+                proposal.benefit = (sum(baseline) - sum(costs)) / total
+                proposal.queries_improved = sum(1 for b, c in zip(baseline, costs) if c < b * 0.99)
+                if best is None or proposal.benefit > best.benefit:
+                    best = proposal
+            if best is None or best.benefit < min_benefit:
+                break
+            self.con.execute(best.ddl)
+            self.con.execute(f"ANALYZE {best.name}")
+            chosen.append(best)
+            candidates.remove((best.table, best.columns))
+            baseline = self.workload_costs()
+        return chosen
+
+
+def advise_indexes(
+    con: sqlite3.Connection,
+    queries: Optional[Iterable[str]] = None,
+    include_views: bool = True,
+    apply: bool = False,
+    max_indexes: int = 5,
+    min_benefit: float = 0.01,
+) -> Tuple[List[IndexProposal], List[PlanIssue]]:
+    """
+    Propose, and optionally create, indexes for a db
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param queries: query log
+    :param include_views: if True, add lookups on every view to the workload
+    :param apply: if True, create the proposed indexes
+    :param max_indexes:
+    :param min_benefit: minimum fractional reduction of the workload cost
+    :return: proposals, and issues found in the current plans
+    """
+    workload = list(queries or [])
+    if include_views:
+        workload += view_probes(con)
+    con.execute("BEGIN")
+    try:
+        # statistics are needed for costing; they are kept only if applying
+        con.execute("ANALYZE")
+        advisor = IndexAdvisor(con, workload)
+        issues = advisor.issues()
+        proposals = advisor.advise(max_indexes=max_indexes, min_benefit=min_benefit)
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    con.execute("COMMIT" if apply else "ROLLBACK")
+    return proposals, issues
@@ -1,16 +1,14 @@
-import gzip
 import logging
 import os
-import shutil
 import subprocess
 from pathlib import Path
 from typing import Optional, TextIO
 
-import requests
 from linkml_runtime.loaders import yaml_loader
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from semsql.builder import download
 from semsql.builder.registry import registry_schema
 
 this_path = Path(__file__).parent
@@ -24,12 +22,18 @@ class DockerConfig:
     memory: str = None
 
 
-def make(target: str, docker_config: Optional[DockerConfig] = None):
+def make(
+    target: str,
+    docker_config: Optional[DockerConfig] = None,
+    native_closure: bool = False,
+):
     """
     Builds a target such as a SQLite file using the build.Makefile
 
     :param target: Make target
     :param docker_config: if passed, use ODK docker with the specific config
+    :param native_closure: if True, compute entailed edges in-process instead of using relation-graph
+    :return: completed make process
     """
     path_to_makefile = str(this_path / "build.Makefile")
     if docker_config is not None:
@@ -56,8 +60,10 @@ def make(target: str, docker_config: Optional[DockerConfig] = None):
     else:
         pre = []
     cmd = pre + ["make", target, "-f", path_to_makefile]
+    if native_closure:
+        cmd.append("CLOSURE=native")
     logging.info(f"CMD={cmd}")
-    subprocess.run(cmd)
+    return subprocess.run(cmd)
 
 
 def db_from_owl(input: str) -> str:
@@ -75,23 +81,17 @@ def db_from_owl(input: str) -> str:
         raise ValueError(f"Path must be an OWL file")
 
 
-def download_obo_sqlite(ontology: str, destination: str):
+def download_obo_sqlite(ontology: str, destination: str, **kwargs) -> download.DownloadResult:
     """
     Downloads pre-made SQLite file
 
+    See :func:`semsql.builder.download.download_obo_sqlite`
+
     :param ontology:
     :param destination:
     :return:
     """
-    db = f"{ontology}.db"
-    url = f"https://s3.amazonaws.com/bbop-sqlite/{db}.gz"
-    r = requests.get(url, allow_redirects=True)
-    destination_gzip = f"{destination}.gz"
-    open(destination_gzip, "wb").write(r.content)
-    with gzip.open(destination_gzip, "rb") as f_in:
-        with open(destination, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
-            os.remove(destination_gzip)
+    return download.download_obo_sqlite(ontology, destination, **kwargs)
 
 
 def connect(owl_file: str):
@@ -107,6 +107,40 @@ def connect(owl_file: str):
     session = Session()
     return session
 
+
+def load_registry(registry_path: str) -> registry_schema.Registry:
+    """
+    Load an ontology registry, such as registry/ontologies.yaml
+
+    :param registry_path:
+    :return:
+    """
+    return yaml_loader.load(registry_path, target_class=registry_schema.Registry)
+
+
+def needs_merge(ont: registry_schema.Ontology) -> bool:
+    """
+    :param ont:
+    :return: True if the ontology is fetched with robot, to merge imports or convert to RDF/XML
+    """
+    return bool(ont.has_imports or (ont.format and ont.format != 'rdfxml'))
+
+
+def download_command(ont: registry_schema.Ontology) -> str:
+    """
+    Shell command for fetching an ontology in the registry as RDF/XML
+
+    The command writes to $@, following make conventions
+
+    :param ont:
+    :return:
+    """
+    if needs_merge(ont):
+        return f"robot merge -I {ont.url} -o $@"
+    else:
+        return f"curl -L -s {ont.url} > $@.tmp && mv $@.tmp $@"
+
+
 def compile_registry(registry_path: str, local_prefix_file: TextIO = None) -> str:
     """
     Generate makefile content from registry
@@ -115,8 +149,7 @@ def compile_registry(registry_path: str, local_prefix_file: TextIO = None) -> st
     :param local_prefix_file:
     :return:
     """
-    registry: registry_schema.Registry
-    registry = yaml_loader.load(registry_path, target_class=registry_schema.Registry)
+    registry = load_registry(registry_path)
     mkfile = ""
     onts = []
     if local_prefix_file:
@@ -124,10 +157,7 @@ def compile_registry(registry_path: str, local_prefix_file: TextIO = None) -> st
     for ont in registry.ontologies.values():
         target = f"db/{ont.id}.owl"
         dependencies = ["STAMP"]
-        if ont.has_imports or (ont.format and ont.format != 'rdfxml'):
-            command = f"robot merge -I {ont.url} -o $@"
-        else:
-            command = f"curl -L -s {ont.url} > $@.tmp && mv $@.tmp $@"
+        command = download_command(ont)
         dependencies_str = " ".join(dependencies)
         mkfile += f"{target}: {dependencies_str}\n\t{command}\n\n"
         onts.append(ont.id)
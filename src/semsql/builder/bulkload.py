@@ -0,0 +1,247 @@
+"""
+Bulk-load profiles for building a semsql db from an OWL/RDF file in-process
+
+A build runs in phases, each of which is timed:
+
+- create: a new db with the profile page size, the schema and prefixes
+- load: triples are loaded with pragmas suited to bulk inserts (no journal, no
+  syncing, a large cache); with an ordered profile, they are loaded into a
+  staging table and then copied into statements sorted by subject and predicate,
+  so that rows for a subject are stored together
+- closure: entailed_edge is computed in-process, or imported from a
+  relation-graph TSV
+- index: indexes are created only after all rows are loaded
+- analyze: planner statistics are gathered
+- vacuum: the db is rebuilt without free pages
+
+The build writes to a temporary file, which is renamed once all phases succeed.
+"""
+import csv
+import itertools
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from semsql import loader
+from semsql.builder.closure import write_entailed_edges
+from semsql.ontlib.information_content import build_information_content
+from semsql.ontlib.search import build_search_index
+
+THIS_DIR = Path(__file__).parent
+INDEX_DIR = THIS_DIR / "indexes"
+
+STAGING_TABLE = "statements_staging"
+NATIVE_CLOSURE = "native"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BulkLoadProfile:
+    """
+    Pragmas and options used when building a db
+    """
+
+    name: str
+    page_size: int = 4096
+    cache_size: int = -64000
+    """as for PRAGMA cache_size; negative values are in KiB"""
+    temp_store: str = "MEMORY"
+    mmap_size: int = 0
+    batch_size: int = loader.BATCH_SIZE
+    workers: int = 1
+    """processes for parsing N-Triples; 0 for one per CPU"""
+    ordered: bool = False
+    """load into a staging table and insert into statements in subject order"""
+    analyze: bool = True
+    vacuum: bool = True
+
+
+PROFILES: Dict[str, BulkLoadProfile] = {
+    "small": BulkLoadProfile("small"),
+    "medium": BulkLoadProfile(
+        "medium",
+        page_size=8192,
+        cache_size=-512000,
+        mmap_size=1 << 30,
+        ordered=True,
+    ),
+    # vacuum of a large db needs as much free disk and time again as the build,
+    # and a freshly built db has few free pages
+    "large": BulkLoadProfile(
+        "large",
+        page_size=16384,
+        cache_size=-2000000,
+        temp_store="FILE",
+        mmap_size=1 << 32,
+        workers=0,
+        ordered=True,
+        vacuum=False,
+    ),
+}
+
+# input sizes in bytes up to which a profile is chosen
+PROFILE_THRESHOLDS = [
+    (100 * 1024 * 1024, "small"),
+    (2 * 1024 * 1024 * 1024, "medium"),
+]
+
+
+def profile_for_size(size: int) -> BulkLoadProfile:
+    """
+    Choose a profile for an input of a given size
+
+    :param size: bytes
+    :return:
+    """
+    for threshold, name in PROFILE_THRESHOLDS:
+        if size <= threshold:
+            return PROFILES[name]
+    return PROFILES["large"]
+
+
+def get_profile(name: Optional[str], inputs: List[str], **overrides) -> BulkLoadProfile:
+    """
+    Get a named profile, or one chosen from the total input size, with overrides
+
+    :param name: key in PROFILES, or None to choose by size
+    :param inputs:
+    :param overrides: profile fields to change; None values are ignored
+    :return:
+    """
+    if name is None:
+        profile = profile_for_size(sum(os.path.getsize(p) for p in inputs))
+    elif name in PROFILES:
+        profile = PROFILES[name]
+    else:
+        raise ValueError(f"Unknown profile: {name}; must be one of {list(PROFILES)}")
+    return BulkLoadProfile(**{**asdict(profile), **{k: v for k, v in overrides.items() if v is not None}})
+
+
+def _import_tsv(con: sqlite3.Connection, path: str, batch_size: int) -> int:
+    n = 0
+    with open(path) as stream:
+        rows = (tuple(r[:3]) for r in csv.reader(stream, delimiter="\t"))
+        first = next(rows, None)
+        con.execute("BEGIN")
+        con.execute("DELETE FROM entailed_edge")
+        if first is not None and first != ("subject", "predicate", "object"):
+            rows = itertools.chain([first], rows)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            con.executemany("INSERT INTO entailed_edge VALUES (?,?,?)", batch)
+            n += len(batch)
+        con.execute("COMMIT")
+    return n
+
+
+def build_db(
+    db: str,
+    inputs: List[str],
+    profile: Optional[BulkLoadProfile] = None,
+    closure: Optional[str] = NATIVE_CLOSURE,
+    format: Optional[str] = None,
+    information_content: bool = False,
+    search_index: bool = False,
+) -> Dict[str, float]:
+    """
+    Build a semsql db from RDF files in-process, using a bulk-load profile
+
+    :param db: path of db to create; replaced if it exists
+    :param inputs: paths to RDF/XML, Turtle or N-Triples files
+    :param profile: defaults to a profile chosen from the input size
+    :param closure: "native" to compute entailed edges, a path to a relation-graph TSV, or None
+    :param format: input format; guessed from the suffix if not set
+    :param information_content: if True, store intrinsic information content after the closure
+    :param search_index: if True, build the full text search index
+    :return: seconds taken for each phase
+    """
+    if profile is None:
+        profile = get_profile(None, inputs)
+    logger.info(f"Building {db} with profile {profile}")
+    tmp = f"{db}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    timings = {}
+
+    def phase(name, fn):
+        start = time.perf_counter()
+        result = fn()
+        timings[name] = time.perf_counter() - start
+        logger.info(f"Phase {name} took {timings[name]:.2f}s")
+        return result
+
+    con = sqlite3.connect(tmp, isolation_level=None)
+    try:
+        con.execute(f"PRAGMA page_size={profile.page_size}")
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        con.execute(f"PRAGMA cache_size={profile.cache_size}")
+        con.execute(f"PRAGMA temp_store={profile.temp_store}")
+        con.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        phase("create", lambda: loader.create_db(con))
+
+        def load():
+            table = STAGING_TABLE if profile.ordered else "statements"
+            if profile.ordered:
+                con.execute(f"CREATE TABLE {STAGING_TABLE} AS SELECT * FROM statements WHERE 0")
+            n = loader.load_into(
+                con,
+                inputs,
+                format=format,
+                batch_size=profile.batch_size,
+                workers=profile.workers,
+                table=table,
+            )
+            if profile.ordered:
+                con.execute("BEGIN")
+                con.execute(
+                    f"INSERT INTO statements SELECT * FROM {STAGING_TABLE} "
+                    "ORDER BY subject, predicate, object, value"
+                )
+                con.execute(f"DROP TABLE {STAGING_TABLE}")
+                con.execute("COMMIT")
+            logger.info(f"Loaded {n} statements")
+
+        phase("load", load)
+
+        def compute_closure():
+            if closure == NATIVE_CLOSURE:
+                con.execute("BEGIN")
+                write_entailed_edges(con)
+            elif closure:
+                _import_tsv(con, closure, profile.batch_size)
+
+        phase("closure", compute_closure)
+        if information_content:
+
+            def compute_information_content():
+                con.execute("BEGIN")
+                build_information_content(con)
+
+            phase("information_content", compute_information_content)
+        if search_index:
+
+            def index_text():
+                con.execute("BEGIN")
+                build_search_index(con)
+
+            phase("search_index", index_text)
+        phase("index", lambda: con.executescript("".join(p.read_text() for p in sorted(INDEX_DIR.glob("*.sql")))))
+        if profile.analyze:
+            phase("analyze", lambda: con.execute("ANALYZE"))
+        if profile.vacuum:
+            phase("vacuum", lambda: con.execute("VACUUM"))
+    except Exception:
+        con.close()
+        os.remove(tmp)
+        raise
+    con.close()
+    os.replace(tmp, db)
+    return timings
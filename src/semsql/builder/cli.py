@@ -1,13 +1,27 @@
+import csv
 import logging
+import os
+import sqlite3
+from dataclasses import astuple, fields
 
 import click
 from linkml_runtime import SchemaView
 from linkml_runtime.utils.formatutils import underscore
 from semsql.linkml import path_to_schema
+from semsql.ontlib import information_content as ic
+from semsql.ontlib import lexmatch, search, similarity
+from semsql.ontlib.graph import OntologyGraph
 from sqlalchemy import text
 
 import semsql.builder.builder as builder
+import semsql.builder.scheduler as scheduler
+import semsql.loader as loader
+from semsql.builder import (advisor, bulkload, download, interning,
+                            intervals, materialize, stats, synthetic)
+from semsql.builder.closure import (compute_entailed_edges,
+                                   update_entailed_edges)
 from semsql.sqlutils.viewgen import get_viewdef
+from semsql.utils import stem
 
 
 @click.group()
@@ -33,7 +47,13 @@ def main(verbose: int, quiet: bool):
     show_default=True,
     help="Uses ODK docker image",
 )
-def make(path, docker):
+@click.option(
+    "--native-closure/--no-native-closure",
+    default=False,
+    show_default=True,
+    help="Computes entailed edges in-process instead of using relation-graph",
+)
+def make(path, docker, native_closure):
     """
     Makes a specified target, such as a db file
 
@@ -47,7 +67,521 @@ def make(path, docker):
         docker_config = builder.DockerConfig()
     else:
         docker_config = None
-    builder.make(path, docker_config=docker_config)
+    builder.make(path, docker_config=docker_config, native_closure=native_closure)
+
+
+@main.command()
+@click.argument("db")
+def closure(db):
+    """
+    Computes the entailed_edge table in-process, replacing any existing contents
+
+    This is an alternative to relation-graph that does not require a JVM
+
+    Example:
+
+        semsql closure envo.db
+    """
+    compute_entailed_edges(db)
+
+
+@main.command()
+@click.argument("db")
+@click.option(
+    "--added",
+    "-a",
+    type=click.File(mode="r"),
+    help="TSV of statements rows to add, with a header using statements column names",
+)
+@click.option(
+    "--removed",
+    "-r",
+    type=click.File(mode="r"),
+    help="TSV of statements rows to remove, with a header using statements column names",
+)
+def update_closure(db, added, removed):
+    """
+    Applies statement changes, and incrementally updates entailed edges
+
+    Example:
+
+        semsql update-closure uberon.db -a added.tsv -r removed.tsv
+    """
+
+    def _rows(f):
+        if f is None:
+            return []
+        return [
+            {k: v if v != "" else None for k, v in row.items()}
+            for row in csv.DictReader(f, delimiter="\t")
+        ]
+
+    update_entailed_edges(db, added=_rows(added), removed=_rows(removed))
+
+
+@main.command()
+@click.argument("registry")
+@click.option("--jobs", "-j", default=1, show_default=True, help="Number of stages to run in parallel")
+@click.option("--max-mem", help="Maximum total estimated memory of running stages, e.g. 32g")
+@click.option("--retries", default=1, show_default=True, help="Number of times to retry a failed stage")
+@click.option("--directory", "-d", default="db", show_default=True, help="Directory for owl and db files")
+@click.option(
+    "--native-closure/--no-native-closure",
+    default=False,
+    show_default=True,
+    help="Computes entailed edges in-process instead of using relation-graph",
+)
+@click.option(
+    "--refresh/--no-refresh",
+    default=False,
+    show_default=True,
+    help="Fetch every ontology again, including unchanged and robot-merged ones",
+)
+@click.option("--ontology", "-O", multiple=True, help="Only build these ontologies")
+def build_all(registry, jobs, max_mem, retries, directory, native_closure, refresh, ontology):
+    """
+    Builds dbs for all ontologies in a registry in parallel
+
+    Stages are scheduled across a pool of workers, subject to a memory limit;
+    a report of per-stage timings is written to stdout. Ontologies are only
+    downloaded again if they have changed; those merged with robot are only
+    fetched again with --refresh
+
+    Example:
+
+        semsql build-all registry/ontologies.yaml --jobs 8 --max-mem 32g
+    """
+    reg = builder.load_registry(registry)
+    onts = [
+        ont
+        for ont in reg.ontologies.values()
+        if not ont.suppress and (not ontology or ont.id in ontology)
+    ]
+    sched = scheduler.BuildScheduler(
+        onts,
+        directory=directory,
+        jobs=jobs,
+        max_memory=scheduler.parse_memory(max_mem) if max_mem else None,
+        retries=retries,
+        native_closure=native_closure,
+        refresh=refresh,
+    )
+    results = sched.run()
+    print(scheduler.report(results))
+    failed = {r.ontology for r in results if not r.success} - {
+        r.ontology for r in results if r.success and r.stage == scheduler.DB
+    }
+    if failed:
+        raise click.ClickException(f"Failed to build: {', '.join(sorted(failed))}")
+
+
+@main.command(name="materialize")
+@click.argument("db")
+@click.option(
+    "--profile",
+    "-p",
+    default="obo-default",
+    show_default=True,
+    type=click.Choice(list(materialize.PROFILES)),
+    help="Set of views to materialize",
+)
+@click.option("--view", "-V", multiple=True, help="Materialize only these views from the profile")
+@click.option("--index/--no-index", default=True, show_default=True, help="Create covering indexes")
+@click.option("--undo/--no-undo", default=False, show_default=True, help="Turn materialized tables back into views")
+def materialize_views(db, profile, view, index, undo):
+    """
+    Materializes expensive views as indexed tables
+
+    Views are replaced by tables of the same name, in a single transaction;
+    running again refreshes the tables. What was materialized is recorded
+    in the materialized_view table.
+
+    Example:
+
+        semsql materialize db/go.db --profile obo-default
+    """
+    con = sqlite3.connect(db, isolation_level=None)
+    if undo:
+        for name in materialize.dematerialize(con, list(view) if view else None):
+            print(f"Restored view {name}")
+    else:
+        views = [mv for mv in materialize.PROFILES[profile] if not view or mv.name in view]
+        counts = materialize.materialize(con, views, profile=profile, index=index)
+        for name, n in counts.items():
+            print(f"{name}\t{n}")
+    con.close()
+
+
+@main.command()
+@click.argument("db")
+@click.option("--query-log", "-Q", type=click.Path(exists=True), help="File of SQL queries to optimize for")
+@click.option("--views/--no-views", default=True, show_default=True, help="Include lookups on every view")
+@click.option("--apply/--no-apply", default=False, show_default=True, help="Create the proposed indexes")
+@click.option("--max-indexes", default=5, show_default=True)
+@click.option(
+    "--min-benefit",
+    default=0.01,
+    show_default=True,
+    help="Minimum estimated reduction in workload cost, as a fraction",
+)
+@click.option("--show-issues/--no-show-issues", default=False, show_default=True)
+def advise_indexes(db, query_log, views, apply, max_indexes, min_benefit, show_issues):
+    """
+    Proposes indexes using query plans for views and a query log
+
+    Output is SQL, so it can be reviewed and then piped to sqlite3
+
+    Example:
+
+        semsql advise-indexes db/go.db -Q queries.sql
+    """
+    con = sqlite3.connect(db, isolation_level=None)
+    queries = advisor.read_query_log(query_log) if query_log else []
+    proposals, issues = advisor.advise_indexes(
+        con,
+        queries,
+        include_views=views,
+        apply=apply,
+        max_indexes=max_indexes,
+        min_benefit=min_benefit,
+    )
+    con.close()
+    print(f"-- {len(issues)} full table scans or temp b-trees found")
+    if show_issues:
+        for issue in issues:
+            print(f"-- {issue.detail}: {' '.join(issue.query.split())}")
+    for p in proposals:
+        print(
+            f"-- benefit={p.benefit:.3f} build_seconds={p.build_seconds:.3f} "
+            f"queries_improved={p.queries_improved}"
+        )
+        print(p.ddl)
+
+
+@main.command()
+@click.argument("output")
+@click.option("--classes", "-n", type=int, help="Number of classes")
+@click.option("--statements", "-s", type=float, help="Approximate number of statements, e.g. 1e6")
+@click.option("--branching-factor", default=4.0, show_default=True, help="Mean direct subclasses per class")
+@click.option("--multi-parent-probability", default=0.2, show_default=True)
+@click.option("--existential-density", default=0.3, show_default=True, help="Mean restrictions per class")
+@click.option("--synonyms-per-class", default=1.0, show_default=True)
+@click.option("--definition-probability", default=0.8, show_default=True)
+@click.option("--axiom-annotation-probability", default=0.5, show_default=True)
+@click.option("--seed", default=42, show_default=True)
+@click.option("--closure/--no-closure", default=True, show_default=True, help="Compute entailed_edge")
+def generate_synthetic(output, classes, statements, closure, **kwargs):
+    """
+    Generates a synthetic ontology db, e.g. for load testing
+
+    Example:
+
+        semsql generate-synthetic big.db --statements 1e7
+    """
+    if statements:
+        config = synthetic.SyntheticConfig.for_statements(int(statements), **kwargs)
+    else:
+        config = synthetic.SyntheticConfig(**kwargs)
+        if classes:
+            config.num_classes = classes
+    stats = synthetic.generate_db(output, config, closure=closure)
+    for k, v in stats.items():
+        print(f"{k}\t{v}")
+
+
+@main.command()
+@click.option(
+    "--replace/--no-replace",
+    default=False,
+    show_default=True,
+    help="Drop the entailed_edge table, replacing it with a view over the encoding",
+)
+@click.option("--vacuum/--no-vacuum", default=True, show_default=True, help="Reclaim space after --replace")
+@click.argument("db")
+def index_closure(db, replace, vacuum):
+    """
+    Encodes entailed_edge compactly as intervals over a postorder of the class hierarchy
+
+    Example:
+
+        semsql index-closure --replace go.db
+    """
+    con = sqlite3.connect(db, isolation_level=None)
+    for k, v in intervals.build_interval_index(con).items():
+        print(f"{k}\t{v}")
+    if replace:
+        intervals.replace_entailed_edge(con)
+        if vacuum:
+            con.execute("VACUUM")
+    con.close()
+
+
+@main.command()
+@click.option("-o", "--output", required=True, help="Path to snapshot file")
+@click.argument("db")
+def snapshot(db, output):
+    """
+    Writes edges, entailed edges and labels as a binary snapshot for memory-mapping
+
+    The snapshot is opened with semsql.ontlib.graph.OntologyGraph.from_snapshot
+
+    Example:
+
+        semsql snapshot go.db -o go.closure
+    """
+    OntologyGraph.from_db(db).save(output)
+
+
+@main.command(name="information-content")
+@click.option(
+    "--source",
+    "-s",
+    type=click.Choice(ic.SOURCES),
+    default=ic.INTRINSIC,
+    show_default=True,
+    help="Count descendant classes, or entities annotated in term_association",
+)
+@click.option("--predicates", "-p", multiple=True, help="Entailed edge predicates; defaults to rdfs:subClassOf")
+@click.argument("db")
+def information_content(db, source, predicates):
+    """
+    Computes and stores the information content of each class
+
+    The information_content table is refreshed whenever the closure is recomputed or updated
+
+    Example:
+
+        semsql information-content go.db
+    """
+    con = sqlite3.connect(db)
+    n = ic.build_information_content(con, source, list(predicates) or None)
+    print(f"Stored information content for {n} classes")
+    con.close()
+
+
+@main.command(name="lexmatch")
+@click.option("--output", "-o", type=click.File(mode="w"), default="-", help="SSSOM TSV file")
+@click.option("--field", "-F", multiple=True, help="Predicates to match on; defaults to labels and exact synonyms")
+@click.option(
+    "--normalize",
+    "-N",
+    type=click.Choice(list(lexmatch.NORMALIZERS)),
+    multiple=True,
+    help="Normalizers, applied in order; defaults to case and whitespace",
+)
+@click.option(
+    "--same-source/--no-same-source",
+    default=False,
+    show_default=True,
+    help="Include matches between terms with the same prefix",
+)
+@click.argument("db")
+def lexical_match(db, output, field, normalize, same_source):
+    """
+    Finds terms with matching labels or synonyms, and writes them as SSSOM
+
+    Example:
+
+        semsql lexmatch merged.db -N case -N punctuation -o matches.sssom.tsv
+    """
+    try:
+        normalizers = lexmatch.get_normalizers(normalize or lexmatch.DEFAULT_NORMALIZERS)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    con = sqlite3.connect(db)
+    index = lexmatch.LexicalIndex.from_connection(con, list(field) or None, normalizers)
+    n = lexmatch.write_sssom(index.matches(same_source=same_source), output)
+    logging.info(f"Wrote {n} mappings")
+    con.close()
+
+
+@main.command(name="search-index")
+@click.option("--field", "-F", multiple=True, help="Predicates to index; defaults to labels, synonyms and definitions")
+@click.option("--drop/--no-drop", default=False, show_default=True, help="Remove the index")
+@click.argument("db")
+def build_search_index(db, field, drop):
+    """
+    Builds a full text index over labels, synonyms and definitions
+
+    The index is used by term searches, e.g. subgraph -m label
+
+    Example:
+
+        semsql search-index go.db
+    """
+    con = sqlite3.connect(db)
+    if drop:
+        search.drop_search_index(con)
+    else:
+        n = search.build_search_index(con, list(field) or None)
+        print(f"Indexed {n} values")
+    con.close()
+
+
+@main.command(name="search")
+@click.option("--mode", "-M", type=click.Choice(search.MODES), default=search.PREFIX, show_default=True)
+@click.option("--field", "-F", multiple=True, help="Only match values for these predicates")
+@click.option("--limit", "-n", default=20, show_default=True)
+@click.argument("db")
+@click.argument("text")
+def search_terms(db, text, mode, field, limit):
+    """
+    Searches labels, synonyms and definitions, using the index built by search-index
+
+    Example:
+
+        semsql search go.db "nuclear env"
+    """
+    con = sqlite3.connect(db)
+    # warns if statements have changed since the index was built
+    search.is_search_index_current(con)
+    for r in search.search(con, text, mode, list(field) or None, limit):
+        print(f"{r.subject}\t{r.field}\t{r.value}\t{r.rank:.3f}")
+    con.close()
+
+
+@main.group()
+def nlp():
+    """Text processing of literal values."""
+
+
+@nlp.command(name="transform")
+@click.option(
+    "--transform",
+    "-T",
+    type=click.Choice(list(lexmatch.NORMALIZERS)),
+    multiple=True,
+    help="Transformations, applied in order; defaults to stem, which requires nltk",
+)
+@click.option("--predicate", help="Predicate for textual_transformation rows; defaults to one per transformation")
+@click.option("--workers", "-j", default=1, show_default=True, help="Processes to use; 0 for one per CPU")
+@click.option("--chunk-size", default=stem.CHUNK_SIZE, show_default=True, help="Values per chunk and commit")
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    show_default=True,
+    help="Continue an interrupted run, or replace existing rows",
+)
+@click.argument("db")
+def nlp_transform(db, transform, predicate, workers, chunk_size, resume):
+    """
+    Transforms (e.g. stems) all distinct literal values into textual_transformation
+
+    Example:
+
+        semsql nlp transform go.db -T case -T stem -j 4
+    """
+    try:
+        n = stem.transform_values(
+            db,
+            list(transform) or None,
+            predicate=predicate,
+            workers=workers,
+            chunk_size=chunk_size,
+            resume=resume,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"Transformed {n} values")
+
+
+@main.command(name="similarity")
+@click.option("--against", "-a", multiple=True, help="Terms to compare against; defaults to each other")
+@click.option("--predicates", "-p", multiple=True, help="Entailed edge predicates; defaults to rdfs:subClassOf")
+@click.option("--top", "-k", type=int, help="Report only the best K matches for each term")
+@click.option(
+    "--metric",
+    "-m",
+    type=click.Choice(similarity.METRICS),
+    default="phenodigm_score",
+    show_default=True,
+    help="Metric for --top",
+)
+@click.option("--save/--no-save", default=False, show_default=True, help=f"Store in {similarity.TABLE}")
+@click.argument("db")
+@click.argument("terms", nargs=-1, required=True)
+def pairwise_similarity(db, terms, against, predicates, top, metric, save):
+    """
+    Computes semantic similarity between terms, over their ancestors
+
+    Example:
+
+        semsql similarity go.db GO:0005634 GO:0005737
+
+        semsql similarity go.db GO:0005634 -k 10
+    """
+    con = sqlite3.connect(db)
+    engine = similarity.SimilarityEngine.from_connection(con, list(predicates) or None)
+    if top:
+        results = [r for t in terms for r in engine.top_k(t, against or None, top, metric)]
+    else:
+        results = list(engine.all_vs_all(terms, against or None))
+    print("\t".join(f.name for f in fields(similarity.TermPairwiseSimilarity)))
+    for r in results:
+        print("\t".join("" if v is None else str(v) for v in astuple(r)))
+    if save:
+        similarity.save_similarities(con, results)
+    con.close()
+
+
+@main.command(name="intern")
+@click.option("--undo/--no-undo", default=False, show_default=True, help="Convert back to plain tables")
+@click.option("--vacuum/--no-vacuum", default=True, show_default=True, help="Reclaim space afterwards")
+@click.argument("db")
+def intern_nodes(db, undo, vacuum):
+    """
+    Converts statements and entailed_edge to compact storage with interned node ids
+
+    statements and entailed_edge are replaced by views with the same columns
+
+    Example:
+
+        semsql intern ncbitaxon.db
+    """
+    con = sqlite3.connect(db, isolation_level=None)
+    if undo:
+        interning.expand_db(con, vacuum=vacuum)
+    else:
+        for k, v in interning.intern_db(con, vacuum=vacuum).items():
+            print(f"{k}\t{v}")
+    con.close()
+
+
+@main.command(name="stats")
+@click.option("--analyze/--no-analyze", default=False, show_default=True, help="Run ANALYZE first")
+@click.option(
+    "--table",
+    "-t",
+    type=click.Choice(["statements", "entailed_edge"]),
+    multiple=True,
+    help="Tables to report predicate cardinalities for; defaults to both",
+)
+@click.option("--limit", "-n", type=int, help="Maximum predicates to report per table")
+@click.argument("db")
+def db_stats(db, analyze, table, limit):
+    """
+    Reports per-predicate cardinalities and planner statistics for a db
+
+    Example:
+
+        semsql stats --analyze go.db
+    """
+    con = sqlite3.connect(db)
+    if analyze:
+        stats.analyze(con)
+    print("table\tpredicate\trows\tsubjects\tobjects")
+    for tbl in table or ["statements", "entailed_edge"]:
+        for ps in stats.predicate_stats(con, tbl)[:limit]:
+            print(f"{tbl}\t{ps.predicate}\t{ps.rows}\t{ps.subjects}\t{ps.objects}")
+    index_stats = stats.index_stats(con)
+    if not index_stats:
+        logging.warning(f"No planner statistics in {db}; use --analyze")
+    else:
+        print()
+        print("table\tindex\trows\trows_per_key")
+        for s in index_stats:
+            print(f"{s.table}\t{s.index or ''}\t{s.rows}\t{','.join(str(n) for n in s.rows_per_key)}")
+    con.close()
 
 
 @main.command()
@@ -64,17 +598,138 @@ def generate_makefile(registry, local_prefixes):
 
 
 @main.command()
-@click.option("-o", "--output")
-@click.argument("ontology")
-def download(ontology, output):
+@click.option(
+    "--profile",
+    "-p",
+    type=click.Choice(list(bulkload.PROFILES)),
+    help="Bulk-load profile; chosen from the input size if not set",
+)
+@click.option(
+    "--closure",
+    default=bulkload.NATIVE_CLOSURE,
+    show_default=True,
+    help="'native' to compute entailed edges in-process, or a relation-graph TSV",
+)
+@click.option("--format", "-f", type=click.Choice(["nt", "turtle", "xml"]), help="Guessed from suffix if not set")
+@click.option("--workers", "-j", type=int, help="Processes for parsing N-Triples; overrides the profile")
+@click.option("--page-size", type=int, help="Overrides the profile")
+@click.option("--cache-size", type=int, help="Overrides the profile; negative values are in KiB")
+@click.option("--vacuum/--no-vacuum", default=None, help="Overrides the profile")
+@click.option(
+    "--information-content/--no-information-content",
+    default=False,
+    show_default=True,
+    help="Store intrinsic information content after the closure",
+)
+@click.option(
+    "--search-index/--no-search-index",
+    default=False,
+    show_default=True,
+    help="Build a full text index over labels, synonyms and definitions",
+)
+@click.argument("db")
+@click.argument("inputs", nargs=-1, required=True)
+def build(db, inputs, profile, closure, format, information_content, search_index, **overrides):
+    """
+    Builds a db in-process from OWL/RDF files, using bulk-load pragmas and deferred indexing
+
+    Reports the time taken for each phase
+
+    Example:
+
+        semsql build -p large ncbitaxon.db ncbitaxon.nt
+    """
+    bulk_profile = bulkload.get_profile(profile, list(inputs), **overrides)
+    timings = bulkload.build_db(
+        db,
+        list(inputs),
+        profile=bulk_profile,
+        closure=closure,
+        format=format,
+        information_content=information_content,
+        search_index=search_index,
+    )
+    for phase, seconds in timings.items():
+        print(f"{phase}\t{seconds:.3f}")
+    print(f"total\t{sum(timings.values()):.3f}")
+
+
+@main.command(name="load")
+@click.option("--format", "-f", type=click.Choice(["nt", "turtle", "xml"]), help="Guessed from suffix if not set")
+@click.option(
+    "--create/--no-create", default=True, show_default=True, help="Create the schema if the db does not have one"
+)
+@click.option("--batch-size", default=loader.BATCH_SIZE, show_default=True, help="Statements per insert")
+@click.option(
+    "--workers",
+    "-j",
+    default=1,
+    show_default=True,
+    help="Processes for parsing N-Triples in shards; 0 for one per CPU",
+)
+@click.argument("db")
+@click.argument("inputs", nargs=-1, required=True)
+def load_rdf(db, inputs, format, create, batch_size, workers):
+    """
+    Loads RDF/XML, Turtle or N-Triples files into the statements table, in-process
+
+    This is an alternative to rdftab that does not require an external binary.
+    Journaling is switched off during the load, so if it fails the db should be
+    deleted or restored from a copy
+
+    Example:
+
+        semsql -v load envo.db envo.owl
+
+    Large N-Triples files can be parsed in parallel:
+
+        semsql load -j 8 ncbitaxon.db ncbitaxon.nt
+    """
+    n = loader.load(db, list(inputs), format=format, create=create, batch_size=batch_size, workers=workers)
+    logging.info(f"Loaded {n} statements into {db}")
+
+
+@main.command(name="download")
+@click.option("-o", "--output", help="Path to db; only for a single ontology")
+@click.option("--directory", "-d", default=".", show_default=True, help="Directory for dbs")
+@click.option("--jobs", "-j", default=4, show_default=True, help="Number of concurrent downloads")
+@click.option("--force/--no-force", default=False, show_default=True, help="Download even if unchanged")
+@click.option("--sha256", help="Expected checksum of the db; only for a single ontology")
+@click.option("--base-url", default=download.BASE_URL, show_default=True)
+@click.argument("ontologies", nargs=-1, required=True)
+def download_db(ontologies, output, directory, jobs, force, sha256, base_url):
     """
-    Download a read-made SQLite db for an OBO ontology
+    Download a read-made SQLite db for one or more OBO ontologies
+
+    Downloads are streamed and decompressed on the fly; interrupted downloads
+    are resumed, and dbs that are unchanged since the last download are skipped.
+    A report of transfer sizes and throughput is written to stdout
 
     Example:
 
         semsql download cl -o cl.db
+
+        semsql download cl uberon go -d db -j 3
     """
-    builder.download_obo_sqlite(ontology, destination=output)
+    if output or sha256:
+        if len(ontologies) > 1:
+            raise click.UsageError("--output and --sha256 can only be used with one ontology")
+        ontology = ontologies[0]
+        if output is None:
+            output = os.path.join(directory, f"{ontology}.db")
+        results = [
+            builder.download_obo_sqlite(
+                ontology, output, base_url=base_url, expected_sha256=sha256, force=force
+            )
+        ]
+    else:
+        results = download.download_many(
+            list(ontologies), directory, jobs=jobs, base_url=base_url, force=force
+        )
+    print(download.report(results))
+    failed = [r.ontology for r in results if r.status == "failed"]
+    if failed:
+        raise click.ClickException(f"Failed to download: {', '.join(failed)}")
 
 
 @main.command()
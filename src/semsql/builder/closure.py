@@ -0,0 +1,630 @@
+"""
+In-process computation of the entailed_edge table
+
+This is an alternative to running relation-graph, which requires a JVM and
+several rounds of serialization (TTL -> RDF/XML -> SQLite -> TSV).
+
+The closure is computed directly from the asserted axioms already loaded in a
+semsql database:
+
+- named subclass axioms (rdfs_subclass_of_named_statement)
+- existential restrictions (owl_subclass_of_some_values_from)
+- property characteristics (transitive_property_node), rdfs:subPropertyOf
+  and owl:propertyChainAxiom
+
+The entailments follow the same rules as relation-graph, restricted to named classes:
+
+- reflexive, transitive subClassOf
+- C SubClassOf P some D, C' SubClassOf C, D SubClassOf D' => C' SubClassOf P some D'
+- P SubPropertyOf Q, C SubClassOf P some D => C SubClassOf Q some D
+- P transitive: C SubClassOf P some D, D SubClassOf P some E => C SubClassOf P some E
+- P1 o ... o Pn -> Q: chains are composed and added to Q
+
+Nodes are interned as integers, adjacency is held in compressed sparse row
+arrays, and closures are computed in a single pass in topological order over
+the strongly connected components of the graph, so cycles (e.g. equivalent
+classes) are handled without iterating to a fixpoint.
+
+As with the relation-graph build, which runs over the ontology with
+equivalence axioms removed, equivalence axioms are not used.
+"""
+import logging
+import sqlite3
+from collections import defaultdict
+from typing import (Callable, Dict, FrozenSet, Iterable, Iterator, List,
+                    Optional, Set, Tuple)
+
+from semsql.ontlib.graph import CSR
+from semsql.ontlib.information_content import refresh_information_content
+
+SUBCLASS_OF = "rdfs:subClassOf"
+OWL_THING = "owl:Thing"
+OWL_NOTHING = "owl:Nothing"
+
+TRIPLE = Tuple[str, str, str]
+STATEMENT = Tuple[str, str, str, str, str, str, str]
+STATEMENT_COLUMNS = ["stanza", "subject", "predicate", "object", "value", "datatype", "language"]
+
+# predicates whose statements can change the closure of individual classes
+CLASS_AXIOM_PREDICATES = {SUBCLASS_OF, "owl:onProperty", "owl:someValuesFrom"}
+
+# predicates whose statements can change the closure of any class using a property
+PROPERTY_AXIOM_PREDICATES = {"rdfs:subPropertyOf", "owl:propertyChainAxiom"}
+
+# number of rows per executemany batch when writing entailed_edge
+BATCH_SIZE = 100000
+
+# upper bound on rounds of property chain composition
+MAX_CHAIN_ITERATIONS = 50
+
+# number of ids per IN (...) query
+CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class NodeIndex:
+    """
+    Interns CURIEs as consecutive integers
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.curies: List[str] = []
+
+    def intern(self, curie: str) -> int:
+        ix = self.ids.get(curie)
+        if ix is None:
+            ix = len(self.curies)
+            self.ids[curie] = ix
+            self.curies.append(curie)
+        return ix
+
+    def __len__(self):
+        return len(self.curies)
+
+
+def strongly_connected_components(
+    nodes: Iterable[int], successors: Callable[[int], Iterable[int]]
+) -> List[List[int]]:
+    """
+    Iterative Tarjan's algorithm
+
+    :param nodes:
+    :param successors: function yielding the successors of a node
+    :return: components, each emitted after all components reachable from it
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, it = work[-1]
+            advanced = False
+            for succ in it:
+                if succ not in index:
+                    index[succ] = lowlink[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    advanced = True
+                    break
+                elif succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+class ClosureEngine:
+    """
+    Computes entailed edges from asserted subclass and existential axioms
+    """
+
+    def __init__(self):
+        self.index = NodeIndex()
+        self.subclass_pairs: Set[Tuple[int, int]] = set()
+        self.existentials: Dict[str, Set[Tuple[int, int]]] = defaultdict(set)
+        self.transitive_properties: Set[str] = set()
+        self.subproperty_pairs: Set[Tuple[str, str]] = set()
+        self.property_chains: List[Tuple[List[str], str]] = []
+        self.classes: Set[int] = set()
+
+    def add_subclass(self, sub: str, sup: str):
+        if sup == OWL_THING or OWL_NOTHING in (sub, sup):
+            if sub != OWL_NOTHING:
+                self.classes.add(self.index.intern(sub))
+            return
+        s = self.index.intern(sub)
+        o = self.index.intern(sup)
+        self.classes.update([s, o])
+        if s != o:
+            self.subclass_pairs.add((s, o))
+
+    def add_existential(self, sub: str, predicate: str, filler: str):
+        if OWL_NOTHING in (sub, filler) or OWL_THING in (sub, filler):
+            return
+        s = self.index.intern(sub)
+        o = self.index.intern(filler)
+        self.classes.update([s, o])
+        self.existentials[predicate].add((s, o))
+
+    @classmethod
+    def from_connection(cls, con: sqlite3.Connection) -> "ClosureEngine":
+        """
+        Load asserted axioms from a semsql database
+
+        :param con: connection to a semsql database
+        :return:
+        """
+        engine = cls()
+        for s, o in con.execute(
+            "SELECT subject, object FROM rdfs_subclass_of_named_statement "
+            "WHERE subject NOT LIKE '_:%'"
+        ):
+            engine.add_subclass(s, o)
+        for s, p, o in con.execute(
+            "SELECT subject, predicate, object FROM owl_subclass_of_some_values_from "
+            "WHERE subject NOT LIKE '_:%' AND object NOT LIKE '_:%'"
+        ):
+            engine.add_existential(s, p, o)
+        for (p,) in con.execute("SELECT id FROM transitive_property_node"):
+            engine.transitive_properties.add(p)
+        for s, o in con.execute(
+            "SELECT subject, object FROM rdfs_subproperty_of_statement "
+            "WHERE subject NOT LIKE '_:%' AND object NOT LIKE '_:%'"
+        ):
+            if s != o:
+                engine.subproperty_pairs.add((s, o))
+        firsts = dict(con.execute("SELECT subject, object FROM rdf_first_statement"))
+        rests = dict(con.execute("SELECT subject, object FROM rdf_rest_statement"))
+        for p, head in con.execute(
+            "SELECT subject, object FROM statements WHERE predicate='owl:propertyChainAxiom'"
+        ):
+            chain = []
+            while head in firsts:
+                chain.append(firsts[head])
+                head = rests.get(head)
+            if len(chain) > 1 and not any(c.startswith("_:") for c in chain):
+                engine.property_chains.append((chain, p))
+        return engine
+
+    def superproperties(self, p: str) -> Set[str]:
+        """
+        :param p:
+        :return: all superproperties of p, including p
+        """
+        parents = defaultdict(set)
+        for s, o in self.subproperty_pairs:
+            parents[s].add(o)
+        result = {p}
+        stack = [p]
+        while stack:
+            for o in parents[stack.pop()]:
+                if o not in result:
+                    result.add(o)
+                    stack.append(o)
+        return result
+
+    def compute(
+        self, seeds: Optional[Iterable[str]] = None
+    ) -> Dict[str, Dict[int, FrozenSet[int]]]:
+        """
+        Compute the closure for each predicate
+
+        If seeds are provided, only the part of the graph reachable from the seeds
+        is considered; the closures computed for the seeds themselves are complete.
+
+        :param seeds: optional CURIEs to restrict computation to
+        :return: mapping from predicate to a mapping of node id to the ids it relates to
+        """
+        n = len(self.index)
+        parents = CSR.from_pairs(n, self.subclass_pairs)
+        if seeds is not None:
+            nodes = self._reachable(
+                [self.index.ids[s] for s in seeds if s in self.index.ids], parents
+            )
+        else:
+            nodes = set(range(n))
+        # reflexive transitive subclass closure, processed ancestors-first
+        components = strongly_connected_components(
+            sorted(nodes), lambda x: parents[x]
+        )
+        component_of = {}
+        for i, component in enumerate(components):
+            for m in component:
+                component_of[m] = i
+        ancestors: Dict[int, FrozenSet[int]] = {}
+        for component in components:
+            acc = set(component)
+            for m in component:
+                for parent in parents[m]:
+                    if parent not in acc:
+                        acc |= ancestors[parent]
+            acc = frozenset(acc)
+            for m in component:
+                ancestors[m] = acc
+        closures = {SUBCLASS_OF: ancestors}
+        # existential closures, computed in order of the property hierarchy
+        predicates = set(self.existentials)
+        for chain, p in self.property_chains:
+            predicates.update(chain)
+            predicates.add(p)
+        for p in list(predicates):
+            predicates |= self.superproperties(p)
+        direct_subproperties = defaultdict(set)
+        for s, o in self.subproperty_pairs:
+            if s in predicates and o in predicates:
+                direct_subproperties[o].add(s)
+        order = strongly_connected_components(
+            sorted(predicates), lambda p: sorted(direct_subproperties[p])
+        )
+        chain_facts = defaultdict(lambda: defaultdict(set))
+        for _ in range(MAX_CHAIN_ITERATIONS):
+            for property_group in order:
+                for p in property_group:
+                    closures[p] = self._existential_closure(
+                        p,
+                        nodes,
+                        parents,
+                        components,
+                        ancestors,
+                        closures,
+                        direct_subproperties[p] - set(property_group),
+                        chain_facts[p],
+                    )
+            changed = False
+            for chain, p in self.property_chains:
+                new_facts = self._compose_chain(chain, nodes, closures)
+                for s, objs in new_facts.items():
+                    if not objs <= closures[p].get(s, frozenset()):
+                        chain_facts[p][s] |= objs
+                        changed = True
+            if not changed:
+                break
+        else:
+            logger.warning("Property chains did not converge")
+        return closures
+
+    def entailed_edges(self, seeds: Optional[Iterable[str]] = None) -> Iterator[TRIPLE]:
+        """
+        Yield entailed edges as CURIE triples
+
+        :param seeds: if passed, only yield edges for these subjects
+        :return:
+        """
+        closures = self.compute(seeds)
+        curies = self.index.curies
+        if seeds is not None:
+            subjects = [self.index.ids[s] for s in seeds if s in self.index.ids]
+        else:
+            subjects = range(len(curies))
+        for s in subjects:
+            if s not in self.classes:
+                continue
+            subject = curies[s]
+            for p, closure in closures.items():
+                for o in closure.get(s, ()):
+                    yield subject, p, curies[o]
+
+    def _reachable(self, seeds: List[int], parents: CSR) -> Set[int]:
+        fillers = defaultdict(set)
+        for pairs in self.existentials.values():
+            for s, o in pairs:
+                fillers[s].add(o)
+        visited = set(seeds)
+        stack = list(seeds)
+        while stack:
+            x = stack.pop()
+            for y in list(parents[x]) + list(fillers[x]):
+                if y not in visited:
+                    visited.add(y)
+                    stack.append(y)
+        return visited
+
+    def _existential_closure(
+        self,
+        p: str,
+        nodes: Set[int],
+        parents: CSR,
+        components: List[List[int]],
+        ancestors: Dict[int, FrozenSet[int]],
+        closures: Dict[str, Dict[int, FrozenSet[int]]],
+        subproperties: Set[str],
+        extra_facts: Dict[int, Set[int]],
+    ) -> Dict[int, FrozenSet[int]]:
+        direct = defaultdict(set)
+        for s, o in self.existentials.get(p, ()):
+            if s in nodes:
+                direct[s].add(o)
+        for s, objs in extra_facts.items():
+            direct[s] |= objs
+        for sp in subproperties:
+            for s, objs in closures.get(sp, {}).items():
+                direct[s] |= objs
+        empty = frozenset()
+        transitive = p in self.transitive_properties
+        result: Dict[int, FrozenSet[int]] = {}
+        if transitive:
+            components = strongly_connected_components(
+                sorted(nodes), lambda x: list(parents[x]) + sorted(direct.get(x, ()))
+            )
+        for component in components:
+            members = set(component)
+            own = set()
+            contributions = []
+            internal = False
+            for m in component:
+                for parent in parents[m]:
+                    if parent not in members:
+                        contributions.append(result.get(parent, empty))
+                for o in direct.get(m, ()):
+                    own |= ancestors[o]
+                    if not transitive:
+                        continue
+                    if o in members:
+                        internal = True
+                    else:
+                        contributions.append(result.get(o, empty))
+            if internal:
+                # every member reaches every other member via a path with a P edge
+                for m in component:
+                    own |= ancestors[m]
+            contributions = [c for c in contributions if c]
+            if not own and not contributions:
+                continue
+            if not own and all(c is contributions[0] for c in contributions):
+                acc = contributions[0]
+            else:
+                acc = own
+                for c in contributions:
+                    acc |= c
+                acc = frozenset(acc)
+            for m in component:
+                result[m] = acc
+        return result
+
+    def _compose_chain(
+        self,
+        chain: List[str],
+        nodes: Set[int],
+        closures: Dict[str, Dict[int, FrozenSet[int]]],
+    ) -> Dict[int, Set[int]]:
+        facts = {}
+        first = closures.get(chain[0], {})
+        for s in nodes:
+            frontier = first.get(s)
+            if not frontier:
+                continue
+            for p in chain[1:]:
+                closure = closures.get(p, {})
+                nxt = set()
+                for x in frontier:
+                    nxt |= closure.get(x, frozenset())
+                frontier = nxt
+                if not frontier:
+                    break
+            if frontier:
+                facts[s] = frontier
+        return facts
+
+
+def compute_entailed_edges(db: str, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Replaces the contents of entailed_edge with a freshly computed closure
+
+    :param db: path to a semsql database
+    :param batch_size: rows per insert batch
+    :return: number of entailed edges written
+    """
+    con = sqlite3.connect(db)
+    try:
+        return write_entailed_edges(con, batch_size=batch_size)
+    finally:
+        con.close()
+
+
+def write_entailed_edges(con: sqlite3.Connection, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Replaces the contents of entailed_edge using an existing connection
+
+    Stored information content, if any, is refreshed in the same transaction
+
+    :param con:
+    :param batch_size: rows per insert batch
+    :return: number of entailed edges written
+    """
+    engine = ClosureEngine.from_connection(con)
+    logger.info(
+        f"Loaded {len(engine.index)} nodes, {len(engine.subclass_pairs)} subclass axioms"
+    )
+    n = 0
+    with con:
+        con.execute("DELETE FROM entailed_edge")
+        batch = []
+        for row in engine.entailed_edges():
+            batch.append(row)
+            if len(batch) >= batch_size:
+                con.executemany("INSERT INTO entailed_edge VALUES (?,?,?)", batch)
+                n += len(batch)
+                batch = []
+        con.executemany("INSERT INTO entailed_edge VALUES (?,?,?)", batch)
+        n += len(batch)
+        refresh_information_content(con)
+    logger.info(f"Wrote {n} entailed edges")
+    return n
+
+
+def update_entailed_edges(
+    db: str, added: Iterable = (), removed: Iterable = ()
+) -> Tuple[int, int]:
+    """
+    Applies changes to statements, and incrementally updates entailed_edge to match
+
+    Only classes whose closure can be affected are recomputed. These are the classes
+    directly changed, plus all classes that (transitively) had an entailed edge to a
+    changed class before the update: a derivation can only use the closure of a class X
+    if the subject has an entailed edge to X. All entailed edges for affected classes are
+    deleted, and rederived from the updated axioms (DRed-style), computing only over
+    the part of the graph reachable from them. Edges are then updated by difference.
+
+    Changes to property axioms (transitivity, subproperties, chains) can affect any
+    class, so these trigger a full recomputation, still applied as a difference.
+
+    Statement changes and entailed edge changes are applied in a single transaction,
+    together with a refresh of the information_content table, if there is one.
+
+    :param db: path to a semsql database
+    :param added: statements rows to add, as dicts or tuples in column order
+    :param removed: statements rows to remove, as dicts or tuples in column order
+    :return: tuple of (number of entailed edges inserted, number deleted)
+    """
+    added = [_as_statement(r) for r in added]
+    removed = [_as_statement(r) for r in removed]
+    con = sqlite3.connect(db, isolation_level=None)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            touched, full = _touched_classes(con, added + removed)
+            affected = None
+            if not full:
+                # property chains can compose edges through intermediate classes,
+                # so dependencies are followed until no new classes are found
+                affected = set(touched)
+                frontier = list(touched)
+                while frontier:
+                    found = set()
+                    for i in range(0, len(frontier), CHUNK_SIZE):
+                        chunk = frontier[i : i + CHUNK_SIZE]
+                        q = f"SELECT DISTINCT subject FROM entailed_edge WHERE object IN ({_placeholders(chunk)})"
+                        found.update(r[0] for r in con.execute(q, chunk))
+                    frontier = list(found - affected)
+                    affected |= found
+            for row in removed:
+                con.execute(
+                    "DELETE FROM statements WHERE "
+                    + " AND ".join(f"{c} IS ?" for c in STATEMENT_COLUMNS),
+                    row,
+                )
+            con.executemany("INSERT INTO statements VALUES (?,?,?,?,?,?,?)", added)
+            if affected is not None and not affected:
+                con.execute("COMMIT")
+                return 0, 0
+            engine = ClosureEngine.from_connection(con)
+            new_edges = set(engine.entailed_edges(seeds=affected))
+            if affected is None:
+                old_edges = set(con.execute("SELECT subject, predicate, object FROM entailed_edge"))
+            else:
+                old_edges = set()
+                affected = list(affected)
+                for i in range(0, len(affected), CHUNK_SIZE):
+                    chunk = affected[i : i + CHUNK_SIZE]
+                    q = f"SELECT subject, predicate, object FROM entailed_edge WHERE subject IN ({_placeholders(chunk)})"
+                    old_edges.update(con.execute(q, chunk))
+            to_delete = old_edges - new_edges
+            to_insert = new_edges - old_edges
+            con.executemany(
+                "DELETE FROM entailed_edge WHERE subject=? AND predicate=? AND object=?",
+                to_delete,
+            )
+            con.executemany("INSERT INTO entailed_edge VALUES (?,?,?)", to_insert)
+            if to_insert or to_delete:
+                refresh_information_content(con)
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        logger.info(f"Inserted {len(to_insert)} and deleted {len(to_delete)} entailed edges")
+        return len(to_insert), len(to_delete)
+    finally:
+        con.close()
+
+
+def _as_statement(row) -> STATEMENT:
+    if isinstance(row, dict):
+        return tuple(row.get(c) for c in STATEMENT_COLUMNS)
+    row = tuple(row)
+    if len(row) != len(STATEMENT_COLUMNS):
+        raise ValueError(f"Expected {len(STATEMENT_COLUMNS)} columns in {row}")
+    return row
+
+
+def _placeholders(values: List) -> str:
+    return ",".join("?" for _ in values)
+
+
+def _touched_classes(con: sqlite3.Connection, rows: List[STATEMENT]) -> Tuple[Set[str], bool]:
+    """
+    Find the named classes whose axioms are changed by a set of statements
+
+    :param con:
+    :param rows: statements being added or removed
+    :return: tuple of (classes, flag indicating a property axiom is changed)
+    """
+    touched = set()
+    for stanza, subject, predicate, obj, _, _, _ in rows:
+        if predicate in PROPERTY_AXIOM_PREDICATES:
+            return touched, True
+        if predicate == "rdf:type" and obj == "owl:TransitiveProperty":
+            return touched, True
+        if predicate in ("rdf:first", "rdf:rest"):
+            is_chain = con.execute(
+                "SELECT 1 FROM statements WHERE subject=? AND predicate='owl:propertyChainAxiom'",
+                (stanza,),
+            ).fetchone()
+            if is_chain or any(r[1] == stanza and r[2] == "owl:propertyChainAxiom" for r in rows):
+                return touched, True
+            continue
+        if predicate not in CLASS_AXIOM_PREDICATES:
+            continue
+        # objects can enter or leave the set of classes with a reflexive edge
+        if predicate != "owl:onProperty" and obj and not obj.startswith("_:"):
+            touched.add(obj)
+        if predicate == SUBCLASS_OF and obj and obj.startswith("_:"):
+            for (filler,) in con.execute(
+                "SELECT object FROM statements WHERE subject=? AND predicate='owl:someValuesFrom'",
+                (obj,),
+            ):
+                touched.add(filler)
+            for r in rows:
+                if r[1] == obj and r[2] == "owl:someValuesFrom":
+                    touched.add(r[3])
+        if not subject.startswith("_:"):
+            touched.add(subject)
+            continue
+        if stanza and not stanza.startswith("_:"):
+            touched.add(stanza)
+        for (s,) in con.execute(
+            "SELECT subject FROM statements WHERE predicate=? AND object=?",
+            (SUBCLASS_OF, subject),
+        ):
+            if not s.startswith("_:"):
+                touched.add(s)
+        for r in rows:
+            if r[2] == SUBCLASS_OF and r[3] == subject and not r[1].startswith("_:"):
+                touched.add(r[1])
+    return touched, False
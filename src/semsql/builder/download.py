@@ -0,0 +1,375 @@
+"""
+Streaming download of pre-built, gzipped SQLite dbs
+
+The gzipped stream is decompressed on the fly as it arrives, so the db is never
+held in memory and is not decompressed in a second pass. The compressed bytes
+are also kept in a ``.gz.part`` file until the download completes, so that an
+interrupted download can be resumed with an HTTP range request.
+
+Alongside each db a ``.meta.json`` sidecar records the ETag, Last-Modified and
+sha256 of the download; on the next download these are used for a conditional
+request, and an unchanged db is not fetched again. :func:`download_url` does
+the same for other files, such as the ontologies in the build registry.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+BASE_URL = "https://s3.amazonaws.com/bbop-sqlite"
+CHUNK_SIZE = 1024**2
+TIMEOUT = 60
+
+ProgressCallback = Callable[[str, int, Optional[int]], None]
+
+logger = logging.getLogger(__name__)
+
+
+class ChecksumError(ValueError):
+    """
+    Raised when a downloaded db does not match the expected checksum
+    """
+
+
+@dataclass
+class DownloadResult:
+    """
+    Outcome of downloading one db
+    """
+
+    ontology: str
+    destination: str
+    status: str
+    """one of downloaded, resumed, unchanged or failed"""
+    bytes_transferred: int = 0
+    bytes_written: int = 0
+    seconds: float = 0.0
+    sha256: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def throughput(self) -> float:
+        """
+        :return: bytes transferred per second
+        """
+        return self.bytes_transferred / self.seconds if self.seconds else 0.0
+
+
+def metadata_path(destination: str) -> str:
+    return f"{destination}.meta.json"
+
+
+def _read_metadata(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as stream:
+        return json.load(stream)
+
+
+def _write_metadata(path: str, metadata: Dict):
+    with open(f"{path}.tmp", "w") as stream:
+        json.dump(metadata, stream, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def _conditional_headers(url: str, destination: str, metadata: Dict) -> Dict[str, str]:
+    headers = {}
+    if os.path.exists(destination) and metadata.get("url") == url:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+    return headers
+
+
+class _Inflater:
+    """
+    Decompresses a gzip stream to a file, hashing the output as it is written
+    """
+
+    def __init__(self, path: str):
+        self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        self.hash = hashlib.sha256()
+        self.bytes_written = 0
+        self.stream = open(path, "wb")
+
+    def write(self, data: bytes):
+        out = self.decompressor.decompress(data)
+        if out:
+            self.stream.write(out)
+            self.hash.update(out)
+            self.bytes_written += len(out)
+
+    def close(self) -> bool:
+        """
+        :return: True if the end of the gzip stream was reached
+        """
+        out = self.decompressor.flush()
+        if out:
+            self.stream.write(out)
+            self.hash.update(out)
+            self.bytes_written += len(out)
+        self.stream.close()
+        return self.decompressor.eof
+
+
+def _range_total(content_range: Optional[str]) -> Optional[int]:
+    """
+    :param content_range: Content-Range header of a 416 response, e.g. bytes */1234
+    :return: length of the file on the server, if given
+    """
+    if content_range and content_range.startswith("bytes */"):
+        total = content_range[len("bytes */") :]
+        if total.isdigit():
+            return int(total)
+    return None
+
+
+def download_obo_sqlite(
+    ontology: str,
+    destination: str,
+    base_url: str = BASE_URL,
+    expected_sha256: Optional[str] = None,
+    force: bool = False,
+    progress: Optional[ProgressCallback] = None,
+    http: Optional[requests.Session] = None,
+) -> DownloadResult:
+    """
+    Downloads a pre-made SQLite file, decompressing as it streams
+
+    :param ontology: e.g. cl
+    :param destination: path to the db to write
+    :param base_url: location of gzipped dbs
+    :param expected_sha256: if set, the decompressed db must have this checksum
+    :param force: if True, download even if the db is unchanged since the last download
+    :param progress: called with (ontology, compressed bytes so far, total compressed bytes)
+    :param http: requests session to use
+    :return: result of the download
+    """
+    url = f"{base_url}/{ontology}.db.gz"
+    http = http if http is not None else requests.Session()
+    meta_path = metadata_path(destination)
+    part_gz = f"{destination}.gz.part"
+    part_db = f"{destination}.part"
+    metadata = _read_metadata(meta_path)
+    start = time.perf_counter()
+    result = DownloadResult(ontology, destination, "downloaded")
+
+    if expected_sha256 and metadata.get("sha256") != expected_sha256.lower():
+        # a 304 would keep a db that does not have the expected checksum
+        force = True
+    headers = {} if force else _conditional_headers(url, destination, metadata)
+    offset = 0
+    partial = metadata.get("partial", {})
+    if os.path.exists(part_gz) and partial.get("url") == url and partial.get("validator"):
+        offset = os.path.getsize(part_gz)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = partial["validator"]
+
+    with http.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+        if r.status_code == 304:
+            result.status = "unchanged"
+            result.sha256 = metadata.get("sha256")
+            result.seconds = time.perf_counter() - start
+            return result
+        # a 416 means the range starts at or past the end of the file on the server
+        satisfied = r.status_code == 416 and _range_total(r.headers.get("Content-Range")) == offset
+        if r.status_code == 416 and not satisfied:
+            # the partial download does not match the file on the server; start again
+            os.remove(part_gz)
+            del metadata["partial"]
+            _write_metadata(meta_path, metadata)
+            return download_obo_sqlite(ontology, destination, base_url, expected_sha256, force, progress, http)
+        if satisfied:
+            # every byte was received before the last download was interrupted
+            result.status = "resumed"
+            etag = partial.get("etag")
+            last_modified = partial.get("last_modified")
+        else:
+            r.raise_for_status()
+            etag = r.headers.get("ETag")
+            last_modified = r.headers.get("Last-Modified")
+            if r.status_code == 206:
+                result.status = "resumed"
+            else:
+                # server sent the whole file; any partial download is discarded
+                offset = 0
+            total = r.headers.get("Content-Length")
+            total = int(total) + offset if total is not None else None
+            metadata["partial"] = {
+                "url": url,
+                "validator": etag or last_modified,
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            _write_metadata(meta_path, metadata)
+
+        inflater = _Inflater(part_db)
+        try:
+            if offset:
+                # restore decompressor state from the bytes already on disk
+                with open(part_gz, "rb") as stream:
+                    for data in iter(lambda: stream.read(CHUNK_SIZE), b""):
+                        inflater.write(data)
+            if not satisfied:
+                with open(part_gz, "ab" if offset else "wb") as gz_stream:
+                    received = offset
+                    for data in r.raw.stream(CHUNK_SIZE, decode_content=False):
+                        gz_stream.write(data)
+                        inflater.write(data)
+                        received += len(data)
+                        result.bytes_transferred += len(data)
+                        if progress:
+                            progress(ontology, received, total)
+        finally:
+            complete = inflater.close()
+    if not complete:
+        if satisfied:
+            # a range request cannot fetch anything more, so the next run starts again
+            os.remove(part_gz)
+        raise IOError(f"Incomplete download of {url}; rerun to resume")
+    sha256 = inflater.hash.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256.lower():
+        os.remove(part_db)
+        os.remove(part_gz)
+        raise ChecksumError(f"Checksum mismatch for {url}: {sha256} != {expected_sha256}")
+    os.replace(part_db, destination)
+    os.remove(part_gz)
+    _write_metadata(
+        meta_path,
+        {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": sha256,
+            "size": inflater.bytes_written,
+        },
+    )
+    result.sha256 = sha256
+    result.bytes_written = inflater.bytes_written
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def download_url(
+    name: str,
+    url: str,
+    destination: str,
+    force: bool = False,
+    http: Optional[requests.Session] = None,
+) -> DownloadResult:
+    """
+    Downloads a file, unless it is unchanged since the last download
+
+    An unchanged file is not written, so its modification time is kept
+
+    :param name: name to report the download under, e.g. an ontology id
+    :param url:
+    :param destination: path to the file to write
+    :param force: if True, download even if the file is unchanged since the last download
+    :param http: requests session to use
+    :return: result of the download
+    """
+    http = http if http is not None else requests.Session()
+    meta_path = metadata_path(destination)
+    metadata = _read_metadata(meta_path)
+    start = time.perf_counter()
+    result = DownloadResult(name, destination, "downloaded")
+    headers = {} if force else _conditional_headers(url, destination, metadata)
+    part = f"{destination}.part"
+    digest = hashlib.sha256()
+    with http.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+        if r.status_code == 304:
+            result.status = "unchanged"
+            result.sha256 = metadata.get("sha256")
+            result.seconds = time.perf_counter() - start
+            return result
+        r.raise_for_status()
+        with open(part, "wb") as stream:
+            for data in r.iter_content(CHUNK_SIZE):
+                stream.write(data)
+                digest.update(data)
+                result.bytes_written += len(data)
+        result.bytes_transferred = result.bytes_written
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+    os.replace(part, destination)
+    result.sha256 = digest.hexdigest()
+    _write_metadata(
+        meta_path,
+        {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": result.sha256,
+            "size": result.bytes_written,
+        },
+    )
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def download_many(
+    ontologies: List[str],
+    directory: str = ".",
+    jobs: int = 4,
+    **kwargs,
+) -> List[DownloadResult]:
+    """
+    Downloads pre-made SQLite files for many ontologies concurrently
+
+    Failures are reported in the results rather than raised
+
+    :param ontologies:
+    :param directory: each ontology is written to DIRECTORY/ID.db
+    :param jobs: number of concurrent downloads
+    :param kwargs: passed to download_obo_sqlite
+    :return: results, in the same order as ontologies
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    def _download(ontology: str) -> DownloadResult:
+        destination = os.path.join(directory, f"{ontology}.db")
+        start = time.perf_counter()
+        try:
+            return download_obo_sqlite(ontology, destination, **kwargs)
+        except Exception as e:
+            logger.error(f"Failed to download {ontology}: {e}")
+            return DownloadResult(
+                ontology,
+                destination,
+                "failed",
+                seconds=time.perf_counter() - start,
+                error=str(e),
+            )
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_download, ontologies))
+
+
+def report(results: List[DownloadResult]) -> str:
+    """
+    Summarize results as TSV, one row per ontology
+
+    :param results:
+    :return:
+    """
+    cols = ["ontology", "status", "bytes_transferred", "bytes_written", "seconds"]
+    rows = ["\t".join(cols + ["mb_per_second", "sha256"])]
+    for r in results:
+        row = asdict(r)
+        vals = [str(row[c]) if c != "seconds" else f"{r.seconds:.2f}" for c in cols]
+        vals += [f"{r.throughput / 1024**2:.2f}", r.sha256 or r.error or ""]
+        rows.append("\t".join(vals))
+    transferred = sum(r.bytes_transferred for r in results)
+    seconds = max([r.seconds for r in results], default=0)
+    rows.append(f"TOTAL\t\t{transferred}\t{sum(r.bytes_written for r in results)}\t{seconds:.2f}")
+    return "\n".join(rows)
@@ -0,0 +1,227 @@
+"""
+Compact storage of statements and entailed_edge using interned node ids
+
+Each CURIE is stored once, in ``node_dictionary``, and the fact tables
+``statements_interned`` and ``entailed_edge_interned`` hold integer ids instead
+of strings. (The dictionary is not called ``node``, as that name is already
+used by a view in the schema.)
+
+``statements`` and ``entailed_edge`` are replaced by views that join back to
+the dictionary and have the same columns as the original tables, so existing
+views, queries and ORM classes keep working. INSTEAD OF triggers on these
+views intern new CURIEs on insert and handle deletes, so tools that modify
+the closure (e.g. update_entailed_edges) continue to work as well.
+
+Lookups by CURIE go through the unique index on ``node_dictionary.curie`` and
+then the integer indexes on the fact tables. Nullable columns are joined with
+LEFT JOIN; subject and predicate use inner joins, so that the planner is free
+to start from the dictionary when one of them is constrained.
+"""
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+INDEXES = Path(__file__).parent / "indexes" / "all-indexes.sql"
+
+DICTIONARY_TABLE = "node_dictionary"
+STATEMENTS_TABLE = "statements_interned"
+ENTAILED_EDGE_TABLE = "entailed_edge_interned"
+
+STATEMENTS_COLUMNS = ["stanza", "subject", "predicate", "object", "value", "datatype", "language"]
+STATEMENTS_NODE_COLUMNS = ["stanza", "subject", "predicate", "object", "datatype"]
+ENTAILED_EDGE_COLUMNS = ["subject", "predicate", "object"]
+
+INTERNED_DDL = f"""
+CREATE TABLE {DICTIONARY_TABLE} (
+    id INTEGER PRIMARY KEY,
+    curie TEXT UNIQUE NOT NULL
+);
+CREATE TABLE {STATEMENTS_TABLE} (
+    stanza INTEGER,
+    subject INTEGER,
+    predicate INTEGER,
+    object INTEGER,
+    value TEXT,
+    datatype INTEGER,
+    language TEXT
+);
+CREATE TABLE {ENTAILED_EDGE_TABLE} (
+    subject INTEGER,
+    predicate INTEGER,
+    object INTEGER
+);
+"""
+
+INTERNED_INDEXES = f"""
+CREATE INDEX {STATEMENTS_TABLE}_spo ON {STATEMENTS_TABLE}(subject, predicate, object);
+CREATE INDEX {STATEMENTS_TABLE}_spv ON {STATEMENTS_TABLE}(subject, predicate, value);
+CREATE INDEX {STATEMENTS_TABLE}_p ON {STATEMENTS_TABLE}(predicate);
+CREATE INDEX {STATEMENTS_TABLE}_op ON {STATEMENTS_TABLE}(object, predicate);
+CREATE INDEX {STATEMENTS_TABLE}_v ON {STATEMENTS_TABLE}(value);
+CREATE INDEX {ENTAILED_EDGE_TABLE}_spo ON {ENTAILED_EDGE_TABLE}(subject, predicate, object);
+CREATE INDEX {ENTAILED_EDGE_TABLE}_sp ON {ENTAILED_EDGE_TABLE}(subject, predicate);
+CREATE INDEX {ENTAILED_EDGE_TABLE}_op ON {ENTAILED_EDGE_TABLE}(object, predicate);
+"""
+
+STATEMENTS_SELECT = f"""
+SELECT st.curie AS stanza, s.curie AS subject, p.curie AS predicate, o.curie AS object,
+       t.value AS value, d.curie AS datatype, t.language AS language
+FROM {STATEMENTS_TABLE} AS t
+JOIN {DICTIONARY_TABLE} AS s ON s.id = t.subject
+JOIN {DICTIONARY_TABLE} AS p ON p.id = t.predicate
+LEFT JOIN {DICTIONARY_TABLE} AS st ON st.id = t.stanza
+LEFT JOIN {DICTIONARY_TABLE} AS o ON o.id = t.object
+LEFT JOIN {DICTIONARY_TABLE} AS d ON d.id = t.datatype
+"""
+
+ENTAILED_EDGE_SELECT = f"""
+SELECT s.curie AS subject, p.curie AS predicate, o.curie AS object
+FROM {ENTAILED_EDGE_TABLE} AS t
+JOIN {DICTIONARY_TABLE} AS s ON s.id = t.subject
+JOIN {DICTIONARY_TABLE} AS p ON p.id = t.predicate
+JOIN {DICTIONARY_TABLE} AS o ON o.id = t.object
+"""
+
+
+def _id(expr: str) -> str:
+    return f"(SELECT id FROM {DICTIONARY_TABLE} WHERE curie = {expr})"
+
+
+def _triggers(view: str, table: str, columns, node_columns) -> str:
+    new_nodes = ", ".join(f"(NEW.{c})" for c in node_columns)
+    new_values = ", ".join(_id(f"NEW.{c}") if c in node_columns else f"NEW.{c}" for c in columns)
+    old_match = " AND ".join(
+        f"{c} IS {_id(f'OLD.{c}')}" if c in node_columns else f"{c} IS OLD.{c}" for c in columns
+    )
+    return f"""
+CREATE TRIGGER {view}_insert INSTEAD OF INSERT ON {view}
+BEGIN
+    INSERT OR IGNORE INTO {DICTIONARY_TABLE}(curie) VALUES {new_nodes};
+    INSERT INTO {table} VALUES ({new_values});
+END;
+CREATE TRIGGER {view}_delete INSTEAD OF DELETE ON {view}
+BEGIN
+    DELETE FROM {table} WHERE {old_match};
+END;
+"""
+
+
+def is_interned(con: sqlite3.Connection) -> bool:
+    """
+    :param con:
+    :return: True if the db uses interned storage
+    """
+    row = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (DICTIONARY_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def _join_ids(table: str, columns, node_columns) -> str:
+    cols = []
+    joins = []
+    for c in columns:
+        if c in node_columns:
+            joins.append(f"LEFT JOIN {DICTIONARY_TABLE} AS n_{c} ON n_{c}.curie = t.{c}")
+            cols.append(f"n_{c}.id")
+        else:
+            cols.append(f"t.{c}")
+    return f"SELECT {', '.join(cols)} FROM {table} AS t {' '.join(joins)}"
+
+
+def intern_db(con: sqlite3.Connection, vacuum: bool = False) -> Dict[str, int]:
+    """
+    Convert statements and entailed_edge to interned storage, in a single transaction
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param vacuum: if True, reclaim the space used by the original tables
+    :return: counts of nodes, statements and entailed edges
+    """
+    if is_interned(con):
+        raise ValueError("Already interned")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for stmt in INTERNED_DDL.split(";"):
+            if stmt.strip():
+                con.execute(stmt)
+        node_selects = [f"SELECT {c} AS curie FROM statements" for c in STATEMENTS_NODE_COLUMNS] + [
+            f"SELECT {c} AS curie FROM entailed_edge" for c in ENTAILED_EDGE_COLUMNS
+        ]
+        con.execute(
+            f"INSERT INTO {DICTIONARY_TABLE}(curie) SELECT curie FROM "
+            f"({' UNION '.join(node_selects)}) WHERE curie IS NOT NULL ORDER BY curie"
+        )
+        con.execute(
+            f"INSERT INTO {STATEMENTS_TABLE} "
+            f"{_join_ids('statements', STATEMENTS_COLUMNS, STATEMENTS_NODE_COLUMNS)}"
+        )
+        con.execute(
+            f"INSERT INTO {ENTAILED_EDGE_TABLE} "
+            f"{_join_ids('entailed_edge', ENTAILED_EDGE_COLUMNS, ENTAILED_EDGE_COLUMNS)}"
+        )
+        con.execute("DROP TABLE statements")
+        con.execute("DROP TABLE entailed_edge")
+        con.execute(f"CREATE VIEW statements AS {STATEMENTS_SELECT}")
+        con.execute(f"CREATE VIEW entailed_edge AS {ENTAILED_EDGE_SELECT}")
+        script = INTERNED_INDEXES + _triggers(
+            "statements", STATEMENTS_TABLE, STATEMENTS_COLUMNS, STATEMENTS_NODE_COLUMNS
+        ) + _triggers("entailed_edge", ENTAILED_EDGE_TABLE, ENTAILED_EDGE_COLUMNS, ENTAILED_EDGE_COLUMNS)
+        for stmt in _split_script(script):
+            con.execute(stmt)
+        counts = {
+            "nodes": con.execute(f"SELECT COUNT(*) FROM {DICTIONARY_TABLE}").fetchone()[0],
+            "statements": con.execute(f"SELECT COUNT(*) FROM {STATEMENTS_TABLE}").fetchone()[0],
+            "entailed_edges": con.execute(f"SELECT COUNT(*) FROM {ENTAILED_EDGE_TABLE}").fetchone()[0],
+        }
+        con.execute("ANALYZE")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    logging.info(f"Interned {counts}")
+    if vacuum:
+        con.execute("VACUUM")
+    return counts
+
+
+def expand_db(con: sqlite3.Connection, vacuum: bool = False):
+    """
+    Convert interned storage back to plain statements and entailed_edge tables
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param vacuum: if True, reclaim the space used by the interned tables
+    """
+    if not is_interned(con):
+        raise ValueError("Not interned")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("DROP VIEW statements")
+        con.execute("DROP VIEW entailed_edge")
+        con.execute(f"CREATE TABLE statements ({', '.join(f'{c} TEXT' for c in STATEMENTS_COLUMNS)})")
+        con.execute(f"CREATE TABLE entailed_edge ({', '.join(f'{c} TEXT' for c in ENTAILED_EDGE_COLUMNS)})")
+        con.execute(f"INSERT INTO statements {STATEMENTS_SELECT}")
+        con.execute(f"INSERT INTO entailed_edge {ENTAILED_EDGE_SELECT}")
+        for table in [STATEMENTS_TABLE, ENTAILED_EDGE_TABLE, DICTIONARY_TABLE]:
+            con.execute(f"DROP TABLE {table}")
+        for stmt in _split_script(INDEXES.read_text()):
+            con.execute(stmt)
+        con.execute("ANALYZE")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    if vacuum:
+        con.execute("VACUUM")
+
+
+def _split_script(script: str):
+    """
+    Split a script into statements, keeping trigger bodies together
+    """
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            yield stmt.strip()
+            stmt = ""
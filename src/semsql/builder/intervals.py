@@ -0,0 +1,271 @@
+"""
+Compact encoding of entailed_edge as interval labels
+
+Nodes are numbered in postorder, from a depth-first traversal of the asserted
+subclass hierarchy starting at the roots, so that the descendants of a class in
+the spanning tree have consecutive numbers.
+
+For each node and predicate, the set of entailed descendants is stored as runs
+of consecutive numbers in ``closure_interval``. This is exact for any
+predicate, as the hierarchy only determines the order; the closer the closure
+of a predicate follows the hierarchy, the fewer runs are needed. For
+rdfs:subClassOf on a tree-like ontology most classes need a single run, in
+place of one row per descendant.
+
+- a subsumption test is a lookup on the (node, predicate, lo) key of closure_interval
+- descendants are range scans over the numbering
+- ancestors are the intervals containing a node's number, which are found with
+  an R*Tree (``closure_interval_rtree``) that shares ids with closure_interval
+
+The ``interval_entailed_edge`` view has the same columns as entailed_edge. It
+joins both, so that, like entailed_edge with its standard indexes, it is
+efficient to query by subject (through the R*Tree) or by object (through the
+node key of closure_interval).
+"""
+import itertools
+import logging
+import sqlite3
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+POSTORDER_TABLE = "closure_postorder"
+INTERVAL_TABLE = "closure_interval"
+RTREE_TABLE = "closure_interval_rtree"
+VIEW = "interval_entailed_edge"
+
+BATCH_SIZE = 100000
+
+DDL = f"""
+CREATE TABLE {POSTORDER_TABLE} (
+    curie TEXT PRIMARY KEY,
+    post INTEGER UNIQUE NOT NULL
+);
+CREATE TABLE {INTERVAL_TABLE} (
+    id INTEGER PRIMARY KEY,
+    node INTEGER NOT NULL,
+    predicate TEXT NOT NULL,
+    lo INTEGER NOT NULL,
+    hi INTEGER NOT NULL,
+    UNIQUE (node, predicate, lo)
+);
+CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree_i32(id, lo, hi);
+CREATE VIEW {VIEW} AS
+SELECT s.curie AS subject, i.predicate AS predicate, o.curie AS object
+FROM {POSTORDER_TABLE} AS s, {RTREE_TABLE} AS r, {INTERVAL_TABLE} AS i, {POSTORDER_TABLE} AS o
+WHERE r.lo <= s.post AND r.hi >= s.post AND i.id = r.id AND s.post BETWEEN i.lo AND i.hi AND o.post = i.node;
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def postorder(nodes: Iterable[str], children: Dict[str, List[str]]) -> Dict[str, int]:
+    """
+    Number nodes in depth-first postorder, starting from nodes with no parents
+
+    Each node is visited once, so in a DAG the numbering follows a spanning tree
+
+    :param nodes: all nodes to number
+    :param children: adjacency
+    :return: number for each node
+    """
+    has_parent = {c for cs in children.values() for c in cs}
+    nodes = sorted(set(nodes))
+    roots = [n for n in nodes if n not in has_parent]
+    order = {}
+    visited = set()
+    # nodes in cycles with no root above them are reached from the second pass
+    for root in itertools.chain(roots, nodes):
+        if root in visited:
+            continue
+        visited.add(root)
+        stack = [(root, iter(children.get(root, [])))]
+        while stack:
+            node, it = stack[-1]
+            for c in it:
+                if c not in visited:
+                    visited.add(c)
+                    stack.append((c, iter(children.get(c, []))))
+                    break
+            else:
+                stack.pop()
+                order[node] = len(order)
+    return order
+
+
+def runs(numbers: Iterable[int]) -> Iterator[Tuple[int, int]]:
+    """
+    Encode a set of numbers as runs of consecutive numbers
+
+    :param numbers:
+    :return: (lo, hi) pairs, inclusive
+    """
+    lo = hi = None
+    for n in sorted(set(numbers)):
+        if hi is not None and n == hi + 1:
+            hi = n
+            continue
+        if lo is not None:
+            yield lo, hi
+        lo = hi = n
+    if lo is not None:
+        yield lo, hi
+
+
+def _intervals(con: sqlite3.Connection, numbering: Dict[str, int]) -> Iterator[Tuple[int, int, str, int, int]]:
+    cur = con.execute("SELECT object, predicate, subject FROM entailed_edge ORDER BY object, predicate")
+    ids = itertools.count(1)
+    for (node, predicate), rows in itertools.groupby(cur, key=lambda r: (r[0], r[1])):
+        for lo, hi in runs(numbering[r[2]] for r in rows):
+            yield next(ids), numbering[node], predicate, lo, hi
+
+
+def build_interval_index(con: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Encode entailed_edge as interval labels, replacing any existing encoding
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :return: counts of entailed edges, nodes and intervals
+    """
+    if _entailed_edge_type(con) != "table" and is_replaced(con):
+        raise ValueError("entailed_edge has been replaced by the interval encoding")
+    children = defaultdict(list)
+    for s, o in con.execute(
+        "SELECT DISTINCT subject, object FROM rdfs_subclass_of_named_statement ORDER BY subject, object"
+    ):
+        children[o].append(s)
+    nodes = {
+        n
+        for (n,) in con.execute(
+            "SELECT subject FROM entailed_edge UNION SELECT object FROM entailed_edge"
+        )
+    }
+    nodes.update(children)
+    nodes.update(c for cs in children.values() for c in cs)
+    numbering = postorder(nodes, children)
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute(f"DROP VIEW IF EXISTS {VIEW}")
+        for table in [RTREE_TABLE, INTERVAL_TABLE, POSTORDER_TABLE]:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+        for stmt in DDL.split(";"):
+            if stmt.strip():
+                con.execute(stmt)
+        con.executemany(f"INSERT INTO {POSTORDER_TABLE} VALUES (?,?)", numbering.items())
+        n = 0
+        rows = _intervals(con, numbering)
+        while True:
+            batch = list(itertools.islice(rows, BATCH_SIZE))
+            if not batch:
+                break
+            con.executemany(f"INSERT INTO {INTERVAL_TABLE} VALUES (?,?,?,?,?)", batch)
+            con.executemany(
+                f"INSERT INTO {RTREE_TABLE}(id, lo, hi) VALUES (?,?,?)",
+                ((id, lo, hi) for id, _, _, lo, hi in batch),
+            )
+            n += len(batch)
+        (edges,) = con.execute("SELECT COUNT(*) FROM entailed_edge").fetchone()
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    logger.info(f"Encoded {edges} entailed edges as {n} intervals over {len(nodes)} nodes")
+    return {"entailed_edges": edges, "nodes": len(nodes), "intervals": n}
+
+
+def _entailed_edge_type(con: sqlite3.Connection) -> Optional[str]:
+    row = con.execute("SELECT type FROM sqlite_master WHERE name='entailed_edge'").fetchone()
+    return row[0] if row else None
+
+
+def is_replaced(con: sqlite3.Connection) -> bool:
+    """
+    :param con:
+    :return: True if entailed_edge is a view over the interval encoding
+    """
+    row = con.execute("SELECT sql FROM sqlite_master WHERE name='entailed_edge'").fetchone()
+    return row is not None and VIEW in row[0]
+
+
+def replace_entailed_edge(con: sqlite3.Connection):
+    """
+    Drop the entailed_edge table, replacing it with a view over the interval encoding
+
+    The closure can no longer be updated in place after this
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    """
+    if _entailed_edge_type(con) != "table":
+        raise ValueError("entailed_edge is not a table")
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name=?", (VIEW,)).fetchone() is None:
+        raise ValueError("No interval encoding; run build_interval_index first")
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("DROP TABLE entailed_edge")
+        con.execute(f"CREATE VIEW entailed_edge AS SELECT * FROM {VIEW}")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+
+
+class IntervalIndex:
+    """
+    Closure queries over an interval encoding built with build_interval_index
+    """
+
+    def __init__(self, con: sqlite3.Connection):
+        self.con = con
+
+    def _predicate_filter(self, alias: str, predicates: Optional[List[str]]) -> Tuple[str, List[str]]:
+        if predicates is None:
+            return "", []
+        return f" AND {alias}.predicate IN ({','.join('?' * len(predicates))})", list(predicates)
+
+    def ancestors(self, node: str, predicates: Optional[List[str]] = None) -> Set[str]:
+        """
+        :param node:
+        :param predicates: if set, only follow entailed edges with these predicates
+        :return: entailed ancestors, i.e. objects of entailed edges from node
+        """
+        where, params = self._predicate_filter("i", predicates)
+        rows = self.con.execute(
+            f"SELECT DISTINCT a.curie FROM {POSTORDER_TABLE} AS n "
+            f"CROSS JOIN {RTREE_TABLE} AS r ON r.lo <= n.post AND r.hi >= n.post "
+            f"CROSS JOIN {INTERVAL_TABLE} AS i ON i.id = r.id "
+            f"JOIN {POSTORDER_TABLE} AS a ON a.post = i.node "
+            f"WHERE n.curie = ?{where}",
+            [node] + params,
+        )
+        return {r[0] for r in rows}
+
+    def descendants(self, node: str, predicates: Optional[List[str]] = None) -> Set[str]:
+        """
+        :param node:
+        :param predicates: if set, only follow entailed edges with these predicates
+        :return: entailed descendants, i.e. subjects of entailed edges to node
+        """
+        where, params = self._predicate_filter("i", predicates)
+        rows = self.con.execute(
+            f"SELECT DISTINCT d.curie FROM {POSTORDER_TABLE} AS n "
+            f"JOIN {INTERVAL_TABLE} AS i ON i.node = n.post "
+            f"JOIN {POSTORDER_TABLE} AS d ON d.post BETWEEN i.lo AND i.hi "
+            f"WHERE n.curie = ?{where}",
+            [node] + params,
+        )
+        return {r[0] for r in rows}
+
+    def is_ancestor(self, ancestor: str, descendant: str, predicates: Optional[List[str]] = None) -> bool:
+        """
+        :param ancestor:
+        :param descendant:
+        :param predicates: if set, only follow entailed edges with these predicates
+        :return: True if there is an entailed edge from descendant to ancestor
+        """
+        where, params = self._predicate_filter("i", predicates)
+        row = self.con.execute(
+            f"SELECT 1 FROM {POSTORDER_TABLE} AS a, {POSTORDER_TABLE} AS d "
+            f"JOIN {INTERVAL_TABLE} AS i ON i.node = a.post AND i.lo <= d.post AND i.hi >= d.post "
+            f"WHERE a.curie = ? AND d.curie = ?{where} LIMIT 1",
+            [ancestor, descendant] + params,
+        ).fetchone()
+        return row is not None
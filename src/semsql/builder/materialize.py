@@ -0,0 +1,234 @@
+"""
+Materialization of expensive views as indexed tables
+
+A profile names a set of views together with the ways they are typically
+queried (access patterns). Each view is replaced by a table with the same name
+and columns, so existing queries continue to work, and composite covering
+indexes are chosen from the access patterns. All views in a profile are
+materialized in a single transaction.
+
+What was materialized is recorded in the ``materialized_view`` table, including
+the original view definition, so that materialized tables can be refreshed
+(e.g. after the closure is updated) or turned back into views.
+"""
+import logging
+import re
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+METADATA_TABLE = "materialized_view"
+
+CREATE_METADATA_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+    name TEXT PRIMARY KEY,
+    view_sql TEXT NOT NULL,
+    profile TEXT,
+    indexes TEXT,
+    row_count INTEGER,
+    seconds REAL,
+    materialized_at TEXT
+)
+"""
+
+VIEW_PREFIX = re.compile(r"^\s*CREATE\s+VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?\S+\s+AS\s+", re.I | re.S)
+
+
+@dataclass
+class AccessPattern:
+    """
+    A way in which a view is queried: a lookup on some columns, returning others
+    """
+
+    lookup: Tuple[str, ...]
+    returns: Tuple[str, ...] = ()
+
+
+@dataclass
+class MaterializedView:
+    """
+    A view to materialize, with the access patterns used to choose indexes
+    """
+
+    name: str
+    access_patterns: List[AccessPattern] = field(default_factory=list)
+
+
+def _spo(*cols):
+    return AccessPattern(tuple(cols), tuple(c for c in ("subject", "predicate", "object") if c not in cols))
+
+
+PROFILES: Dict[str, List[MaterializedView]] = {
+    # views are listed in dependency order, so that refreshes see fresh inputs
+    "obo-default": [
+        MaterializedView(
+            "rdfs_label_statement",
+            [
+                AccessPattern(("subject",), ("value",)),
+                AccessPattern(("value",), ("subject",)),
+            ],
+        ),
+        MaterializedView(
+            "owl_subclass_of_some_values_from",
+            [_spo("subject", "predicate"), _spo("object", "predicate")],
+        ),
+        MaterializedView(
+            "edge",
+            [_spo("subject", "predicate"), _spo("object", "predicate"), _spo("predicate")],
+        ),
+        MaterializedView(
+            "rdf_list_member_statement",
+            [AccessPattern(("subject",), ("object",)), AccessPattern(("object",), ("subject",))],
+        ),
+    ],
+}
+
+
+def select_indexes(access_patterns: List[AccessPattern]) -> List[Tuple[str, ...]]:
+    """
+    Choose composite covering indexes for a set of access patterns
+
+    Each pattern gets an index on its lookup columns followed by its returned
+    columns, so it can be answered from the index alone. Indexes that are a
+    prefix of another index are redundant and dropped.
+
+    :param access_patterns:
+    :return: column tuples, one per index
+    """
+    candidates = []
+    for ap in access_patterns:
+        cols = tuple(ap.lookup) + tuple(c for c in ap.returns if c not in ap.lookup)
+        if cols and cols not in candidates:
+            candidates.append(cols)
+    return [
+        cols
+        for cols in candidates
+        if not any(other != cols and other[: len(cols)] == cols for other in candidates)
+    ]
+
+
+def get_materialized(con: sqlite3.Connection) -> Dict[str, Dict]:
+    """
+    Get the views that have been materialized in a db
+
+    :param con:
+    :return: metadata, keyed by view name
+    """
+    exists = con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (METADATA_TABLE,)
+    ).fetchone()
+    if not exists:
+        return {}
+    cur = con.execute(f"SELECT * FROM {METADATA_TABLE}")
+    cols = [d[0] for d in cur.description]
+    return {row[0]: dict(zip(cols, row)) for row in cur}
+
+
+def _view_select(con: sqlite3.Connection, name: str) -> Optional[str]:
+    row = con.execute(
+        "SELECT sql FROM sqlite_master WHERE type='view' AND name=?", (name,)
+    ).fetchone()
+    if row is None:
+        return None
+    return VIEW_PREFIX.sub("", row[0], count=1)
+
+
+def _index_name(view: str, cols: Tuple[str, ...]) -> str:
+    return f"{view}_{'_'.join(cols)}"
+
+
+def materialize(
+    con: sqlite3.Connection,
+    views: List[MaterializedView],
+    profile: Optional[str] = None,
+    index: bool = True,
+) -> Dict[str, int]:
+    """
+    Materialize views as tables, in a single transaction
+
+    Views that are already materialized are refreshed from their stored definition
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param views:
+    :param profile: name of the profile, recorded in the metadata table
+    :param index: if True, create indexes chosen from access patterns
+    :return: number of rows, keyed by view name
+    """
+    counts = {}
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute(CREATE_METADATA_TABLE)
+        existing = get_materialized(con)
+        for mv in views:
+            start = time.perf_counter()
+            if mv.name in existing:
+                select = existing[mv.name]["view_sql"]
+                con.execute(f"DELETE FROM {mv.name}")
+                con.execute(f"INSERT INTO {mv.name} {select}")
+            else:
+                select = _view_select(con, mv.name)
+                if select is None:
+                    raise ValueError(f"No such view: {mv.name}")
+                con.execute(f"DROP VIEW {mv.name}")
+                con.execute(f"CREATE TABLE {mv.name} AS {select}")
+            indexes = select_indexes(mv.access_patterns) if index else []
+            for cols in indexes:
+                con.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_index_name(mv.name, cols)} "
+                    f"ON {mv.name}({','.join(cols)})"
+                )
+            (n,) = con.execute(f"SELECT COUNT(*) FROM {mv.name}").fetchone()
+            seconds = time.perf_counter() - start
+            logging.info(f"Materialized {mv.name}: {n} rows in {seconds:.2f}s")
+            con.execute(
+                f"INSERT OR REPLACE INTO {METADATA_TABLE} VALUES (?,?,?,?,?,?,datetime('now'))",
+                (mv.name, select, profile, ";".join(",".join(c) for c in indexes), n, seconds),
+            )
+            counts[mv.name] = n
+        con.execute("ANALYZE")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return counts
+
+
+def materialize_profile(con: sqlite3.Connection, profile: str, index: bool = True) -> Dict[str, int]:
+    """
+    Materialize all views in a named profile
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param profile: key in PROFILES
+    :param index:
+    :return: number of rows, keyed by view name
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile: {profile}; must be one of {list(PROFILES)}")
+    return materialize(con, PROFILES[profile], profile=profile, index=index)
+
+
+def dematerialize(con: sqlite3.Connection, names: Optional[List[str]] = None) -> List[str]:
+    """
+    Turn materialized tables back into views, in a single transaction
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param names: views to restore; defaults to all materialized views
+    :return: names of restored views
+    """
+    materialized = get_materialized(con)
+    if names is None:
+        names = list(materialized)
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        for name in names:
+            if name not in materialized:
+                raise ValueError(f"Not materialized: {name}")
+            con.execute(f"DROP TABLE {name}")
+            con.execute(f"CREATE VIEW {name} AS {materialized[name]['view_sql']}")
+            con.execute(f"DELETE FROM {METADATA_TABLE} WHERE name=?", (name,))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return names
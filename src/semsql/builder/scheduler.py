@@ -0,0 +1,242 @@
+"""
+Parallel, memory-aware build of all ontologies in a registry
+
+Each ontology is built in stages (download, closure, db); stages of different
+ontologies run concurrently on a pool of workers. A stage is only started if
+the sum of the estimated memory of all running stages stays within a limit,
+and larger ontologies are scheduled first, so that the long-running builds
+(e.g. phenio, efo) start early and are not left until the end.
+
+Ontologies that are fetched directly are downloaded with a conditional request,
+so an unchanged file is not fetched or touched again, and make does not rebuild
+from it. Ontologies merged with robot cannot be checked this way; an existing
+file is reused unless refresh is set.
+"""
+import logging
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import semsql.builder.builder as builder
+from semsql.builder import download
+from semsql.builder.registry import registry_schema
+
+DOWNLOAD = "download"
+CLOSURE = "closure"
+DB = "db"
+
+# Memory estimates, in bytes. Building a db (rdftab, relation-graph) uses memory
+# roughly proportional to the size of the RDF/XML input.
+DOWNLOAD_MEMORY = 512 * 1024**2
+MIN_BUILD_MEMORY = 1024**3
+BUILD_MEMORY_PER_INPUT_BYTE = 10
+
+UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageResult:
+    """
+    Outcome of running one build stage for one ontology
+    """
+
+    ontology: str
+    stage: str
+    success: bool
+    attempts: int
+    seconds: float
+
+
+def parse_memory(mem: str) -> int:
+    """
+    Parse a memory size such as 32g or 512M
+
+    :param mem:
+    :return: number of bytes
+    """
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kmgt]?)b?\s*", mem.lower())
+    if not m:
+        raise ValueError(f"Cannot parse memory size: {mem}")
+    return int(float(m.group(1)) * UNITS[m.group(2)])
+
+
+class BuildScheduler:
+    """
+    Schedules the stages of building many ontology dbs across a worker pool
+    """
+
+    def __init__(
+        self,
+        ontologies: List[registry_schema.Ontology],
+        directory: str = "db",
+        jobs: int = 1,
+        max_memory: Optional[int] = None,
+        retries: int = 1,
+        native_closure: bool = False,
+        refresh: bool = False,
+        runner: Callable[[registry_schema.Ontology, str], bool] = None,
+    ):
+        """
+        :param ontologies: ontologies to build, typically from a registry
+        :param directory: directory for owl and db files
+        :param jobs: maximum number of stages to run concurrently
+        :param max_memory: maximum total estimated memory, in bytes, of running stages
+        :param retries: number of times to retry a failed stage
+        :param native_closure: compute entailed edges in-process instead of with relation-graph
+        :param refresh: fetch every ontology again, even if unchanged or already merged
+        :param runner: function that runs a stage for an ontology, returning True on success;
+            defaults to running the commands for each stage
+        """
+        self.ontologies = {str(ont.id): ont for ont in ontologies}
+        self.directory = directory
+        self.jobs = jobs
+        self.max_memory = max_memory
+        self.retries = retries
+        self.native_closure = native_closure
+        self.refresh = refresh
+        self.runner = runner if runner is not None else self.run_stage
+        if native_closure:
+            self.stages = [DOWNLOAD, DB]
+        else:
+            self.stages = [DOWNLOAD, CLOSURE, DB]
+
+    def owl_path(self, ont_id: str) -> str:
+        return os.path.join(self.directory, f"{ont_id}.owl")
+
+    def estimate_memory(self, ont_id: str, stage: str) -> int:
+        """
+        Estimate the memory used by a stage
+
+        :param ont_id:
+        :param stage:
+        :return: bytes
+        """
+        if stage == DOWNLOAD:
+            return DOWNLOAD_MEMORY
+        path = self.owl_path(ont_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        return max(MIN_BUILD_MEMORY, size * BUILD_MEMORY_PER_INPUT_BYTE)
+
+    def run_stage(self, ont: registry_schema.Ontology, stage: str) -> bool:
+        """
+        Run the commands for a stage
+
+        :param ont:
+        :param stage:
+        :return: True if successful
+        """
+        ont_id = str(ont.id)
+        if stage == DOWNLOAD:
+            return self.download(ont)
+        if stage == CLOSURE:
+            target = os.path.join(self.directory, f"{ont_id}-relation-graph.tsv")
+        else:
+            target = os.path.join(self.directory, f"{ont_id}.db")
+        proc = builder.make(target, native_closure=self.native_closure)
+        return proc.returncode == 0
+
+    def download(self, ont: registry_schema.Ontology) -> bool:
+        """
+        Fetch an ontology as RDF/XML
+
+        :param ont:
+        :return: True if successful
+        """
+        ont_id = str(ont.id)
+        path = self.owl_path(ont_id)
+        if builder.needs_merge(ont):
+            if os.path.exists(path) and not self.refresh:
+                return True
+            cmd = builder.download_command(ont).replace("$@", path)
+            logging.info(f"CMD={cmd}")
+            return subprocess.run(cmd, shell=True).returncode == 0
+        result = download.download_url(ont_id, str(ont.url), path, force=self.refresh)
+        logger.info(f"{ont_id} {result.status}")
+        return True
+
+    def run(self) -> List[StageResult]:
+        """
+        Build all ontologies
+
+        :return: results for every stage run, in order of completion
+        """
+        if self.runner == self.run_stage and self.ontologies:
+            # the template db is shared by all builds, so make it once up front
+            os.makedirs(self.directory, exist_ok=True)
+            builder.make(".template.db")
+        results = []
+        ready = [(ont_id, 0, 1) for ont_id in self.ontologies]
+        running = {}
+        used_memory = 0
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            while ready or running:
+                ready.sort(
+                    key=lambda t: self.estimate_memory(t[0], self.stages[t[1]]),
+                    reverse=True,
+                )
+                for task in list(ready):
+                    if len(running) >= self.jobs:
+                        break
+                    ont_id, stage_ix, attempt = task
+                    mem = self.estimate_memory(ont_id, self.stages[stage_ix])
+                    if (
+                        running
+                        and self.max_memory is not None
+                        and used_memory + mem > self.max_memory
+                    ):
+                        continue
+                    ready.remove(task)
+                    used_memory += mem
+                    future = executor.submit(
+                        self._timed, self.ontologies[ont_id], self.stages[stage_ix]
+                    )
+                    running[future] = (task, mem)
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    (ont_id, stage_ix, attempt), mem = running.pop(future)
+                    used_memory -= mem
+                    stage = self.stages[stage_ix]
+                    success, seconds = future.result()
+                    logger.info(
+                        f"{ont_id} {stage} {'done' if success else 'FAILED'} in {seconds:.1f}s"
+                    )
+                    results.append(StageResult(ont_id, stage, success, attempt, seconds))
+                    if success:
+                        if stage_ix + 1 < len(self.stages):
+                            ready.append((ont_id, stage_ix + 1, 1))
+                    elif attempt <= self.retries:
+                        ready.append((ont_id, stage_ix, attempt + 1))
+        return results
+
+    def _timed(self, ont: registry_schema.Ontology, stage: str):
+        start = time.perf_counter()
+        try:
+            success = self.runner(ont, stage)
+        except Exception as e:
+            logger.error(f"Error in {stage} for {ont.id}: {e}")
+            success = False
+        return success, time.perf_counter() - start
+
+
+def report(results: List[StageResult]) -> str:
+    """
+    Summarize results as TSV, one row per ontology and stage
+
+    :param results:
+    :return:
+    """
+    rows = ["ontology\tstage\tsuccess\tattempts\tseconds"]
+    totals: Dict[str, float] = {}
+    for r in results:
+        totals[r.stage] = totals.get(r.stage, 0) + r.seconds
+    for r in sorted(results, key=lambda r: r.ontology):
+        rows.append(f"{r.ontology}\t{r.stage}\t{r.success}\t{r.attempts}\t{r.seconds:.2f}")
+    for stage, seconds in totals.items():
+        rows.append(f"TOTAL\t{stage}\t\t\t{seconds:.2f}")
+    return "\n".join(rows)
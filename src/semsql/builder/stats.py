@@ -0,0 +1,95 @@
+"""
+Statistics for semsql dbs
+
+Builds run ``ANALYZE``, so that ``sqlite_stat1`` is shipped with every db and
+the query planner can tell selective indexes (e.g. statements_spo for a
+subject lookup) from unselective ones (e.g. statements_p). This module reports
+those statistics, together with per-predicate cardinalities, which is what
+the planner's estimates should be compared against.
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class PredicateStats:
+    """
+    Cardinalities for one predicate in a table with subject, predicate and object columns
+    """
+
+    predicate: str
+    rows: int
+    subjects: int
+    objects: int
+    """distinct objects, or distinct literal values"""
+
+
+@dataclass
+class IndexStats:
+    """
+    Planner statistics for one index, from sqlite_stat1
+    """
+
+    table: str
+    index: Optional[str]
+    rows: int
+    rows_per_key: List[int]
+    """estimated rows matching a value for the first column, first two columns, etc"""
+
+
+def has_statistics(con: sqlite3.Connection) -> bool:
+    """
+    :param con:
+    :return: True if ANALYZE has been run on the db
+    """
+    return (
+        con.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone()
+        is not None
+    )
+
+
+def analyze(con: sqlite3.Connection):
+    """
+    Gather planner statistics for all tables and indexes
+
+    :param con:
+    """
+    con.execute("ANALYZE")
+    con.commit()
+
+
+def predicate_stats(con: sqlite3.Connection, table: str = "statements") -> List[PredicateStats]:
+    """
+    Count rows, distinct subjects and distinct objects for each predicate
+
+    :param con:
+    :param table: statements or entailed_edge
+    :return: most frequent predicates first
+    """
+    cols = [r[1] for r in con.execute(f"PRAGMA table_info({table})")]
+    obj = "COALESCE(object, value)" if "value" in cols else "object"
+    rows = con.execute(
+        f"SELECT predicate, COUNT(*), COUNT(DISTINCT subject), COUNT(DISTINCT {obj}) "
+        f"FROM {table} GROUP BY predicate ORDER BY COUNT(*) DESC, predicate"
+    )
+    return [PredicateStats(*row) for row in rows]
+
+
+def index_stats(con: sqlite3.Connection) -> List[IndexStats]:
+    """
+    Read planner statistics gathered by ANALYZE
+
+    :param con:
+    :return: empty if ANALYZE has not been run
+    """
+    if not has_statistics(con):
+        return []
+    stats = []
+    for tbl, idx, stat in con.execute("SELECT tbl, idx, stat FROM sqlite_stat1 ORDER BY tbl, idx"):
+        # stat may end with options such as "unordered"
+        nums = [int(x) for x in stat.split() if x.isdigit()]
+        if not nums:
+            continue
+        stats.append(IndexStats(tbl, idx, nums[0], nums[1:]))
+    return stats
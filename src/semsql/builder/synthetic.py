@@ -0,0 +1,208 @@
+"""
+Generator for synthetic ontologies of any size, written directly as semsql dbs
+
+The db is created from the same DDL as real builds (sql_schema/semsql.sql) and
+statements follow rdftab conventions (stanzas, blank nodes for restrictions and
+axiom annotations, xsd:string literals), so all views work as on a real ontology.
+
+Classes form a DAG: class i has a primary parent chosen so that each class has
+on average ``branching_factor`` children, and with some probability a second,
+randomly chosen, earlier parent. Existential restrictions (part of some X) also
+only point to earlier classes, so the graph is acyclic.
+"""
+import csv
+import itertools
+import logging
+import random
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from semsql.builder.closure import compute_entailed_edges
+
+THIS_DIR = Path(__file__).parent
+DDL = THIS_DIR / "sql_schema" / "semsql.sql"
+INDEXES = THIS_DIR / "indexes" / "all-indexes.sql"
+PREFIXES = THIS_DIR / "prefixes" / "prefixes.csv"
+
+PART_OF = "BFO:0000050"
+DEFINITION = "IAO:0000115"
+SYNONYM_PREDICATES = [
+    "oio:hasExactSynonym",
+    "oio:hasRelatedSynonym",
+    "oio:hasBroadSynonym",
+    "oio:hasNarrowSynonym",
+]
+XSD_STRING = "xsd:string"
+WORDS = [
+    "cell", "membrane", "nucleus", "process", "region", "complex", "part",
+    "organ", "tissue", "layer", "system", "structure", "protein", "binding",
+    "activity", "transport", "signal", "development", "response", "component",
+]
+BATCH_SIZE = 100000
+
+STATEMENT = Tuple[str, str, str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyntheticConfig:
+    """
+    Parameters for a synthetic ontology
+    """
+
+    num_classes: int = 1000
+    branching_factor: float = 4.0
+    """mean number of direct subclasses per class"""
+    multi_parent_probability: float = 0.2
+    """probability a class has a second named parent"""
+    existential_density: float = 0.3
+    """mean number of part of some restrictions per class"""
+    synonyms_per_class: float = 1.0
+    definition_probability: float = 0.8
+    axiom_annotation_probability: float = 0.5
+    """probability a definition or synonym has an axiom annotation with a xref"""
+    prefix: str = "SYN"
+    seed: int = 42
+
+    def statements_per_class(self) -> float:
+        """
+        :return: expected number of statements per class
+        """
+        per_annotation = 1 + self.axiom_annotation_probability * 5
+        return (
+            3  # type, label, primary subClassOf
+            + self.multi_parent_probability
+            + self.existential_density * 4
+            + (self.synonyms_per_class + self.definition_probability) * per_annotation
+        )
+
+    @classmethod
+    def for_statements(cls, num_statements: int, **kwargs) -> "SyntheticConfig":
+        """
+        Config with enough classes for approximately the given number of statements
+
+        :param num_statements:
+        :param kwargs: other parameters
+        :return:
+        """
+        config = cls(**kwargs)
+        config.num_classes = max(2, int(num_statements / config.statements_per_class()))
+        return config
+
+
+class _Generator:
+    def __init__(self, config: SyntheticConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.bnode_counter = 0
+
+    def curie(self, i: int) -> str:
+        return f"{self.config.prefix}:{i:08d}"
+
+    def bnode(self) -> str:
+        self.bnode_counter += 1
+        return f"_:riog{self.bnode_counter:08d}"
+
+    def text(self, n: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(n))
+
+    def _count(self, mean: float) -> int:
+        n = int(mean)
+        return n + (self.rng.random() < mean - n)
+
+    def _annotated(self, c: str, predicate: str, value: str) -> Iterator[STATEMENT]:
+        yield c, c, predicate, None, value, XSD_STRING, None
+        if self.rng.random() < self.config.axiom_annotation_probability:
+            a = self.bnode()
+            yield c, a, "rdf:type", "owl:Axiom", None, None, None
+            yield c, a, "owl:annotatedSource", c, None, None, None
+            yield c, a, "owl:annotatedProperty", predicate, None, None, None
+            yield c, a, "owl:annotatedTarget", None, value, XSD_STRING, None
+            yield c, a, "oio:hasDbXref", None, f"PMID:{self.rng.randrange(10**7)}", XSD_STRING, None
+
+    def header(self) -> Iterator[STATEMENT]:
+        ont = f"obo:{self.config.prefix.lower()}.owl"
+        yield ont, ont, "rdf:type", "owl:Ontology", None, None, None
+        p = PART_OF
+        yield p, p, "rdf:type", "owl:ObjectProperty", None, None, None
+        yield p, p, "rdf:type", "owl:TransitiveProperty", None, None, None
+        yield p, p, "rdfs:label", None, "part of", XSD_STRING, None
+
+    def classes(self) -> Iterator[STATEMENT]:
+        cfg = self.config
+        for i in range(cfg.num_classes):
+            c = self.curie(i)
+            yield c, c, "rdf:type", "owl:Class", None, None, None
+            label = f"{self.text(2)} {i}"
+            yield c, c, "rdfs:label", None, label, XSD_STRING, None
+            if i > 0:
+                parents = {int((i - 1) / cfg.branching_factor)}
+                if self.rng.random() < cfg.multi_parent_probability:
+                    parents.add(self.rng.randrange(i))
+                for p in sorted(parents):
+                    yield c, c, "rdfs:subClassOf", self.curie(p), None, None, None
+                for _ in range(self._count(cfg.existential_density)):
+                    r = self.bnode()
+                    yield c, c, "rdfs:subClassOf", r, None, None, None
+                    yield c, r, "rdf:type", "owl:Restriction", None, None, None
+                    yield c, r, "owl:onProperty", PART_OF, None, None, None
+                    yield c, r, "owl:someValuesFrom", self.curie(self.rng.randrange(i)), None, None, None
+            for _ in range(self._count(cfg.synonyms_per_class)):
+                pred = self.rng.choice(SYNONYM_PREDICATES)
+                yield from self._annotated(c, pred, f"{self.text(2)} {label}")
+            if self.rng.random() < cfg.definition_probability:
+                yield from self._annotated(c, DEFINITION, f"A {label} that is {self.text(6)}.")
+
+
+def generate_db(
+    path: str,
+    config: Optional[SyntheticConfig] = None,
+    closure: bool = True,
+    indexes: bool = True,
+) -> Dict[str, int]:
+    """
+    Write a synthetic ontology as a new semsql db
+
+    :param path: db to create; must not already exist
+    :param config:
+    :param closure: if True, compute entailed_edge
+    :param indexes: if True, create the standard indexes
+    :return: counts of statements, classes and entailed edges
+    """
+    if config is None:
+        config = SyntheticConfig()
+    if Path(path).exists():
+        raise FileExistsError(path)
+    gen = _Generator(config)
+    con = sqlite3.connect(path)
+    try:
+        con.executescript(DDL.read_text())
+        with open(PREFIXES) as stream:
+            prefixes = [(r["prefix"], r["base"]) for r in csv.DictReader(stream)]
+        prefixes.append((config.prefix, f"http://purl.obolibrary.org/obo/{config.prefix}_"))
+        con.executemany("INSERT INTO prefix VALUES (?,?)", prefixes)
+        n = 0
+        batch = []
+        with con:
+            for row in itertools.chain(gen.header(), gen.classes()):
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    con.executemany("INSERT INTO statements VALUES (?,?,?,?,?,?,?)", batch)
+                    n += len(batch)
+                    batch = []
+            con.executemany("INSERT INTO statements VALUES (?,?,?,?,?,?,?)", batch)
+            n += len(batch)
+    finally:
+        con.close()
+    logger.info(f"Wrote {n} statements for {config.num_classes} classes")
+    stats = {"statements": n, "classes": config.num_classes, "entailed_edges": 0}
+    if closure:
+        stats["entailed_edges"] = compute_entailed_edges(path)
+    if indexes:
+        con = sqlite3.connect(path)
+        con.executescript(INDEXES.read_text())
+        con.close()
+    return stats
@@ -1,10 +1,77 @@
+"""
+Loads RDF/OWL files into the statements table of a semsql db, in-process
+
+Statements follow the same conventions as rdftab:
+
+- IRIs are contracted to CURIEs using the prefix table, choosing the longest
+  matching base; IRIs with no matching prefix are written as <IRI>
+- blank nodes are renamed _:riogNNNNNNNN
+- literals are written to value, with datatype (if given) or language
+- the stanza of a triple is its subject, or for a blank node, the named node
+  that (transitively) refers to it; for owl:Axiom annotations this is the
+  annotated source. Blank nodes that are not referred to by any named node
+  (e.g. general class axioms, SWRL rules) get the last predicate used with
+  the outermost blank node, e.g. owl:equivalentClass (this depends on the
+  order of triples in the input)
+
+N-Triples is parsed line by line with a dedicated parser; RDF/XML and Turtle are
+parsed with rdflib, with triples streamed into the db rather than held in a graph.
+
+Large N-Triples files can be parsed in parallel: the file is split into byte
+ranges aligned to line ends, each shard is parsed and contracted in a worker
+process, and the main process renames blank nodes and writes the rows.
+"""
+import csv
 import logging
-import subprocess
-from typing import List
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 import click
-from sqlalchemy import create_engine
-from sqlalchemy.sql import text
+
+from semsql.prefixes import PrefixTrie, read_prefixes
+
+THIS_DIR = Path(__file__).parent
+DDL = THIS_DIR / "builder" / "sql_schema" / "semsql.sql"
+PREFIXES = THIS_DIR / "builder" / "prefixes" / "prefixes.csv"
+
+BATCH_SIZE = 200000
+SHARD_SIZE = 32 * 1024 * 1024
+MAX_CACHE_SIZE = 1000000
+
+RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+RDF_TYPE = f"{RDF}type"
+OWL_ANNOTATED_SOURCE = "http://www.w3.org/2002/07/owl#annotatedSource"
+BNODE_PREFIX = "_:"
+
+# node: IRI, or _:label for a blank node; literal: (value, datatype IRI, language)
+NODE = str
+LITERAL = Tuple[str, Optional[str], Optional[str]]
+TRIPLE = Tuple[NODE, NODE, object]
+
+FORMATS = {
+    ".nt": "nt",
+    ".ntriples": "nt",
+    ".ttl": "turtle",
+    ".owl": "xml",
+    ".rdf": "xml",
+    ".xml": "xml",
+    ".owx": "xml",
+}
+
+NT_LINE = re.compile(
+    r'\s*(<[^>]*>|_:\S+)\s+(<[^>]*>)\s+'
+    r'(?:(<[^>]*>|_:\S+?)|"((?:[^"\\]|\\.)*)"(?:@([A-Za-z]+(?:-[A-Za-z0-9]+)*)|\^\^(<[^>]*>))?)'
+    r"\s*\.\s*(?:#.*)?$"
+)
+NT_ESCAPE = re.compile(r"\\(?:u([0-9A-Fa-f]{4})|U([0-9A-Fa-f]{8})|(.))")
+NT_ESCAPES = {"t": "\t", "b": "\b", "n": "\n", "r": "\r", "f": "\f", '"': '"', "'": "'", "\\": "\\"}
+
+logger = logging.getLogger(__name__)
 
 
 def get_sqlite_path(url: str) -> str:
@@ -16,24 +83,500 @@ def get_sqlite_path(url: str) -> str:
         return url
 
 
-def load_ddl(con, path: str):
-    with open(path, "r") as stream:
-        statement = text("\n".join(stream.readlines()))
-        print(f"s={statement}")
-        con.execute(statement)
+def _unescape(s: str) -> str:
+    if "\\" not in s:
+        return s
+
+    def _sub(m):
+        if m.group(3) is not None:
+            return NT_ESCAPES.get(m.group(3), m.group(0))
+        return chr(int(m.group(1) or m.group(2), 16))
+
+    return NT_ESCAPE.sub(_sub, s)
+
+
+def _node_token(token: str) -> NODE:
+    return _unescape(token[1:-1]) if token[0] == "<" else token
+
+
+def parse_ntriples(lines: Iterator[str]) -> Iterator[TRIPLE]:
+    """
+    Parse N-Triples
+
+    :param lines:
+    :return: (subject, predicate, object) triples; objects are nodes or LITERAL tuples
+    """
+    for n, line in enumerate(lines, start=1):
+        m = NT_LINE.match(line)
+        if m is None:
+            _check_blank(line, n)
+            continue
+        s, p, o, value, lang, dt = m.groups()
+        if o is not None:
+            o = _node_token(o)
+        else:
+            o = (_unescape(value), _node_token(dt) if dt else None, lang)
+        yield _node_token(s), _node_token(p), o
+
+
+def _check_blank(line: str, n: int):
+    if line.strip() and not line.lstrip().startswith("#"):
+        raise ValueError(f"Cannot parse N-Triples line {n}: {line}")
+
+
+def parse_rdflib(path: str, format: str, callback: Callable[[TRIPLE], None]):
+    """
+    Parse a file with rdflib, passing each triple to a callback as it is parsed
+
+    :param path:
+    :param format: rdflib format, e.g. xml or turtle
+    :param callback:
+    """
+    import rdflib
+
+    class _Sink(rdflib.Graph):
+        def add(self, triple):
+            s, p, o = triple
+            s = f"{BNODE_PREFIX}{s}" if isinstance(s, rdflib.BNode) else str(s)
+            if isinstance(o, rdflib.Literal):
+                o = (str(o), str(o.datatype) if o.datatype else None, o.language)
+            elif isinstance(o, rdflib.BNode):
+                o = f"{BNODE_PREFIX}{o}"
+            else:
+                o = str(o)
+            callback((s, str(p), o))
+            return self
+
+    _Sink().parse(path, format=format)
+
+
+class StatementWriter:
+    """
+    Writes triples to the statements table in batches, following rdftab conventions
+    """
+
+    def __init__(
+        self,
+        con: sqlite3.Connection,
+        trie: PrefixTrie,
+        batch_size: int = BATCH_SIZE,
+        table: str = "statements",
+    ):
+        """
+        :param con:
+        :param trie:
+        :param batch_size: rows per insert
+        :param table: table to write to, with the same columns as statements
+        """
+        self.con = con
+        self.trie = trie
+        self.batch_size = batch_size
+        self.table = table
+        self.batch = []
+        self.count = 0
+        (self.bnode_counter,) = con.execute(
+            f"SELECT COUNT(DISTINCT subject) FROM {table} WHERE subject LIKE '\\_:%' ESCAPE '\\'"
+        ).fetchone()
+        self.bnodes = {}
+        self.referrers = {}
+        self.root_predicates = {}
+        self.rdf_type = trie.contract(RDF_TYPE)
+        self.annotated_source = trie.contract(OWL_ANNOTATED_SOURCE)
+
+    def _node(self, n: NODE) -> str:
+        if n.startswith(BNODE_PREFIX):
+            b = self.bnodes.get(n)
+            if b is None:
+                self.bnode_counter += 1
+                b = f"_:riog{self.bnode_counter:08d}"
+                self.bnodes[n] = b
+            return b
+        return self.trie.contract(n)
+
+    def add(self, triple: TRIPLE):
+        s, p, o = triple
+        s = self._node(s)
+        is_bnode = s.startswith(BNODE_PREFIX)
+        pc = self.trie.contract(p)
+        if is_bnode and p != RDF_TYPE:
+            self.root_predicates[s] = pc
+        if isinstance(o, tuple):
+            value, dt, lang = o
+            dt = self.trie.contract(dt) if dt and not lang else None
+            row = (None if is_bnode else s, s, pc, None, value, dt, lang or None)
+        else:
+            o = self._node(o)
+            if o.startswith(BNODE_PREFIX):
+                self.referrers.setdefault(o, s)
+            elif is_bnode and p == OWL_ANNOTATED_SOURCE:
+                self.referrers.setdefault(s, o)
+            row = (None if is_bnode else s, s, pc, o, None, None, None)
+        self.batch.append(row)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def add_ntriples(self, lines: Iterator[str]):
+        """
+        Parse and add N-Triples
+
+        Equivalent to calling add for each triple from parse_ntriples, but faster,
+        as contracted IRIs are cached by their N-Triples token
+
+        :param lines:
+        """
+        match = NT_LINE.match
+        tokens = {}
+        bnodes = self.bnodes
+        bnode_predicates = self.root_predicates
+        referrers = self.referrers
+        batch = self.batch
+        batch_size = self.batch_size
+        for n, line in enumerate(lines, start=1):
+            m = match(line)
+            if m is None:
+                _check_blank(line, n)
+                continue
+            s, p, o, value, lang, dt = m.groups()
+            sc = tokens.get(s) or bnodes.get(s)
+            if sc is None:
+                sc = self._token(s, tokens)
+            pc = tokens.get(p)
+            if pc is None:
+                pc = self._token(p, tokens)
+            if s[0] == "_":
+                stanza = None
+                if pc != self.rdf_type:
+                    bnode_predicates[sc] = pc
+            else:
+                stanza = sc
+            if o is not None:
+                oc = tokens.get(o) or bnodes.get(o)
+                if oc is None:
+                    oc = self._token(o, tokens)
+                if o[0] == "_":
+                    referrers.setdefault(oc, sc)
+                elif stanza is None and pc == self.annotated_source:
+                    referrers.setdefault(sc, oc)
+                batch.append((stanza, sc, pc, oc, None, None, None))
+            else:
+                if "\\" in value:
+                    value = _unescape(value)
+                if lang:
+                    batch.append((stanza, sc, pc, None, value, None, lang))
+                else:
+                    if dt is not None:
+                        dtc = tokens.get(dt)
+                        dt = dtc if dtc is not None else self._token(dt, tokens)
+                    batch.append((stanza, sc, pc, None, value, dt, None))
+            if len(batch) >= batch_size:
+                self.flush()
+                batch = self.batch
+
+    def _token(self, token: str, cache: Dict[str, str]) -> str:
+        if token[0] == "_":
+            return self._node(token)
+        if len(cache) >= MAX_CACHE_SIZE:
+            cache.clear()
+        cache[token] = self.trie.contract(_unescape(token[1:-1]))
+        return cache[token]
+
+    def merge_shard(
+        self,
+        named: List[Tuple],
+        anonymous: List[Tuple],
+        referrers: Dict[str, str],
+        root_predicates: Dict[str, str],
+    ):
+        """
+        Write rows parsed from a shard by a _ShardWriter, renaming blank nodes
+
+        Shards must be merged in file order
+
+        :param named: rows without blank nodes
+        :param anonymous: rows with a blank node subject or object
+        :param referrers: first node referring to each blank node in the shard
+        :param root_predicates: last non-type predicate of each blank node in the shard
+        """
+        self.flush()
+        self.con.executemany(f"INSERT INTO {self.table} VALUES (?,?,?,?,?,?,?)", named)
+        self.count += len(named)
+
+        def rename(n):
+            return self._node(n) if n is not None and n.startswith(BNODE_PREFIX) else n
+
+        for stanza, s, p, o, value, dt, lang in anonymous:
+            self.batch.append((stanza, rename(s), p, rename(o), value, dt, lang))
+        for b, x in referrers.items():
+            self.referrers.setdefault(rename(b), rename(x))
+        for b, p in root_predicates.items():
+            self.root_predicates[rename(b)] = p
+        self.flush()
+
+    def flush(self):
+        self.con.executemany(f"INSERT INTO {self.table} VALUES (?,?,?,?,?,?,?)", self.batch)
+        self.count += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        """
+        Write remaining statements and assign stanzas to blank node statements
+        """
+        self.flush()
+        stanzas = []
+        for b in self.bnodes.values():
+            x = b
+            seen = {x}
+            while x.startswith(BNODE_PREFIX):
+                nxt = self.referrers.get(x)
+                if nxt is None or nxt in seen:
+                    x = self.root_predicates.get(x, x)
+                    break
+                x = nxt
+                seen.add(x)
+            stanzas.append((b, x))
+        self.con.execute("CREATE TEMP TABLE bnode_stanza (bnode TEXT PRIMARY KEY, stanza TEXT)")
+        self.con.executemany("INSERT INTO bnode_stanza VALUES (?,?)", stanzas)
+        self.con.execute(
+            f"UPDATE {self.table} SET stanza = "
+            f"(SELECT stanza FROM bnode_stanza WHERE bnode = {self.table}.subject) "
+            "WHERE stanza IS NULL"
+        )
+        self.con.execute("DROP TABLE bnode_stanza")
+        self.bnodes = {}
+        self.referrers = {}
+        self.root_predicates = {}
+
+
+class _ShardWriter(StatementWriter):
+    """
+    Collects parsed rows for a shard instead of writing them
+
+    Blank node labels are kept as in the input, as they are scoped to the
+    whole file; they are renamed when the shard is merged.
+    """
+
+    def __init__(self, trie: PrefixTrie):
+        self.trie = trie
+        self.batch_size = BATCH_SIZE
+        self.batch = []
+        self.rows = []
+        self.count = 0
+        self.bnodes = {}
+        self.referrers = {}
+        self.root_predicates = {}
+        self.rdf_type = trie.contract(RDF_TYPE)
+        self.annotated_source = trie.contract(OWL_ANNOTATED_SOURCE)
+
+    def _node(self, n: NODE) -> str:
+        if n.startswith(BNODE_PREFIX):
+            return self.bnodes.setdefault(n, n)
+        return self.trie.contract(n)
+
+    def flush(self):
+        self.rows += self.batch
+        self.batch = []
+
+
+_shard_trie: Optional[PrefixTrie] = None
+
+
+def _init_shard_worker(prefixes: Dict[str, str]):
+    global _shard_trie
+    _shard_trie = PrefixTrie(prefixes)
+
+
+def _parse_shard(shard: Tuple[str, int, int]):
+    path, start, end = shard
+    with open(path, "rb") as stream:
+        stream.seek(start)
+        text = stream.read(end - start).decode("utf-8")
+    writer = _ShardWriter(_shard_trie)
+    # only \n ends a line; splitlines would also split on e.g. U+2028 within literals
+    lines = text.split("\n")
+    if lines and not lines[-1]:
+        lines.pop()
+    writer.add_ntriples(lines)
+    writer.flush()
+    # rows with blank nodes are renamed by the main process; the rest are written as is
+    named, anonymous = [], []
+    for row in writer.rows:
+        if row[0] is None or (row[3] is not None and row[3].startswith(BNODE_PREFIX)):
+            anonymous.append(row)
+        else:
+            named.append(row)
+    named.sort(key=lambda r: (r[1], r[2]))
+    return named, anonymous, writer.referrers, writer.root_predicates
+
+
+def shard_ranges(path: str, shard_size: int = SHARD_SIZE) -> List[Tuple[int, int]]:
+    """
+    Split a line-oriented file into byte ranges, each ending at a line end
+
+    :param path:
+    :param shard_size: approximate bytes per shard
+    :return: (start, end) offsets
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as stream:
+        while start < size:
+            stream.seek(min(start + shard_size, size))
+            stream.readline()
+            end = min(stream.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def add_ntriples_parallel(
+    writer: StatementWriter,
+    path: str,
+    prefixes: Dict[str, str],
+    workers: Optional[int] = None,
+    shard_size: int = SHARD_SIZE,
+):
+    """
+    Parse an N-Triples file in shards in a process pool, writing rows in the main process
+
+    Shards are merged in file order, so stanzas are the same as for a sequential load
+
+    :param writer: writer for the db; close must be called afterwards
+    :param path:
+    :param prefixes: prefix map used to contract IRIs
+    :param workers: number of processes; defaults to the number of CPUs
+    :param shard_size: approximate bytes per shard
+    """
+    shards = [(path, start, end) for start, end in shard_ranges(path, shard_size)]
+    with multiprocessing.Pool(workers, initializer=_init_shard_worker, initargs=(prefixes,)) as pool:
+        for named, anonymous, referrers, root_predicates in pool.imap(_parse_shard, shards):
+            writer.merge_shard(named, anonymous, referrers, root_predicates)
+
+
+def guess_format(path: str) -> str:
+    """
+    :param path:
+    :return: format, based on suffix
+    """
+    return FORMATS.get(Path(path).suffix.lower(), "xml")
+
+
+def create_db(con: sqlite3.Connection):
+    """
+    Create the semsql schema and prefixes, as in the template used for builds
+
+    :param con:
+    """
+    con.executescript(DDL.read_text())
+    with open(PREFIXES) as stream:
+        rows = [(r["prefix"], r["base"]) for r in csv.DictReader(stream)]
+    con.executemany("INSERT INTO prefix VALUES (?,?)", rows)
+    con.commit()
+
+
+def has_schema(con: sqlite3.Connection) -> bool:
+    """
+    :param con:
+    :return: True if the db has a statements table
+    """
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE name='statements'").fetchone()
+    return row is not None
+
+
+def load_into(
+    con: sqlite3.Connection,
+    inputs: List[str],
+    format: Optional[str] = None,
+    batch_size: int = BATCH_SIZE,
+    workers: int = 1,
+    table: str = "statements",
+) -> int:
+    """
+    Load RDF files using an existing connection, in a single transaction
+
+    The transaction is rolled back on error, unless journaling is switched off,
+    as it is by :func:`load`
+
+    :param con: connection, in autocommit mode (isolation_level=None)
+    :param inputs: paths to RDF/XML, Turtle or N-Triples files
+    :param format: nt, turtle or xml; guessed from the file suffix if not set
+    :param batch_size: rows per insert
+    :param workers: number of processes for parsing N-Triples; 0 for one per CPU
+    :param table: table to write to, with the same columns as statements
+    :return: number of statements loaded
+    """
+    prefixes = read_prefixes(con)
+    trie = PrefixTrie(prefixes)
+    n = 0
+    con.execute("BEGIN")
+    try:
+        for input in inputs:
+            start = time.perf_counter()
+            writer = StatementWriter(con, trie, batch_size=batch_size, table=table)
+            fmt = format or guess_format(input)
+            if fmt == "nt" and workers != 1:
+                add_ntriples_parallel(writer, input, prefixes, workers or None)
+            elif fmt == "nt":
+                with open(input, encoding="utf-8") as stream:
+                    writer.add_ntriples(stream)
+            else:
+                parse_rdflib(input, fmt, writer.add)
+            writer.close()
+            seconds = time.perf_counter() - start
+            logger.info(
+                f"Loaded {writer.count} statements from {input} in {seconds:.1f}s "
+                f"({writer.count / max(seconds, 1e-9):.0f}/s)"
+            )
+            n += writer.count
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return n
+
+
+def load(
+    db: str,
+    inputs: List[str],
+    format: Optional[str] = None,
+    create: bool = False,
+    batch_size: int = BATCH_SIZE,
+    workers: int = 1,
+) -> int:
+    """
+    Load RDF files into the statements table, in a single transaction
+
+    Journaling and syncing are switched off for the duration of the load, so
+    the transaction cannot be rolled back: if a load fails, the contents of the
+    db are undefined, and it should be deleted or restored from a copy
+
+    :param db: path to sqlite db
+    :param inputs: paths to RDF/XML, Turtle or N-Triples files
+    :param format: nt, turtle or xml; guessed from the file suffix if not set
+    :param create: if True, create the schema first, unless the db already has one
+    :param batch_size: rows per insert
+    :param workers: number of processes for parsing N-Triples; 0 for one per CPU
+    :return: number of statements loaded
+    """
+    con = sqlite3.connect(db, isolation_level=None)
+    try:
+        if create and not has_schema(con):
+            create_db(con)
+        (journal_mode,) = con.execute("PRAGMA journal_mode").fetchone()
+        (synchronous,) = con.execute("PRAGMA synchronous").fetchone()
+        con.execute("PRAGMA journal_mode=OFF")
+        con.execute("PRAGMA synchronous=OFF")
+        try:
+            return load_into(con, inputs, format=format, batch_size=batch_size, workers=workers)
+        finally:
+            con.execute(f"PRAGMA journal_mode={journal_mode}")
+            con.execute(f"PRAGMA synchronous={synchronous}")
+    finally:
+        con.close()
 
 
 def create_and_load(inputs: List[str], create: bool, url: str) -> None:
-    db = get_sqlite_path(url)
-    if create:
-        subprocess.run(["cat", "prefixes/prefix.sql | sqlite3", db])
-        engine = create_engine(url)
-        with engine.connect() as con:
-            load_ddl(con, "prefixes/prefix.sql")
-            #load_rdftab(con, "sql/rdftab.sql")
-            #load_rdftab(con, "sql_schema/semsql.sql")
-    for input in inputs:
-        subprocess.run(["./bin/rdftab", db, input])
+    load(get_sqlite_path(url), inputs, create=create)
 
 
 @click.command()
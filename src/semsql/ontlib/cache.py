@@ -0,0 +1,169 @@
+"""
+Process-wide cache for term lookups (labels, definitions, prefixes)
+
+Entries are keyed on (db path, db mtime, view, id), so any write to the SQLite
+file (or its WAL) changes the key and stale entries are never returned. When a
+new version of a db is observed, entries for older versions of that db are purged.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Hashable, Optional, Tuple
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "invalidations", "maxsize", "currsize"]
+)
+
+DB_VERSION = Tuple[str, int]
+
+DEFAULT_MAXSIZE = 100000
+
+
+def get_db_version(session) -> Optional[DB_VERSION]:
+    """
+    Get the path and modification time of the SQLite file a session is bound to
+
+    :param session:
+    :return: (path, mtime in ns) tuple, or None if not a file-backed SQLite db
+    """
+    bind = session.get_bind()
+    url = bind.url
+    if url.get_backend_name() != "sqlite" or not url.database:
+        return None
+    return _file_version(url.database)
+
+
+def get_connection_version(con) -> Optional[DB_VERSION]:
+    """
+    Get the path and modification time of the main db of a sqlite3 connection
+
+    :param con:
+    :return: (path, mtime in ns) tuple, or None if not a file-backed db
+    """
+    for _, name, path in con.execute("PRAGMA database_list"):
+        if name == "main":
+            return _file_version(path) if path else None
+    return None
+
+
+def _file_version(path: str) -> Optional[DB_VERSION]:
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    wal = f"{path}-wal"
+    if os.path.exists(wal):
+        mtime = max(mtime, os.stat(wal).st_mtime_ns)
+    return path, mtime
+
+
+class LookupCache:
+    """
+    A bounded, thread-safe LRU cache with optional time-to-live
+
+    Values of None are cached, so that repeated lookups of ids with no label
+    do not hit the database either.
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: Optional[float] = None):
+        """
+        :param maxsize: maximum number of entries before least recently used are evicted
+        :param ttl: if set, entries expire this many seconds after being added
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._db_mtimes = {}
+        self._lock = threading.Lock()
+
+    def get(self, db_version: DB_VERSION, view: str, id: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a cached value
+
+        :param db_version: from get_db_version
+        :param view: name of the view/table the value is from
+        :param id: typically a CURIE
+        :return: (found, value) tuple
+        """
+        key = (db_version[0], db_version[1], view, id)
+        with self._lock:
+            self._check_version(db_version)
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, db_version: DB_VERSION, view: str, id: Hashable, value: Any):
+        """
+        Add a value to the cache, evicting the least recently used entry if full
+        """
+        key = (db_version[0], db_version[1], view, id)
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._check_version(db_version)
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all entries and reset counters
+        """
+        with self._lock:
+            self._data.clear()
+            self._db_mtimes.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits, self.misses, self.invalidations, self.maxsize, len(self._data)
+        )
+
+    def _check_version(self, db_version: DB_VERSION):
+        path, mtime = db_version
+        last_mtime = self._db_mtimes.get(path)
+        if last_mtime == mtime:
+            return
+        self._db_mtimes[path] = mtime
+        if last_mtime is not None:
+            stale = [k for k in self._data if k[0] == path and k[1] != mtime]
+            for k in stale:
+                del self._data[k]
+            self.invalidations += 1
+
+
+_cache = LookupCache()
+
+
+def get_cache() -> LookupCache:
+    """
+    :return: the process-wide lookup cache
+    """
+    return _cache
+
+
+def configure_cache(maxsize: int = DEFAULT_MAXSIZE, ttl: Optional[float] = None) -> LookupCache:
+    """
+    Replace the process-wide lookup cache with one using the given settings
+
+    :param maxsize:
+    :param ttl: seconds
+    :return: new cache
+    """
+    global _cache
+    _cache = LookupCache(maxsize=maxsize, ttl=ttl)
+    return _cache
@@ -1,6 +1,8 @@
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
+from semsql.ontlib import search
+from semsql.ontlib.cache import get_cache, get_db_version
 from semsql.sqla.semsql import (HasTextDefinitionStatement,
                                 Prefix,
                                 RdfsLabelStatement)
@@ -8,15 +10,27 @@ from semsql.sqla.semsql import (HasTextDefinitionStatement,
 PREFIX_MAP = Dict[str, str]
 CURIE = str
 
+# Kept well below SQLITE_MAX_VARIABLE_NUMBER, which is 999 on older SQLite builds
+DEFAULT_CHUNK_SIZE = 500
 
-def get_prefixes(session) -> PREFIX_MAP:
+
+def get_prefixes(session, cache=True) -> PREFIX_MAP:
     """
     Get all defined prefix mappings
 
     :param session:
+    :param cache: use the process-wide lookup cache
     :return:
     """
-    return {r.prefix: r.base for r in session.query(Prefix)}
+    db_version = get_db_version(session) if cache else None
+    if db_version is not None:
+        found, prefixes = get_cache().get(db_version, Prefix.__tablename__, None)
+        if found:
+            return dict(prefixes)
+    prefixes = {r.prefix: r.base for r in session.query(Prefix)}
+    if db_version is not None:
+        get_cache().put(db_version, Prefix.__tablename__, None, prefixes)
+    return dict(prefixes)
 
 
 def get_label(session, id: CURIE, **args) -> Optional[str]:
@@ -38,7 +52,7 @@ def get_text_definition(session, id: CURIE, **args) -> Optional[str]:
     If >1 found, returns an arbitrary one
     If none found, returns None
 
-    Note: it may be slow to call this 1000s of times, consider using a join instead
+    Note: it may be slow to call this 1000s of times, consider using get_text_definitions instead
     :param session:
     :param id:
     :param args:
@@ -47,7 +61,99 @@ def get_text_definition(session, id: CURIE, **args) -> Optional[str]:
     return get_single_value(session, id, view=HasTextDefinitionStatement, **args)
 
 
-def get_single_value(session, id: CURIE, view=None, strict=False) -> Optional[str]:
+def get_labels(session, ids: Iterable[CURIE], **args) -> Dict[CURIE, str]:
+    """
+    fetches labels for a collection of term ids, using one query per chunk of ids
+
+    :param session:
+    :param ids: CURIEs
+    :param args:
+    :return: mapping from CURIE to label; ids without a label are absent
+    """
+    return get_values(session, ids, view=RdfsLabelStatement, **args)
+
+
+def get_text_definitions(session, ids: Iterable[CURIE], **args) -> Dict[CURIE, str]:
+    """
+    Fetch text definitions for a collection of entities
+
+    This is the bulk equivalent of get_text_definition; use this in preference
+    when rendering many nodes
+
+    :param session:
+    :param ids: CURIEs
+    :param args:
+    :return: mapping from CURIE to definition; ids without a definition are absent
+    """
+    return get_values(session, ids, view=HasTextDefinitionStatement, **args)
+
+
+def get_values(
+    session,
+    ids: Iterable[CURIE],
+    view=None,
+    strict=False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache=True,
+) -> Dict[CURIE, str]:
+    """
+    Fetch values for many ids from a statements view
+
+    ids are first looked up in the process-wide cache; the remainder are partitioned
+    into chunks, and each chunk is fetched with a single ``subject IN (...)`` query.
+
+    If >1 value is found for an id, an arbitrary one is used, unless strict is set
+
+    :param session:
+    :param ids: CURIEs
+    :param view: SQLAlchemy model class, a subtype of Statements
+    :param strict: raise an exception if an id has multiple distinct values
+    :param chunk_size: maximum number of ids per query
+    :param cache: use the process-wide lookup cache (ignored if strict)
+    :return: mapping from CURIE to value
+    """
+    ids = list(dict.fromkeys(ids))
+    vmap = {}
+    db_version = get_db_version(session) if cache and not strict else None
+    if db_version is not None:
+        lookup_cache = get_cache()
+        uncached = []
+        for id in ids:
+            found, value = lookup_cache.get(db_version, view.__tablename__, id)
+            if not found:
+                uncached.append(id)
+            elif value is not None:
+                vmap[id] = value
+        ids = uncached
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i : i + chunk_size]
+        q = session.query(view.subject, view.value).filter(view.subject.in_(chunk))
+        for subject, value in q:
+            if subject not in vmap:
+                vmap[subject] = value
+            elif strict and vmap[subject] != value:
+                raise Exception(f"Multiple values for {view} where id={subject}")
+    if db_version is not None:
+        for id in ids:
+            lookup_cache.put(db_version, view.__tablename__, id, vmap.get(id))
+    return vmap
+
+
+def get_single_value(
+    session, id: CURIE, view=None, strict=False, cache=True
+) -> Optional[str]:
+    db_version = get_db_version(session) if cache and not strict else None
+    if db_version is not None:
+        found, val = get_cache().get(db_version, view.__tablename__, id)
+        if found:
+            return val
+        val = _query_single_value(session, id, view=view, strict=strict)
+        get_cache().put(db_version, view.__tablename__, id, val)
+        return val
+    return _query_single_value(session, id, view=view, strict=strict)
+
+
+def _query_single_value(session, id: CURIE, view=None, strict=False) -> Optional[str]:
     q = session.query(view).where(view.subject == id)
     val = None
     for s in q.all():
@@ -61,7 +167,9 @@ def get_single_value(session, id: CURIE, view=None, strict=False) -> Optional[st
     return val
 
 
-def term_search(session, terms: List[str], view=None) -> List[CURIE]:
+def term_search(
+    session, terms: List[str], view=None, use_index: bool = True, mode: str = search.LIKE
+) -> List[CURIE]:
     """
     Maps a list of terms (e.g. query search terms to match labels, or IDs) to a list of IDs
 
@@ -74,20 +182,42 @@ def term_search(session, terms: List[str], view=None) -> List[CURIE]:
 
     If view is none, then the output simply matches the input (i.e the user knows IDs already)
 
+    If the db has a current search index (see semsql.ontlib.search) that covers the view, it
+    is used in place of scanning the view. Token and prefix modes require the index; they
+    match words in any order, and IDs are returned best match first
+
     :param session:
     :param terms: list of query terms
     :param view: view to use, e.g. RdfsLabelView
+    :param use_index: use the search index, if there is one; only for like mode
+    :param mode: like (SQL LIKE patterns), token or prefix; see semsql.ontlib.search.MODES
     :return: list of IDs from expansion
     """
     if view is None:
         return terms
-    ids = set()
+    if mode not in search.MODES:
+        raise ValueError(f"Unknown mode: {mode}; must be one of {search.MODES}")
+    con = None
+    if view.__tablename__ in search.VIEW_FIELDS and (use_index or mode != search.LIKE):
+        con = session.connection().connection
+        if mode == search.LIKE:
+            if not search.is_search_index_current(con):
+                con = None
+        elif not search.has_search_index(con):
+            raise ValueError(f"{mode} queries require a search index; run semsql search-index")
+        else:
+            # there is no fallback for token queries; a stale index is used, with a warning
+            search.is_search_index_current(con)
+    elif mode != search.LIKE:
+        raise ValueError(f"{mode} queries are not supported for {view.__tablename__}")
+    ids = {}
     for t in terms:
-        q = session.query(view).filter(view.value.like(t))
-        n = 0
-        for row in q.all():
-            ids.add(str(row.subject))
-            n += 1
-        if n == 0:
+        if con is not None:
+            found = search.search_subjects(con, t, search.VIEW_FIELDS[view.__tablename__], mode)
+        else:
+            found = [str(row.subject) for row in session.query(view).filter(view.value.like(t))]
+        for id in found:
+            ids.setdefault(id, None)
+        if not found:
             logging.warning(f"No match for query: {t}")
     return list(ids)
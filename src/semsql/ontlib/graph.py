@@ -0,0 +1,453 @@
+"""
+In-memory graph engine for traversal queries
+
+The ``edge`` and ``entailed_edge`` tables are loaded once into compressed
+sparse row (CSR) adjacency arrays over interned integer ids, in both
+directions. Parent, child, ancestor, descendant and subgraph queries are then
+answered in memory, without SQL joins.
+
+:meth:`OntologyGraph.extract_subgraph` has the same semantics as
+:func:`semsql.ontlib.subgraph.extract_subgraph` for each of the
+``TRAVERSAL_VIEWS``, returning rows with the same fields as the
+``subgraph_edge_by_*`` views.
+
+Example:
+
+    graph = OntologyGraph.from_db("go.db")
+    edges = graph.extract_subgraph(["GO:0005634"], view="up")
+
+A graph can be saved as a snapshot file, which is memory-mapped when opened,
+so that opening is almost instant and processes opening the same file share
+its pages:
+
+    graph.save("go.closure")
+    graph = OntologyGraph.from_snapshot("go.closure")
+
+The snapshot format is a header followed by named sections, each aligned to 8
+bytes: node CURIEs (sorted, so that lookups are binary searches) and labels,
+each as an offsets array and UTF-8 data, and offsets, predicates and targets
+arrays for each adjacency.
+"""
+import bisect
+import mmap
+import sqlite3
+import struct
+import sys
+from array import array
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Sequence, Set, Tuple)
+
+from semsql.ontlib.common_queries import CURIE
+from semsql.ontlib.subgraph import TRAVERSAL_VIEWS
+
+SNAPSHOT_MAGIC = b"SEMSQLGR"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIII")
+SNAPSHOT_SECTION = struct.Struct("<24sQQ")
+ADJACENCIES = ["out_edges", "in_edges", "out_entailed", "in_entailed"]
+
+
+class SubgraphEdge(NamedTuple):
+    """
+    A row of a subgraph_edge_by_* view
+    """
+
+    subject: CURIE
+    predicate: CURIE
+    object: CURIE
+    anchor_predicate: CURIE
+    anchor_object: CURIE
+
+
+class CSR:
+    """
+    Adjacency in compressed sparse row form, over integer node ids
+
+    The neighbors of node i are at positions offsets[i] to offsets[i+1] of the
+    targets array, sorted, and of the predicates array, if edges are labeled
+    """
+
+    def __init__(self, offsets: Sequence[int], targets: Sequence[int], predicates: Optional[Sequence[int]] = None):
+        """
+        :param offsets: int64 array, of length one more than the number of nodes
+        :param targets: int32 array
+        :param predicates: int32 array, or None if edges are not labeled
+        """
+        self.offsets = offsets
+        self.targets = targets
+        self.predicates = predicates
+
+    @staticmethod
+    def _offsets(n: int, sources: Iterable[int]) -> array:
+        offsets = array("q", [0] * (n + 1))
+        for s in sources:
+            offsets[s + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        return offsets
+
+    @classmethod
+    def from_pairs(cls, n: int, pairs: Iterable[Tuple[int, int]]) -> "CSR":
+        """
+        :param n: number of nodes
+        :param pairs: (source, target) ids
+        :return:
+        """
+        pairs = sorted(set(pairs))
+        return cls(cls._offsets(n, (s for s, _ in pairs)), array("i", [t for _, t in pairs]))
+
+    @classmethod
+    def from_triples(cls, n: int, triples: Iterable[Tuple[int, int, int]]) -> "CSR":
+        """
+        :param n: number of nodes
+        :param triples: (source, predicate, target) ids
+        :return:
+        """
+        triples = sorted(set(triples))
+        return cls(
+            cls._offsets(n, (s for s, _, _ in triples)),
+            array("i", [t for _, _, t in triples]),
+            array("i", [p for _, p, _ in triples]),
+        )
+
+    def __len__(self):
+        return len(self.targets)
+
+    def __getitem__(self, i: int) -> Sequence[int]:
+        """
+        :param i: node id
+        :return: target ids
+        """
+        return self.targets[self.offsets[i] : self.offsets[i + 1]]
+
+    def neighbors(self, i: int, predicates: Optional[Set[int]] = None) -> Iterator[Tuple[int, int]]:
+        """
+        :param i: node id
+        :param predicates: if set, only edges with these predicate ids
+        :return: (predicate, target) ids
+        """
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        for p, t in zip(self.predicates[lo:hi], self.targets[lo:hi]):
+            if predicates is None or p in predicates:
+                yield p, t
+
+
+class _MappedStrings:
+    """
+    A read-only sequence of strings stored as an offsets array and UTF-8 data
+    """
+
+    def __init__(self, offsets: Sequence[int], data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return str(self.data[self.offsets[i] : self.offsets[i + 1]], "utf-8")
+
+
+class _SortedIndex:
+    """
+    Looks up the position of a string in a sorted sequence
+    """
+
+    def __init__(self, strings: Sequence[str]):
+        self.strings = strings
+
+    def get(self, s: str, default=None) -> Optional[int]:
+        i = bisect.bisect_left(self.strings, s)
+        if i < len(self.strings) and self.strings[i] == s:
+            return i
+        return default
+
+    def __contains__(self, s: str):
+        return self.get(s) is not None
+
+    def __getitem__(self, s: str) -> int:
+        i = self.get(s)
+        if i is None:
+            raise KeyError(s)
+        return i
+
+
+def _encode_strings(strings: Sequence[str]) -> Tuple[array, bytes]:
+    data = [s.encode("utf-8") for s in strings]
+    offsets = array("q", [0])
+    for d in data:
+        offsets.append(offsets[-1] + len(d))
+    return offsets, b"".join(data)
+
+
+VIEW_NAMES = {v: k for k, v in TRAVERSAL_VIEWS.items()}
+
+
+class OntologyGraph:
+    """
+    Direct and entailed edges of an ontology, held in memory
+    """
+
+    def __init__(
+        self,
+        curies: Sequence[CURIE],
+        ids,
+        labels: Sequence[str],
+        out_edges: CSR,
+        in_edges: CSR,
+        out_entailed: CSR,
+        in_entailed: CSR,
+    ):
+        """
+        Use one of the from_* constructors rather than calling this directly
+
+        :param curies: CURIE for each id, sorted
+        :param ids: mapping from CURIE to id, supporting get
+        :param labels: label for each id, or empty string
+        """
+        self.curies = curies
+        self.ids = ids
+        self.labels = labels
+        self.out_edges = out_edges
+        self.in_edges = in_edges
+        self.out_entailed = out_entailed
+        self.in_entailed = in_entailed
+        self._mmap = None
+
+    @classmethod
+    def from_edges(
+        cls,
+        edges: Iterable[Tuple[CURIE, CURIE, CURIE]],
+        entailed_edges: Iterable[Tuple[CURIE, CURIE, CURIE]],
+        labels: Optional[Dict[CURIE, str]] = None,
+    ) -> "OntologyGraph":
+        """
+        :param edges: rows of the edge table
+        :param entailed_edges: rows of the entailed_edge table
+        :param labels: label for each node
+        :return:
+        """
+        edges = list(edges)
+        entailed_edges = list(entailed_edges)
+        curies = sorted({x for rows in (edges, entailed_edges) for row in rows for x in row})
+        ids = {c: i for i, c in enumerate(curies)}
+        edge_ids = [(ids[s], ids[p], ids[o]) for s, p, o in edges]
+        entailed_ids = [(ids[s], ids[p], ids[o]) for s, p, o in entailed_edges]
+        n = len(curies)
+        labels = labels or {}
+        return cls(
+            curies,
+            ids,
+            [labels.get(c, "") for c in curies],
+            CSR.from_triples(n, edge_ids),
+            CSR.from_triples(n, [(o, p, s) for s, p, o in edge_ids]),
+            CSR.from_triples(n, entailed_ids),
+            CSR.from_triples(n, [(o, p, s) for s, p, o in entailed_ids]),
+        )
+
+    @classmethod
+    def from_connection(cls, con: sqlite3.Connection) -> "OntologyGraph":
+        """
+        Load the edge and entailed_edge tables
+
+        :param con:
+        :return:
+        """
+        return cls.from_edges(
+            con.execute("SELECT subject, predicate, object FROM edge"),
+            con.execute("SELECT subject, predicate, object FROM entailed_edge"),
+            dict(con.execute("SELECT subject, MIN(value) FROM rdfs_label_statement GROUP BY subject")),
+        )
+
+    @classmethod
+    def from_db(cls, db: str) -> "OntologyGraph":
+        """
+        :param db: path to sqlite db
+        :return:
+        """
+        con = sqlite3.connect(db)
+        try:
+            return cls.from_connection(con)
+        finally:
+            con.close()
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "OntologyGraph":
+        """
+        Open a snapshot written with save, memory-mapping it rather than reading it
+
+        :param path:
+        :return:
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, num_sections = SNAPSHOT_HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a semsql graph snapshot: {path}")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} in {path}; expected {SNAPSHOT_VERSION}")
+        if byteorder != (sys.byteorder == "little"):
+            raise ValueError(f"Snapshot {path} was written on a machine with a different byte order")
+        view = memoryview(mm)
+        sections = {}
+        for i in range(num_sections):
+            name, offset, length = SNAPSHOT_SECTION.unpack_from(mm, SNAPSHOT_HEADER.size + i * SNAPSHOT_SECTION.size)
+            sections[name.rstrip(b"\0").decode()] = view[offset : offset + length]
+        curies = _MappedStrings(sections["curies.offsets"].cast("q"), sections["curies.data"])
+        labels = _MappedStrings(sections["labels.offsets"].cast("q"), sections["labels.data"])
+        adjacencies = [
+            CSR(
+                sections[f"{a}.offsets"].cast("q"),
+                sections[f"{a}.targets"].cast("i"),
+                sections[f"{a}.predicates"].cast("i"),
+            )
+            for a in ADJACENCIES
+        ]
+        graph = cls(curies, _SortedIndex(curies), labels, *adjacencies)
+        graph._mmap = mm
+        return graph
+
+    def save(self, path: str):
+        """
+        Write the graph as a snapshot file
+
+        :param path:
+        """
+        sections = []
+        for name, strings in [("curies", self.curies), ("labels", self.labels)]:
+            offsets, data = _encode_strings(strings)
+            sections += [(f"{name}.offsets", offsets.tobytes()), (f"{name}.data", data)]
+        for a in ADJACENCIES:
+            adjacency = getattr(self, a)
+            sections += [
+                (f"{a}.offsets", array("q", adjacency.offsets).tobytes()),
+                (f"{a}.predicates", array("i", adjacency.predicates).tobytes()),
+                (f"{a}.targets", array("i", adjacency.targets).tobytes()),
+            ]
+        offset = SNAPSHOT_HEADER.size + len(sections) * SNAPSHOT_SECTION.size
+        table = []
+        for name, data in sections:
+            offset += -offset % 8
+            table.append((name, offset, len(data)))
+            offset += len(data)
+        with open(path, "wb") as f:
+            f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "little", len(sections)))
+            for name, offset, length in table:
+                f.write(SNAPSHOT_SECTION.pack(name.encode(), offset, length))
+            for (_, data), (_, offset, _) in zip(sections, table):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+
+    def close(self):
+        """
+        Release the memory map of a graph opened from a snapshot
+        """
+        if self._mmap is not None:
+            self.curies = self.ids = self.labels = None
+            self.out_edges = self.in_edges = self.out_entailed = self.in_entailed = None
+            self._mmap = None
+
+    def label(self, node: CURIE) -> Optional[str]:
+        """
+        :param node:
+        :return: rdfs:label, if the node has one
+        """
+        i = self.ids.get(node)
+        if i is None:
+            return None
+        return self.labels[i] or None
+
+    def _predicate_ids(self, predicates: Optional[Iterable[CURIE]]) -> Optional[Set[int]]:
+        if predicates is None:
+            return None
+        return {self.ids[p] for p in predicates if p in self.ids}
+
+    def _neighbors(
+        self, adjacency: CSR, node: CURIE, predicates: Optional[Iterable[CURIE]]
+    ) -> List[Tuple[CURIE, CURIE]]:
+        i = self.ids.get(node)
+        if i is None:
+            return []
+        c = self.curies
+        return [(c[p], c[t]) for p, t in adjacency.neighbors(i, self._predicate_ids(predicates))]
+
+    def parents(self, node: CURIE, predicates: Optional[List[CURIE]] = None) -> List[Tuple[CURIE, CURIE]]:
+        """
+        :param node:
+        :param predicates: if set, only edges with these predicates
+        :return: (predicate, parent) pairs for direct edges from node
+        """
+        return self._neighbors(self.out_edges, node, predicates)
+
+    def children(self, node: CURIE, predicates: Optional[List[CURIE]] = None) -> List[Tuple[CURIE, CURIE]]:
+        """
+        :param node:
+        :param predicates: if set, only edges with these predicates
+        :return: (predicate, child) pairs for direct edges to node
+        """
+        return self._neighbors(self.in_edges, node, predicates)
+
+    def ancestors(self, node: CURIE, predicates: Optional[List[CURIE]] = None) -> Set[CURIE]:
+        """
+        :param node:
+        :param predicates: if set, only entailed edges with these predicates
+        :return: objects of entailed edges from node
+        """
+        return {t for _, t in self._neighbors(self.out_entailed, node, predicates)}
+
+    def descendants(self, node: CURIE, predicates: Optional[List[CURIE]] = None) -> Set[CURIE]:
+        """
+        :param node:
+        :param predicates: if set, only entailed edges with these predicates
+        :return: subjects of entailed edges to node
+        """
+        return {t for _, t in self._neighbors(self.in_entailed, node, predicates)}
+
+    def extract_subgraph(
+        self,
+        terms: List[CURIE],
+        predicates: Optional[List[CURIE]] = None,
+        anchor_predicates: Optional[List[CURIE]] = None,
+        view="up",
+    ) -> List[SubgraphEdge]:
+        """
+        Extract a subgraph using terms as seeds
+
+        Equivalent to :func:`semsql.ontlib.subgraph.extract_subgraph`
+
+        :param terms: seed ids (anchor objects)
+        :param predicates: if set, only return edges with these predicates
+        :param anchor_predicates: if set, only traverse from seeds using these predicates
+        :param view: key in TRAVERSAL_VIEWS (e.g. up, down), or the view class
+        :return: edges, with the anchor they were reached from
+        """
+        view = VIEW_NAMES.get(view, view)
+        if view not in TRAVERSAL_VIEWS:
+            raise ValueError(f"Unknown view: {view}; must be one of {list(TRAVERSAL_VIEWS)}")
+        if view == "updown":
+            rows = self.extract_subgraph(terms, predicates, anchor_predicates, "down")
+            rows += self.extract_subgraph(terms, predicates, anchor_predicates, "up")
+            return list(dict.fromkeys(rows))
+        anchor_pids = self._predicate_ids(anchor_predicates)
+        pids = self._predicate_ids(predicates)
+        adjacency = {
+            "parent": self.in_edges,
+            "child": self.out_edges,
+            "down": self.in_entailed,
+            "up": self.out_entailed,
+        }.get(view)
+        c = self.curies
+        rows = []
+        for term in terms:
+            a = self.ids.get(term)
+            if a is None:
+                continue
+            if view == "self":
+                for p, o in self.out_edges.neighbors(a, pids):
+                    if anchor_pids is None or p in anchor_pids:
+                        rows.append(SubgraphEdge(term, c[p], c[o], c[p], term))
+                continue
+            for ap, s in adjacency.neighbors(a, anchor_pids):
+                for p, o in self.out_edges.neighbors(s, pids):
+                    rows.append(SubgraphEdge(c[s], c[p], c[o], c[ap], term))
+        return rows
@@ -0,0 +1,271 @@
+"""
+Precomputed information content (IC) of classes
+
+IC is stored in the ``information_content`` table, so that similarity,
+enrichment and MICA queries do not each recompute it from entailed_edge. It is
+computed from one of two sources:
+
+- ``intrinsic``: IC(c) = -log2(|descendants(c)| / N), where descendants are
+  reflexive and N is the number of classes in the hierarchy
+- ``term_association``: IC(c) = -log2(|entities annotated to c or a
+  descendant| / |annotated entities|), using the term_association table.
+  Classes with no annotations are not stored
+
+The source and predicates used are recorded in ``information_content_metadata``,
+so that the table can be refreshed when entailed_edge changes; the closure
+functions in :mod:`semsql.builder.closure` do this automatically. A table
+computed from ``term_association`` is not refreshed when term_association
+changes; run :func:`build_information_content` again after loading annotations.
+"""
+import logging
+import math
+import sqlite3
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from semsql.ontlib.common_queries import CURIE
+
+TABLE = "information_content"
+METADATA_TABLE = "information_content_metadata"
+INTRINSIC = "intrinsic"
+TERM_ASSOCIATION = "term_association"
+SOURCES = [INTRINSIC, TERM_ASSOCIATION]
+SUBCLASS_OF = "rdfs:subClassOf"
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id TEXT PRIMARY KEY,
+    information_content FLOAT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS {TABLE}_information_content ON {TABLE}(information_content, id);
+CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+    source TEXT NOT NULL,
+    predicates TEXT NOT NULL,
+    computed_at TEXT
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _placeholders(values: List) -> str:
+    return ",".join("?" * len(values))
+
+
+def _counts(con: sqlite3.Connection, source: str, predicates: List[CURIE]):
+    ph = _placeholders(predicates)
+    if source == INTRINSIC:
+        total_sql = (
+            f"SELECT COUNT(*) FROM (SELECT subject FROM entailed_edge WHERE predicate IN ({ph}) "
+            f"UNION SELECT object FROM entailed_edge WHERE predicate IN ({ph}))"
+        )
+        (total,) = con.execute(total_sql, predicates * 2).fetchone()
+        # descendants are reflexive, whether or not entailed_edge has reflexive rows
+        rows = con.execute(
+            f"SELECT n, COUNT(DISTINCT d) FROM ("
+            f" SELECT object AS n, subject AS d FROM entailed_edge WHERE predicate IN ({ph})"
+            f" UNION ALL SELECT subject, subject FROM entailed_edge WHERE predicate IN ({ph})"
+            f" UNION ALL SELECT object, object FROM entailed_edge WHERE predicate IN ({ph})"
+            f") GROUP BY n",
+            predicates * 3,
+        )
+    elif source == TERM_ASSOCIATION:
+        (total,) = con.execute(f"SELECT COUNT(DISTINCT subject) FROM {TERM_ASSOCIATION}").fetchone()
+        rows = con.execute(
+            f"SELECT n, COUNT(DISTINCT s) FROM ("
+            f" SELECT e.object AS n, a.subject AS s FROM {TERM_ASSOCIATION} AS a"
+            f" JOIN entailed_edge AS e ON e.subject = a.object WHERE e.predicate IN ({ph})"
+            f" UNION ALL SELECT object, subject FROM {TERM_ASSOCIATION}"
+            f") GROUP BY n",
+            predicates,
+        )
+    else:
+        raise ValueError(f"Unknown source: {source}; must be one of {SOURCES}")
+    return total, rows
+
+
+def compute_information_content(
+    con: sqlite3.Connection, source: str = INTRINSIC, predicates: Optional[List[CURIE]] = None
+) -> Dict[CURIE, float]:
+    """
+    Compute IC without storing it
+
+    :param con:
+    :param source: intrinsic or term_association
+    :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+    :return: IC, keyed by class
+    """
+    if predicates is None:
+        predicates = [SUBCLASS_OF]
+    total, rows = _counts(con, source, list(predicates))
+    return {n: -math.log2(c / total) for n, c in rows}
+
+
+def has_information_content(con: sqlite3.Connection) -> bool:
+    """
+    :param con:
+    :return: True if IC has been stored in the db
+    """
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE name=?", (METADATA_TABLE,)).fetchone()
+    return row is not None
+
+
+def get_metadata(con: sqlite3.Connection) -> Optional[Dict[str, object]]:
+    """
+    :param con:
+    :return: source and predicates the stored IC was computed with, if any
+    """
+    if not has_information_content(con):
+        return None
+    row = con.execute(f"SELECT source, predicates, computed_at FROM {METADATA_TABLE}").fetchone()
+    if row is None:
+        return None
+    return {"source": row[0], "predicates": row[1].split(), "computed_at": row[2]}
+
+
+def write_information_content(
+    con: sqlite3.Connection, source: str = INTRINSIC, predicates: Optional[List[CURIE]] = None
+) -> int:
+    """
+    Replace the contents of the information_content table
+
+    This does not begin or commit a transaction, so it can be part of a larger one
+
+    :param con:
+    :param source: intrinsic or term_association
+    :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+    :return: number of classes stored
+    """
+    if predicates is None:
+        predicates = [SUBCLASS_OF]
+    ic = compute_information_content(con, source, predicates)
+    for stmt in DDL.split(";"):
+        if stmt.strip():
+            con.execute(stmt)
+    con.execute(f"DELETE FROM {TABLE}")
+    con.execute(f"DELETE FROM {METADATA_TABLE}")
+    con.executemany(f"INSERT INTO {TABLE} VALUES (?,?)", ic.items())
+    con.execute(
+        f"INSERT INTO {METADATA_TABLE} VALUES (?,?,?)",
+        (source, " ".join(predicates), datetime.now().isoformat(timespec="seconds")),
+    )
+    logger.info(f"Stored {source} information content for {len(ic)} classes")
+    return len(ic)
+
+
+def build_information_content(
+    con: sqlite3.Connection, source: str = INTRINSIC, predicates: Optional[List[CURIE]] = None
+) -> int:
+    """
+    Compute and store IC, in a single transaction
+
+    :param con:
+    :param source: intrinsic or term_association
+    :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+    :return: number of classes stored
+    """
+    with con:
+        return write_information_content(con, source, predicates)
+
+
+def refresh_information_content(con: sqlite3.Connection) -> Optional[int]:
+    """
+    Recompute stored IC with the same source and predicates, e.g. after entailed_edge changes
+
+    This does not begin or commit a transaction, so it can be part of a larger one
+
+    :param con:
+    :return: number of classes stored, or None if no IC is stored
+    """
+    metadata = get_metadata(con)
+    if metadata is None:
+        return None
+    return write_information_content(con, metadata["source"], metadata["predicates"])
+
+
+def get_information_content(
+    con: sqlite3.Connection, predicates: Optional[List[CURIE]] = None
+) -> "InformationContent":
+    """
+    Stored IC if it was computed for the same predicates, otherwise intrinsic IC, computed without storing
+
+    :param con:
+    :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+    :return:
+    """
+    if predicates is None:
+        predicates = [SUBCLASS_OF]
+    metadata = get_metadata(con)
+    if metadata is not None and metadata["predicates"] == list(predicates):
+        return InformationContent.from_connection(con)
+    return InformationContent(compute_information_content(con, INTRINSIC, predicates))
+
+
+class InformationContent:
+    """
+    Lookup of stored IC
+    """
+
+    def __init__(self, ic: Dict[CURIE, float]):
+        self.ic = ic
+        # row of each node in values, for vectorized lookups
+        self.ids = sorted(ic)
+        self.values = array("d", [ic[n] for n in self.ids])
+        self._arrays = None
+
+    @classmethod
+    def from_connection(cls, con: sqlite3.Connection) -> "InformationContent":
+        """
+        :param con: connection to a db with stored IC
+        :return:
+        """
+        if not has_information_content(con):
+            raise ValueError("No information content stored; run build_information_content first")
+        return cls(dict(con.execute(f"SELECT id, information_content FROM {TABLE}")))
+
+    def __len__(self):
+        return len(self.ic)
+
+    def __getitem__(self, node: CURIE) -> float:
+        return self.ic[node]
+
+    def get(self, node: CURIE, default: Optional[float] = None) -> Optional[float]:
+        """
+        :param node:
+        :param default:
+        :return: IC of node, or default if it is not stored
+        """
+        return self.ic.get(node, default)
+
+    def lookup(self, nodes: Sequence[CURIE]):
+        """
+        Look up IC for many nodes at once
+
+        If nodes is a NumPy array, rows are found with a vectorized binary search and
+        a float array is returned, with NaN for missing nodes
+
+        :param nodes:
+        :return: IC for each node, None if it is not stored
+        """
+        if hasattr(nodes, "shape"):
+            import numpy as np
+
+            if not self.ids:
+                return np.full(len(nodes), np.nan)
+            if self._arrays is None:
+                self._arrays = np.array(self.ids), np.frombuffer(self.values, dtype="float64")
+            ids, values = self._arrays
+            nodes = np.asarray(nodes, dtype=str)
+            rows = np.minimum(np.searchsorted(ids, nodes), len(ids) - 1)
+            return np.where(ids[rows] == nodes, np.take(values, rows), np.nan)
+        get = self.ic.get
+        return [get(n) for n in nodes]
+
+    def most_informative(self, nodes: Sequence[CURIE]) -> Optional[CURIE]:
+        """
+        :param nodes:
+        :return: node with the highest IC, if any are stored
+        """
+        scored = [(self.ic[n], n) for n in nodes if n in self.ic]
+        return max(scored)[1] if scored else None
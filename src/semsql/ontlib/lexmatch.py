@@ -0,0 +1,269 @@
+"""
+Lexical matching of terms, e.g. across ontologies
+
+This replaces the ``match`` view in the nlp module, which self-joins
+processed_statement and is impractical on multi-ontology dbs. Labels and
+synonyms are read in a single scan of statements; each value is normalized and
+added to a hash index from normalized string to the entries that have it.
+Candidate matches are then emitted key by key, as SSSOM-style rows.
+
+Normalizers are functions from string to string, applied in order. Built-in
+normalizers are listed in NORMALIZERS; stemming requires nltk.
+"""
+import csv
+import dataclasses
+import functools
+import importlib.util
+import re
+import sqlite3
+import string
+from collections import defaultdict
+from dataclasses import astuple, dataclass
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    TextIO, Tuple, Union)
+
+from semsql.ontlib.common_queries import CURIE
+from semsql.prefixes import PrefixMap, curie_prefix
+
+Normalizer = Callable[[str], str]
+
+RDFS_LABEL = "rdfs:label"
+EXACT_SYNONYM = "oio:hasExactSynonym"
+DEFAULT_FIELDS = [RDFS_LABEL, EXACT_SYNONYM]
+EXACT_FIELDS = {RDFS_LABEL, EXACT_SYNONYM}
+EXACT_MATCH = "skos:exactMatch"
+CLOSE_MATCH = "skos:closeMatch"
+LEXICAL_MATCHING = "semapv:LexicalMatching"
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATION = str.maketrans(string.punctuation, " " * len(string.punctuation))
+
+
+def lowercase(s: str) -> str:
+    return s.lower()
+
+
+def collapse_whitespace(s: str) -> str:
+    return _WHITESPACE.sub(" ", s).strip()
+
+
+def remove_punctuation(s: str) -> str:
+    return collapse_whitespace(s.translate(_PUNCTUATION))
+
+
+@functools.lru_cache(maxsize=None)
+def _porter_stemmer():
+    from nltk.stem.porter import PorterStemmer
+
+    return PorterStemmer()
+
+
+@functools.lru_cache(maxsize=2**20)
+def stem_token(token: str) -> str:
+    """
+    :param token:
+    :return: Porter stem of a single token; memoized
+    """
+    return _porter_stemmer().stem(token)
+
+
+def stem(s: str) -> str:
+    return " ".join(stem_token(t) for t in s.split())
+
+
+def word_stem(s: str) -> str:
+    """
+    Stem tokens split with nltk word_tokenize, so that punctuation is separate from words
+
+    :param s:
+    :return:
+    """
+    from nltk.tokenize import word_tokenize
+
+    return " ".join(stem_token(t) for t in word_tokenize(s))
+
+
+NORMALIZERS: Dict[str, Normalizer] = {
+    "case": lowercase,
+    "whitespace": collapse_whitespace,
+    "punctuation": remove_punctuation,
+    "stem": stem,
+    "word_stem": word_stem,
+}
+DEFAULT_NORMALIZERS = ["case", "whitespace"]
+# optional modules needed by normalizers
+REQUIREMENTS = {"stem": "nltk", "word_stem": "nltk"}
+
+
+def get_normalizers(names: Iterable[Union[str, Normalizer]]) -> List[Normalizer]:
+    """
+    :param names: names in NORMALIZERS, or functions
+    :return: functions
+    :raises ValueError: if a name is unknown, or a module it needs is not installed
+    """
+    normalizers = []
+    for n in names:
+        if callable(n):
+            normalizers.append(n)
+        elif n in NORMALIZERS:
+            module = REQUIREMENTS.get(n)
+            if module is not None and importlib.util.find_spec(module) is None:
+                raise ValueError(f"The {n} normalizer requires {module}; install with: pip install semsql[nlp]")
+            normalizers.append(NORMALIZERS[n])
+        else:
+            raise ValueError(f"Unknown normalizer: {n}; must be one of {list(NORMALIZERS)}")
+    return normalizers
+
+
+@dataclass
+class LexicalMapping:
+    """
+    A candidate match, with SSSOM column names
+    """
+
+    subject_id: CURIE
+    subject_label: Optional[str]
+    predicate_id: CURIE
+    object_id: CURIE
+    object_label: Optional[str]
+    mapping_justification: CURIE
+    subject_source: str
+    object_source: str
+    subject_match_field: CURIE
+    object_match_field: CURIE
+    match_string: str
+
+
+class LexicalIndex:
+    """
+    Hash index from normalized strings to the terms that have them
+    """
+
+    def __init__(
+        self,
+        normalizers: Optional[Iterable[Union[str, Normalizer]]] = None,
+        prefix_map: Optional[PrefixMap] = None,
+    ):
+        """
+        :param normalizers: names in NORMALIZERS, or functions; defaults to case and whitespace
+        :param prefix_map: used to find the source of subjects that are not CURIEs
+        """
+        self.normalizers = get_normalizers(DEFAULT_NORMALIZERS if normalizers is None else normalizers)
+        self.prefix_map = prefix_map
+        self.index: Dict[str, List[Tuple[CURIE, CURIE]]] = defaultdict(list)
+        self.labels: Dict[CURIE, str] = {}
+
+    def source(self, subject: CURIE) -> str:
+        """
+        :param subject: CURIE, or <IRI>
+        :return: prefix of subject, or the IRI if it has none
+        """
+        if subject.startswith("<") and subject.endswith(">"):
+            iri = subject[1:-1]
+            curie = self.prefix_map.contract(iri) if self.prefix_map is not None else None
+            return curie_prefix(curie) if curie is not None else iri
+        return curie_prefix(subject) or subject
+
+    def normalize(self, value: str) -> str:
+        """
+        :param value:
+        :return: value with all normalizers applied
+        """
+        for fn in self.normalizers:
+            value = fn(value)
+        return value
+
+    def add(self, subject: CURIE, field: CURIE, value: str):
+        """
+        :param subject:
+        :param field: predicate the value is from, e.g. rdfs:label
+        :param value:
+        """
+        if field == RDFS_LABEL and subject not in self.labels:
+            self.labels[subject] = value
+        key = self.normalize(value)
+        if key:
+            self.index[key].append((subject, field))
+
+    @classmethod
+    def from_connection(
+        cls,
+        con: sqlite3.Connection,
+        fields: Optional[List[CURIE]] = None,
+        normalizers: Optional[Iterable[Union[str, Normalizer]]] = None,
+    ) -> "LexicalIndex":
+        """
+        :param con: connection to a semsql db
+        :param fields: predicates to index; defaults to labels and exact synonyms
+        :param normalizers:
+        :return: index of all named subjects
+        """
+        if fields is None:
+            fields = DEFAULT_FIELDS
+        index = cls(normalizers, PrefixMap.from_connection(con))
+        rows = con.execute(
+            f"SELECT subject, predicate, value FROM statements "
+            f"WHERE predicate IN ({','.join('?' * len(fields))}) "
+            f"AND value IS NOT NULL AND subject NOT LIKE '\\_:%' ESCAPE '\\'",
+            list(fields),
+        )
+        for subject, field, value in rows:
+            index.add(subject, field, value)
+        if RDFS_LABEL not in fields:
+            for subject, value in con.execute(
+                "SELECT subject, value FROM rdfs_label_statement ORDER BY subject, value"
+            ):
+                index.labels.setdefault(subject, value)
+        return index
+
+    def groups(self) -> Iterator[Tuple[str, List[Tuple[CURIE, CURIE]]]]:
+        """
+        :return: (key, entries) for each key shared by more than one subject
+        """
+        for key, entries in self.index.items():
+            if len({s for s, _ in entries}) > 1:
+                yield key, entries
+
+    def matches(self, same_source: bool = False) -> Iterator[LexicalMapping]:
+        """
+        Emit candidate matches, grouped by key
+
+        Each pair of subjects is emitted once for each pair of fields that matched,
+        with the lower CURIE as subject
+
+        :param same_source: if True, include matches between terms with the same prefix
+        :return:
+        """
+        labels = self.labels
+        for key, entries in self.groups():
+            entries = sorted(set(entries))
+            for i, (s, sf) in enumerate(entries):
+                s_source = self.source(s)
+                for o, of in entries[i + 1 :]:
+                    if o == s:
+                        continue
+                    o_source = self.source(o)
+                    if not same_source and o_source == s_source:
+                        continue
+                    predicate = EXACT_MATCH if sf in EXACT_FIELDS and of in EXACT_FIELDS else CLOSE_MATCH
+                    yield LexicalMapping(
+                        s, labels.get(s), predicate, o, labels.get(o), LEXICAL_MATCHING,
+                        s_source, o_source, sf, of, key,
+                    )
+
+
+def write_sssom(mappings: Iterable[LexicalMapping], output: TextIO) -> int:
+    """
+    Write mappings as SSSOM TSV, as they are generated
+
+    :param mappings:
+    :param output:
+    :return: number of mappings written
+    """
+    writer = csv.writer(output, delimiter="\t", lineterminator="\n")
+    writer.writerow([f.name for f in dataclasses.fields(LexicalMapping)])
+    n = 0
+    for m in mappings:
+        writer.writerow(["" if v is None else v for v in astuple(m)])
+        n += 1
+    return n
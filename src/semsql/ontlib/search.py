@@ -0,0 +1,248 @@
+"""
+Full text search index over labels, synonyms and definitions
+
+Two FTS5 tables are built from statements:
+
+- ``term_search_fts``, with the unicode61 tokenizer and prefix indexes, for
+  token and autocomplete (token prefix) queries, ranked with bm25
+- ``term_search_trigram``, with the trigram tokenizer, which SQLite uses to
+  answer ``value LIKE pattern`` queries, including patterns with a leading
+  ``%``, without scanning statements
+
+:func:`semsql.ontlib.common_queries.term_search` uses the index if it exists
+and is current. The index is a snapshot of statements: a checksum of the
+indexed statements is stored when it is built, and an index whose checksum no
+longer matches is not used for LIKE queries until it is rebuilt.
+"""
+import logging
+import re
+import sqlite3
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+FTS_TABLE = "term_search_fts"
+TRIGRAM_TABLE = "term_search_trigram"
+METADATA_TABLE = "term_search_metadata"
+CACHE_VIEW = "search_index_current"
+
+RDFS_LABEL = "rdfs:label"
+SYNONYM_FIELDS = ["oio:hasExactSynonym", "oio:hasBroadSynonym", "oio:hasNarrowSynonym", "oio:hasRelatedSynonym"]
+DEFINITION = "IAO:0000115"
+DEFAULT_FIELDS = [RDFS_LABEL] + SYNONYM_FIELDS + [DEFINITION]
+
+# fields of statements views used for term queries, by view table name
+VIEW_FIELDS: Dict[str, List[str]] = {
+    "rdfs_label_statement": [RDFS_LABEL],
+    "has_oio_synonym_statement": SYNONYM_FIELDS,
+    "has_synonym_statement": SYNONYM_FIELDS,
+    "has_exact_synonym_statement": ["oio:hasExactSynonym"],
+    "has_text_definition_statement": [DEFINITION],
+}
+
+TOKEN = "token"
+PREFIX = "prefix"
+LIKE = "like"
+MODES = [TOKEN, PREFIX, LIKE]
+
+DDL = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+    subject UNINDEXED, field UNINDEXED, value, tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5(
+    subject UNINDEXED, field UNINDEXED, value, tokenize='trigram'
+);
+CREATE TABLE {METADATA_TABLE} (
+    fields TEXT NOT NULL, row_count INTEGER NOT NULL, checksum INTEGER NOT NULL, built_at TEXT NOT NULL
+);
+"""
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchResult:
+    """
+    A matching value
+    """
+
+    subject: str
+    field: str
+    value: str
+    rank: float
+    """bm25 score; lower is better"""
+
+
+def has_search_index(con) -> bool:
+    """
+    :param con:
+    :return: True if the search index has been built
+    """
+    row = con.execute("SELECT 1 FROM sqlite_master WHERE name=?", (TRIGRAM_TABLE,)).fetchone()
+    return row is not None
+
+
+def _select_statements(fields: List[str]) -> str:
+    # all subjects, including blank nodes, as the statement views have them
+    return (
+        f"SELECT DISTINCT subject, predicate, value FROM statements "
+        f"WHERE predicate IN ({','.join('?' * len(fields))}) AND value IS NOT NULL"
+    )
+
+
+def _checksum(con, fields: List[str]) -> Tuple[int, int]:
+    """
+    :return: number of indexed statements, and an order-independent checksum of them
+    """
+    n = 0
+    checksum = 0
+    for row in con.execute(_select_statements(fields), list(fields)):
+        n += 1
+        checksum += zlib.crc32("\0".join(v or "" for v in row).encode("utf-8"))
+    return n, checksum
+
+
+def build_search_index(con: sqlite3.Connection, fields: Optional[List[str]] = None) -> int:
+    """
+    Build the search index, replacing any existing index, in a single transaction
+
+    :param con:
+    :param fields: predicates to index; defaults to labels, oio synonyms and definitions
+    :return: number of values indexed
+    """
+    if fields is None:
+        fields = DEFAULT_FIELDS
+    with con:
+        for table in [FTS_TABLE, TRIGRAM_TABLE, METADATA_TABLE]:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+        for stmt in DDL.split(";"):
+            if stmt.strip():
+                con.execute(stmt)
+        n = con.execute(
+            f"INSERT INTO {FTS_TABLE}(subject, field, value) {_select_statements(fields)}", list(fields)
+        ).rowcount
+        con.execute(f"INSERT INTO {TRIGRAM_TABLE}(subject, field, value) SELECT subject, field, value FROM {FTS_TABLE}")
+        for table in [FTS_TABLE, TRIGRAM_TABLE]:
+            con.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+        row_count, checksum = _checksum(con, fields)
+        con.execute(
+            f"INSERT INTO {METADATA_TABLE} VALUES (?,?,?,?)",
+            (" ".join(fields), row_count, checksum, datetime.now(timezone.utc).isoformat()),
+        )
+    logger.info(f"Indexed {n} values")
+    return n
+
+
+def drop_search_index(con: sqlite3.Connection):
+    """
+    :param con:
+    """
+    with con:
+        for table in [FTS_TABLE, TRIGRAM_TABLE, METADATA_TABLE]:
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def is_search_index_current(con) -> bool:
+    """
+    Check the index against the statements it was built from
+
+    This reads the indexed statements, so the result is cached for the current
+    version of the db file
+
+    :param con:
+    :return: True if the index exists and statements have not changed since it was built
+    """
+    from semsql.ontlib.cache import get_cache, get_connection_version
+
+    if not has_search_index(con):
+        return False
+    db_version = get_connection_version(con)
+    if db_version is not None:
+        found, current = get_cache().get(db_version, CACHE_VIEW, None)
+        if found:
+            return current
+    current = False
+    if con.execute("SELECT 1 FROM sqlite_master WHERE name=?", (METADATA_TABLE,)).fetchone():
+        row = con.execute(f"SELECT fields, row_count, checksum FROM {METADATA_TABLE}").fetchone()
+        if row is not None:
+            current = _checksum(con, row[0].split()) == (row[1], row[2])
+    if not current:
+        logger.warning("Search index is out of date; rebuild it with semsql search-index")
+    if db_version is not None:
+        get_cache().put(db_version, CACHE_VIEW, None, current)
+    return current
+
+
+def _match_expression(text: str, prefix: bool) -> Optional[str]:
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    phrases = [f'"{w}"' for w in words]
+    if prefix:
+        phrases[-1] += " *"
+    return " AND ".join(phrases)
+
+
+def search(
+    con,
+    text: str,
+    mode: str = TOKEN,
+    fields: Optional[List[str]] = None,
+    limit: Optional[int] = 20,
+) -> List[SearchResult]:
+    """
+    Search the index
+
+    - token: values containing all the words in text, in any order
+    - prefix: as token, with the last word treated as a prefix, for autocomplete
+    - like: values matching text as a SQL LIKE pattern, e.g. %limb%; case-insensitive
+
+    Token and prefix results are ranked with bm25; like results are in index order.
+    Results reflect statements when the index was built; see is_search_index_current
+
+    :param con: sqlite3 connection
+    :param text:
+    :param mode: one of MODES
+    :param fields: if set, only values for these predicates
+    :param limit: maximum results; None for all
+    :return:
+    """
+    if not has_search_index(con):
+        raise ValueError("No search index; run build_search_index first")
+    params: list = []
+    if mode == LIKE:
+        q = f"SELECT subject, field, value, 0.0 FROM {TRIGRAM_TABLE} WHERE value LIKE ?"
+        params.append(text)
+    elif mode in (TOKEN, PREFIX):
+        expr = _match_expression(text, mode == PREFIX)
+        if expr is None:
+            return []
+        q = f"SELECT subject, field, value, bm25({FTS_TABLE}) AS r FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?"
+        params.append(expr)
+    else:
+        raise ValueError(f"Unknown mode: {mode}; must be one of {MODES}")
+    if fields is not None:
+        q += f" AND field IN ({','.join('?' * len(fields))})"
+        params += list(fields)
+    if mode != LIKE:
+        q += " ORDER BY r"
+    if limit is not None:
+        q += f" LIMIT {int(limit)}"
+    return [SearchResult(*row) for row in con.execute(q, params)]
+
+
+def search_subjects(con, text: str, fields: Optional[List[str]] = None, mode: str = LIKE) -> List[str]:
+    """
+    :param con: sqlite3 connection
+    :param text: SQL LIKE pattern, or words for token and prefix modes
+    :param fields: if set, only values for these predicates
+    :param mode: one of MODES
+    :return: distinct subjects with a matching value, best match first for token and prefix modes
+    """
+    seen = {}
+    for r in search(con, text, mode, fields, limit=None):
+        seen.setdefault(r.subject, None)
+    return list(seen)
@@ -0,0 +1,193 @@
+"""
+Pairwise semantic similarity over ancestor sets
+
+Scores are computed from the sorted ancestor arrays of
+:class:`semsql.ontlib.subsumption.AncestorIndex`, in place of self-joins of
+entailed_edge:
+
+- jaccard_similarity: shared ancestors / union of ancestors
+- ancestor_information_content: IC of the MICA (Resnik similarity)
+- lin_similarity: 2 * IC(MICA) / (IC(node1) + IC(node2))
+- phenodigm_score: sqrt(jaccard_similarity * ancestor_information_content)
+
+Ancestors are reflexive. Results can be stored in the node_pairwise_similarity table.
+"""
+import heapq
+import itertools
+import math
+import sqlite3
+from dataclasses import astuple, dataclass, fields
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from semsql.ontlib.common_queries import CURIE
+from semsql.ontlib.subsumption import AncestorIndex
+
+TABLE = "node_pairwise_similarity"
+BATCH_SIZE = 10000
+
+DDL = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    node1 TEXT,
+    node2 TEXT,
+    ancestor_id TEXT,
+    ancestor_information_content FLOAT,
+    jaccard_similarity FLOAT,
+    lin_similarity FLOAT,
+    phenodigm_score FLOAT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS {TABLE}_node1_node2 ON {TABLE}(node1, node2);
+CREATE INDEX IF NOT EXISTS {TABLE}_node2 ON {TABLE}(node2);
+"""
+
+
+@dataclass
+class TermPairwiseSimilarity:
+    """
+    Similarity scores for a pair of nodes
+    """
+
+    node1: CURIE
+    node2: CURIE
+    ancestor_id: Optional[CURIE]
+    ancestor_information_content: float
+    jaccard_similarity: float
+    lin_similarity: float
+    phenodigm_score: float
+
+
+METRICS = [f.name for f in fields(TermPairwiseSimilarity)][3:]
+
+
+class SimilarityEngine:
+    """
+    Computes pairwise similarity scores from precomputed ancestor sets
+    """
+
+    def __init__(self, index: AncestorIndex):
+        self.index = index
+        self.graph = index.graph
+        curies = self.graph.curies
+        self.node_ic = [index.ic.get(curies[i], 0.0) for i in range(len(curies))]
+
+    @classmethod
+    def from_connection(
+        cls, con: sqlite3.Connection, predicates: Optional[List[CURIE]] = None
+    ) -> "SimilarityEngine":
+        """
+        Stored information content is used if it was computed for the same predicates
+
+        :param con: connection to a semsql db
+        :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+        :return:
+        """
+        return cls(AncestorIndex.from_connection(con, predicates))
+
+    def nodes(self) -> List[CURIE]:
+        """
+        :return: nodes with an information content, i.e. in the hierarchy
+        """
+        return sorted(self.index.ic)
+
+    def _scores(self, i: int, j: int) -> Tuple[int, float, float, float, float]:
+        shared = self.index.shared_ranks(i, j)
+        if not shared:
+            return -1, 0.0, 0.0, 0.0, 0.0
+        r = max(shared)
+        n = len(shared)
+        jaccard = n / (self.index.size(i) + self.index.size(j) - n)
+        ic = self.index.ic_by_rank[r]
+        denom = self.node_ic[i] + self.node_ic[j]
+        lin = 2 * ic / denom if denom else 0.0
+        return r, ic, jaccard, lin, math.sqrt(jaccard * ic)
+
+    def _result(self, i: int, j: int, scores: Tuple[int, float, float, float, float]) -> TermPairwiseSimilarity:
+        curies = self.graph.curies
+        r, ic, jaccard, lin, phenodigm = scores
+        mica = curies[self.index.by_rank[r]] if r >= 0 else None
+        return TermPairwiseSimilarity(curies[i], curies[j], mica, ic, jaccard, lin, phenodigm)
+
+    def pairwise_similarity(self, node1: CURIE, node2: CURIE) -> TermPairwiseSimilarity:
+        """
+        :param node1:
+        :param node2:
+        :return: scores for the pair
+        """
+        i, j = self.index.ids([node1, node2])
+        return self._result(i, j, self._scores(i, j))
+
+    def one_vs_many(self, node: CURIE, others: Iterable[CURIE]) -> Iterator[TermPairwiseSimilarity]:
+        """
+        :param node:
+        :param others:
+        :return: scores for node against each of others
+        """
+        i = self.graph.ids[node]
+        for j in self.index.ids(list(others)):
+            yield self._result(i, j, self._scores(i, j))
+
+    def all_vs_all(
+        self, nodes: Iterable[CURIE], others: Optional[Iterable[CURIE]] = None
+    ) -> Iterator[TermPairwiseSimilarity]:
+        """
+        :param nodes:
+        :param others: if not set, each unordered pair of distinct nodes is scored once
+        :return: scores for each pair
+        """
+        ids = self.index.ids(list(nodes))
+        if others is None:
+            pairs = itertools.combinations(ids, 2)
+        else:
+            pairs = itertools.product(ids, self.index.ids(list(others)))
+        for i, j in pairs:
+            yield self._result(i, j, self._scores(i, j))
+
+    def top_k(
+        self,
+        node: CURIE,
+        others: Optional[Iterable[CURIE]] = None,
+        k: int = 10,
+        metric: str = "phenodigm_score",
+    ) -> List[TermPairwiseSimilarity]:
+        """
+        :param node:
+        :param others: candidates; defaults to all nodes, excluding node itself
+        :param k:
+        :param metric: one of METRICS
+        :return: the k best scoring pairs, best first
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}; must be one of {METRICS}")
+        col = METRICS.index(metric) + 1
+        i = self.graph.ids[node]
+        if others is None:
+            candidates = (j for j in self.index.ids(self.nodes()) if j != i)
+        else:
+            candidates = self.index.ids(list(others))
+        best = heapq.nlargest(k, ((self._scores(i, j), j) for j in candidates), key=lambda x: x[0][col])
+        return [self._result(i, j, scores) for scores, j in best]
+
+
+def save_similarities(con: sqlite3.Connection, results: Iterable[TermPairwiseSimilarity]) -> int:
+    """
+    Store results in the node_pairwise_similarity table, creating it if needed
+
+    Existing rows for the same pair are replaced
+
+    :param con:
+    :param results:
+    :return: number of rows written
+    """
+    for stmt in DDL.split(";"):
+        if stmt.strip():
+            con.execute(stmt)
+    n = 0
+    sql = f"INSERT OR REPLACE INTO {TABLE} VALUES ({','.join('?' * len(fields(TermPairwiseSimilarity)))})"
+    results = iter(results)
+    while True:
+        batch = [astuple(r) for r in itertools.islice(results, BATCH_SIZE)]
+        if not batch:
+            break
+        con.executemany(sql, batch)
+        n += len(batch)
+    con.commit()
+    return n
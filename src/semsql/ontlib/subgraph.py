@@ -8,16 +8,17 @@ import shutil
 import subprocess
 import tempfile
 from enum import Enum, unique
-from typing import List
+from typing import Dict, List, Union
 
 import click
 import yaml
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from semsql.ontlib.common_queries import (CURIE, PREFIX_MAP, get_label,
-                                          get_prefixes, get_text_definition,
-                                          term_search)
+from semsql.ontlib import search
+from semsql.ontlib.common_queries import (CURIE, PREFIX_MAP, get_labels,
+                                          get_text_definitions, term_search)
+from semsql.prefixes import PrefixMap
 from semsql.sqla.relation_graph import (SubgraphEdgeByAncestor,
                                         SubgraphEdgeByAncestorOrDescendant,
                                         SubgraphEdgeByChild,
@@ -94,22 +95,25 @@ def extract_subgraph(
     return q
 
 
-def render_edge_as_string(session, e: Row) -> str:
+def render_edge_as_string(session, e: Row, labels: Dict[CURIE, str] = None) -> str:
     """
     :param session:
     :param e:
+    :param labels: pre-fetched labels; if not passed, labels for this edge are queried
     :return: String rendering of an edge
     """
-    sl = get_label(session, e.subject)
-    ol = get_label(session, e.object)
-    pl = get_label(session, e.predicate)
+    if labels is None:
+        labels = get_labels(session, [e.subject, e.predicate, e.object])
+    sl = labels.get(e.subject)
+    ol = labels.get(e.object)
+    pl = labels.get(e.predicate)
     return f'{e.subject} "{sl}" --[{e.predicate} "{pl}"]--> {e.object} "{ol}"'
 
 
 def edges_to_obograph(session, edge_rows: List[Row], definitions=False) -> OboGraphDict:
     """
     Convert a list of edges into a dict object following the OboGraphsJson standard;
-    the database will be iteratively queried to fetch labels, and optionally other metadata too
+    the database will be queried in bulk to fetch labels, and optionally other metadata too
 
     :param session:
     :param edge_rows:
@@ -127,11 +131,14 @@ def edges_to_obograph(session, edge_rows: List[Row], definitions=False) -> OboGr
         nodeids.add(e.subject)
         nodeids.add(e.predicate)
         nodeids.add(e.object)
+    labels = get_labels(session, nodeids)
+    if definitions:
+        defs = get_text_definitions(session, nodeids)
     for nid in nodeids:
-        n = {"id": nid, "lbl": get_label(session, nid)}
+        n = {"id": nid, "lbl": labels.get(nid)}
         nodes.append(n)
         if definitions:
-            val = get_text_definition(session, nid)
+            val = defs.get(nid)
             if val is not None:
                 n["meta"] = {"definition": {"val": val}}
 
@@ -189,14 +196,17 @@ def to_obo_format(g: OboGraphDict) -> None:
                     print(f"relationship: {p} {o}{cmt}")
 
 
-def to_markdown(g: OboGraphDict, prefixes: PREFIX_MAP = {}, definitions=True) -> None:
+def to_markdown(g: OboGraphDict, prefixes: Union[PREFIX_MAP, PrefixMap] = {}, definitions=True) -> None:
     """
     Serialization to markdown
 
     This should probably move elsewhere
     :param g:
+    :param prefixes: used to link ids
     :return:
     """
+    if not isinstance(prefixes, PrefixMap):
+        prefixes = PrefixMap(prefixes)
     eix = graph_to_subject_index(g)
     nix = {n["id"]: n for n in g["nodes"]}
     for n in g["nodes"]:
@@ -225,10 +235,9 @@ def to_markdown(g: OboGraphDict, prefixes: PREFIX_MAP = {}, definitions=True) ->
                 print(f"     * {plink} {olink} {cmt}")
 
 
-def _id_to_markdown_link(id: str, prefixes={}):
-    pfx, localid = id.split(":")
-    if pfx in prefixes:
-        url = f"{prefixes[pfx]}{localid}"
+def _id_to_markdown_link(id: str, prefixes: PrefixMap):
+    url = prefixes.expand(id)
+    if url is not None:
         return f"[{id}]({url})"
     else:
         return id
@@ -251,7 +260,7 @@ def render_edges(
     :param stylemap: used for graphviz rendering
     :return:
     """
-    prefixes = get_prefixes(session)
+    prefixes = PrefixMap.from_session(session)
     if to_format == "obojson":
         g = edges_to_obograph(session, edges, definitions=True)
         print(json.dumps(g))
@@ -311,8 +320,13 @@ def render_edges(
             subprocess.run(cmdtoks)
             subprocess.run(["open", pngfile])
     else:
+        edges = list(edges)
+        ids = set()
         for e in edges:
-            print(render_edge_as_string(session, e))
+            ids.update([e.subject, e.predicate, e.object])
+        labels = get_labels(session, ids)
+        for e in edges:
+            print(render_edge_as_string(session, e, labels=labels))
 
 
 def expand_predicate(p: str) -> CURIE:
@@ -371,6 +385,13 @@ def expand_predicate(p: str) -> CURIE:
     type=click.Choice(TERM_QUERY_VIEWS.keys()),
     help="how to match query input",
 )
+@click.option(
+    "-M",
+    "--search-mode",
+    default=search.LIKE,
+    type=click.Choice(search.MODES),
+    help="like: SQL LIKE patterns; token or prefix: words in any order, ranked (requires a search index)",
+)
 @click.option("-v", "--verbose", count=True)
 @click.argument("terms", nargs=-1)
 def cli(
@@ -380,6 +401,7 @@ def cli(
     anchor_predicates: str,
     to_format: str,
     match_criteria: str,
+    search_mode: str,
     view: str,
     stylemap: str,
     configure: str,
@@ -396,6 +418,9 @@ def cli(
     \b
         List all edges for subjects whose label starts 'nucle' (e.g. nucleus)
             $ subgraph-d tests/inputs/go-nucleus.db -m label nucle%
+    \b
+        As above, with a ranked autocomplete query (requires semsql search-index)
+            $ subgraph-d tests/inputs/go-nucleus.db -m label -M prefix "nuclear env"
     \b
         Visualize subgraph seeded from terms matching a label:
             $ subgraph-d tests/inputs/go-nucleus.db -m label nucle% -f viz
@@ -417,7 +442,7 @@ def cli(
     Session = sessionmaker(bind=engine)
     session = Session()
     logger.info(f"QUERY: {terms}")
-    ids = term_search(session, terms, TERM_QUERY_VIEWS[match_criteria])
+    ids = term_search(session, terms, TERM_QUERY_VIEWS[match_criteria], mode=search_mode)
     logger.debug(f"SEED CURIES: {ids}")
     if to_format != "viz":
         if stylemap is not None:
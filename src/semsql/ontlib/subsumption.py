@@ -0,0 +1,285 @@
+"""
+Batch subsumption and most informative common ancestor (MICA) queries
+
+The ancestors of each node are precomputed from entailed_edge as a sorted
+array of ranks, where nodes are ranked in order of increasing information
+content (IC). The arrays are held in a single :class:`semsql.ontlib.graph.CSR`,
+so memory is proportional to the number of entailed edges. A node is not
+stored as its own ancestor; the reflexive case is tested separately.
+
+A subsumption test is a binary search of one node's ancestor ranks, and the
+MICA of two nodes is their shared ancestor with the highest rank.
+
+Batch methods take sequences of (x, y) pairs of node ids, as assigned by the
+:class:`semsql.ontlib.graph.OntologyGraph` the index was built from. If
+pairs are given as a NumPy array of shape (n, 2), results are returned as NumPy
+arrays and the batch is vectorized: for MICA, the smaller ancestor set of each
+pair is expanded and each ancestor looked up in the other node's with
+searchsorted. NumPy is not otherwise required.
+"""
+import bisect
+import sqlite3
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from semsql.ontlib.common_queries import CURIE
+from semsql.ontlib.graph import CSR, OntologyGraph
+from semsql.ontlib.information_content import get_information_content
+
+SUBCLASS_OF = "rdfs:subClassOf"
+NO_ANCESTOR = -1
+# pairs per step of a vectorized MICA batch, bounding the memory for expanded ancestor sets
+MICA_CHUNK_SIZE = 100000
+
+
+def _as_pairs(pairs) -> List[Tuple[int, int]]:
+    if hasattr(pairs, "tolist"):
+        pairs = pairs.tolist()
+    return [(int(x), int(y)) for x, y in pairs]
+
+
+def _wrap(pairs, values: list, dtype: str):
+    if hasattr(pairs, "shape"):
+        import numpy as np
+
+        return np.array(values, dtype=dtype)
+    return values
+
+
+class AncestorIndex:
+    """
+    Precomputed ancestor sets for fast batch subsumption and MICA queries
+    """
+
+    def __init__(
+        self,
+        graph: OntologyGraph,
+        ic: Dict[CURIE, float],
+        predicates: Optional[List[CURIE]] = None,
+    ):
+        """
+        :param graph:
+        :param ic: information content of each node, e.g. from semsql.ontlib.information_content
+        :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+        """
+        if predicates is None:
+            predicates = [SUBCLASS_OF]
+        self.graph = graph
+        self.ic = ic
+        pids = {graph.ids[p] for p in predicates if p in graph.ids}
+        n = len(graph.curies)
+        # in order of increasing IC, so the MICA is the highest ranked shared ancestor
+        ordered = sorted(range(n), key=lambda i: (ic.get(graph.curies[i], 0.0), i))
+        self.rank = [0] * n
+        for r, i in enumerate(ordered):
+            self.rank[i] = r
+        self.by_rank = ordered
+        self.ic_by_rank = [ic.get(graph.curies[i], 0.0) for i in ordered]
+        rank = self.rank
+        self.ancestor_ranks = CSR.from_pairs(
+            n,
+            ((i, rank[t]) for i in range(n) for _, t in graph.out_entailed.neighbors(i, pids) if t != i),
+        )
+        self._numpy = None
+
+    @classmethod
+    def from_connection(cls, con: sqlite3.Connection, predicates: Optional[List[CURIE]] = None) -> "AncestorIndex":
+        """
+        Stored information content is used if it was computed for the same predicates
+
+        :param con: connection to a semsql db
+        :param predicates: entailed edge predicates to follow; defaults to rdfs:subClassOf
+        :return:
+        """
+        ic = get_information_content(con, predicates).ic
+        return cls(OntologyGraph.from_connection(con), ic, predicates)
+
+    def ids(self, curies: Sequence[CURIE]) -> List[int]:
+        """
+        :param curies:
+        :return: node id for each CURIE
+        """
+        return [self.graph.ids[c] for c in curies]
+
+    def size(self, i: int) -> int:
+        """
+        :param i: node id
+        :return: number of reflexive ancestors
+        """
+        offsets = self.ancestor_ranks.offsets
+        return offsets[i + 1] - offsets[i] + 1
+
+    def _has_ancestor(self, x: int, r: int) -> bool:
+        offsets = self.ancestor_ranks.offsets
+        targets = self.ancestor_ranks.targets
+        hi = offsets[x + 1]
+        k = bisect.bisect_left(targets, r, offsets[x], hi)
+        return k < hi and targets[k] == r
+
+    def shared_ranks(self, x: int, y: int) -> Set[int]:
+        """
+        :param x: node id
+        :param y: node id
+        :return: ranks of the reflexive ancestors shared by x and y
+        """
+        a = self.ancestor_ranks[x]
+        if x == y:
+            shared = set(a)
+            shared.add(self.rank[x])
+            return shared
+        b = self.ancestor_ranks[y]
+        if len(a) > len(b):
+            a, b = b, a
+        shared = set(a).intersection(b)
+        if self._has_ancestor(x, self.rank[y]):
+            shared.add(self.rank[y])
+        if self._has_ancestor(y, self.rank[x]):
+            shared.add(self.rank[x])
+        return shared
+
+    def _decode(self, ranks) -> Set[CURIE]:
+        curies = self.graph.curies
+        by_rank = self.by_rank
+        return {curies[by_rank[r]] for r in ranks}
+
+    def ancestors(self, node: CURIE) -> Set[CURIE]:
+        """
+        :param node:
+        :return: reflexive ancestors
+        """
+        i = self.graph.ids[node]
+        return self._decode(self.ancestor_ranks[i]) | {node}
+
+    def common_ancestors(self, x: CURIE, y: CURIE) -> Set[CURIE]:
+        """
+        :param x:
+        :param y:
+        :return: reflexive ancestors shared by x and y
+        """
+        ids = self.graph.ids
+        return self._decode(self.shared_ranks(ids[x], ids[y]))
+
+    def _arrays(self):
+        import numpy as np
+
+        if self._numpy is None:
+            n = len(self.rank)
+            offsets = np.frombuffer(self.ancestor_ranks.offsets, dtype="int64")
+            targets = np.frombuffer(self.ancestor_ranks.targets, dtype="int32").astype("int64")
+            # each (node, ancestor rank) as node * n + rank; sorted, as rows and ranks within rows are
+            keys = np.repeat(np.arange(n, dtype="int64"), np.diff(offsets)) * n + targets
+            self._numpy = (
+                offsets,
+                targets,
+                keys,
+                np.array(self.rank, dtype="int64"),
+                np.array(self.by_rank, dtype="int64"),
+                np.array(self.ic_by_rank, dtype="float64"),
+            )
+        return self._numpy
+
+    def _has_ancestor_array(self, x, r):
+        import numpy as np
+
+        _, _, keys, _, _, _ = self._arrays()
+        if not len(keys):
+            return np.zeros(len(x), dtype="bool")
+        q = x * len(self.rank) + r
+        k = np.minimum(np.searchsorted(keys, q), len(keys) - 1)
+        return keys[k] == q
+
+    def _is_descendant_array(self, pairs):
+        import numpy as np
+
+        rank = self._arrays()[3]
+        pairs = np.asarray(pairs, dtype="int64")
+        x, y = pairs[:, 0], pairs[:, 1]
+        return (x == y) | self._has_ancestor_array(x, rank[y])
+
+    def _mica_ranks_array(self, x, y):
+        import numpy as np
+
+        offsets, targets, _, rank, _, _ = self._arrays()
+        # reflexive cases: y is x or one of its ancestors, or the other way round
+        best = np.full(len(x), -1, dtype="int64")
+        best = np.where((x == y) | self._has_ancestor_array(x, rank[y]), rank[y], best)
+        best = np.maximum(best, np.where(self._has_ancestor_array(y, rank[x]), rank[x], -1))
+        # expand the smaller ancestor set of each pair and test each against the other node
+        sizes_x = offsets[x + 1] - offsets[x]
+        sizes_y = offsets[y + 1] - offsets[y]
+        swap = sizes_x > sizes_y
+        a = np.where(swap, y, x)
+        b = np.where(swap, x, y)
+        sizes = np.minimum(sizes_x, sizes_y)
+        total = int(sizes.sum())
+        if total:
+            pair_ix = np.repeat(np.arange(len(x)), sizes)
+            starts = np.cumsum(sizes) - sizes
+            positions = offsets[a][pair_ix] + np.arange(total) - starts[pair_ix]
+            candidates = targets[positions]
+            shared = self._has_ancestor_array(b[pair_ix], candidates)
+            np.maximum.at(best, pair_ix[shared], candidates[shared])
+        return best
+
+    def _mica_array(self, pairs):
+        import numpy as np
+
+        _, _, _, _, by_rank, ic_by_rank = self._arrays()
+        pairs = np.asarray(pairs, dtype="int64").reshape(-1, 2)
+        best = np.concatenate(
+            [np.empty(0, dtype="int64")]
+            + [
+                self._mica_ranks_array(chunk[:, 0], chunk[:, 1])
+                for chunk in np.array_split(pairs, max(1, -(-len(pairs) // MICA_CHUNK_SIZE)))
+            ]
+        )
+        found = best >= 0
+        micas = np.where(found, by_rank[np.maximum(best, 0)], NO_ANCESTOR)
+        ics = np.where(found, ic_by_rank[np.maximum(best, 0)], 0.0)
+        return micas, ics
+
+    def is_descendant_batch(self, pairs):
+        """
+        Test subsumption for many pairs
+
+        :param pairs: (x, y) node id pairs
+        :return: for each pair, True if x is y or a descendant of y
+        """
+        if hasattr(pairs, "shape"):
+            return self._is_descendant_array(pairs)
+        rank = self.rank
+        has_ancestor = self._has_ancestor
+        return [x == y or has_ancestor(x, rank[y]) for x, y in _as_pairs(pairs)]
+
+    def mica_batch(self, pairs):
+        """
+        Find the most informative common ancestor for many pairs
+
+        :param pairs: (x, y) node id pairs
+        :return: MICA node ids (-1 if there is none), and their IC
+        """
+        if hasattr(pairs, "shape"):
+            return self._mica_array(pairs)
+        by_rank = self.by_rank
+        ic_by_rank = self.ic_by_rank
+        micas = []
+        ics = []
+        for x, y in _as_pairs(pairs):
+            shared = self.shared_ranks(x, y)
+            if not shared:
+                micas.append(NO_ANCESTOR)
+                ics.append(0.0)
+            else:
+                r = max(shared)
+                micas.append(by_rank[r])
+                ics.append(ic_by_rank[r])
+        return _wrap(pairs, micas, "int64"), _wrap(pairs, ics, "float64")
+
+    def mica(self, x: CURIE, y: CURIE) -> Optional[CURIE]:
+        """
+        :param x:
+        :param y:
+        :return: most informative common ancestor, if any
+        """
+        ids = self.graph.ids
+        (m,), _ = self.mica_batch([(ids[x], ids[y])])
+        return self.graph.curies[m] if m != NO_ANCESTOR else None
@@ -0,0 +1,203 @@
+"""
+CURIE expansion and contraction, shared by the loader, renderers and lexical tools
+
+IRIs are contracted with a longest-match trie over the bases in the prefix
+table, and CURIEs are expanded with a dict. Batch methods process whole columns
+(lists, NumPy arrays or Arrow arrays) at once, converting each distinct value
+only once. A PrefixMap is built once per db and cached, keyed on the version of
+the db file, so it is rebuilt if the db changes.
+"""
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+CURIE = str
+PREFIX_MAP = Dict[str, str]
+
+MAX_CACHE_SIZE = 1000000
+CACHE_VIEW = "prefix_map"
+
+
+class PrefixTrie:
+    """
+    Contracts IRIs to CURIEs using the longest matching base
+    """
+
+    def __init__(self, prefixes: PREFIX_MAP):
+        """
+        :param prefixes: mapping of prefix to base
+        """
+        self.root = {}
+        for prefix, base in prefixes.items():
+            node = self.root
+            for ch in base:
+                node = node.setdefault(ch, {})
+            node[None] = prefix
+        self._cache = {}
+
+    def longest_match(self, iri: str) -> Optional[Tuple[str, int]]:
+        """
+        :param iri:
+        :return: prefix, and length of its base, for the longest base that iri starts with
+        """
+        node = self.root
+        match = None
+        for i, ch in enumerate(iri):
+            node = node.get(ch)
+            if node is None:
+                break
+            if None in node:
+                match = (node[None], i + 1)
+        return match
+
+    def contract(self, iri: str) -> str:
+        """
+        :param iri:
+        :return: CURIE, or <IRI> if no prefix matches
+        """
+        curie = self._cache.get(iri)
+        if curie is not None:
+            return curie
+        match = self.longest_match(iri)
+        curie = f"{match[0]}:{iri[match[1]:]}" if match else f"<{iri}>"
+        if len(self._cache) >= MAX_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[iri] = curie
+        return curie
+
+
+def split_curie(curie: CURIE) -> Tuple[Optional[str], str]:
+    """
+    Split on the first colon
+
+    :param curie:
+    :return: prefix (None if there is no colon) and local id
+    """
+    prefix, sep, local = curie.partition(":")
+    if not sep:
+        return None, curie
+    return prefix, local
+
+
+def curie_prefix(curie: CURIE) -> Optional[str]:
+    """
+    :param curie:
+    :return: prefix, or None if there is no colon
+    """
+    return split_curie(curie)[0]
+
+
+def _map_column(values, fn):
+    """
+    Apply fn to each distinct value in a column, returning a column of the same kind
+
+    Nulls are passed through
+    """
+    memo = {None: None}
+
+    def _convert(items):
+        return [memo[v] if v in memo else memo.setdefault(v, fn(v)) for v in items]
+
+    if hasattr(values, "to_pylist"):
+        import pyarrow as pa
+
+        return pa.array(_convert(values.to_pylist()), type=pa.string())
+    if hasattr(values, "tolist"):
+        import numpy as np
+
+        return np.array(_convert(values.tolist()), dtype=object)
+    return _convert(values)
+
+
+class PrefixMap:
+    """
+    Bidirectional mapping between CURIEs and IRIs
+    """
+
+    def __init__(self, prefixes: PREFIX_MAP):
+        """
+        :param prefixes: mapping of prefix to base
+        """
+        self.prefixes = dict(prefixes)
+        self.trie = PrefixTrie(self.prefixes)
+
+    @classmethod
+    def from_connection(cls, con: sqlite3.Connection) -> "PrefixMap":
+        """
+        :param con: sqlite3 connection to a semsql db
+        :return: map of the prefix table, cached for the current version of the db
+        """
+        from semsql.ontlib.cache import get_cache, get_connection_version
+
+        db_version = get_connection_version(con)
+        if db_version is not None:
+            found, pm = get_cache().get(db_version, CACHE_VIEW, None)
+            if found:
+                return pm
+        pm = cls(read_prefixes(con))
+        if db_version is not None:
+            get_cache().put(db_version, CACHE_VIEW, None, pm)
+        return pm
+
+    @classmethod
+    def from_session(cls, session) -> "PrefixMap":
+        """
+        :param session: SQLAlchemy session
+        :return: map of the prefix table, cached for the current version of the db
+        """
+        from semsql.ontlib.cache import get_cache, get_db_version
+        from semsql.ontlib.common_queries import get_prefixes
+
+        db_version = get_db_version(session)
+        if db_version is not None:
+            found, pm = get_cache().get(db_version, CACHE_VIEW, None)
+            if found:
+                return pm
+        pm = cls(get_prefixes(session))
+        if db_version is not None:
+            get_cache().put(db_version, CACHE_VIEW, None, pm)
+        return pm
+
+    def expand(self, curie: CURIE) -> Optional[str]:
+        """
+        :param curie:
+        :return: IRI, or None if the prefix is not known
+        """
+        prefix, local = split_curie(curie)
+        base = self.prefixes.get(prefix)
+        return None if base is None else base + local
+
+    def contract(self, iri: str) -> Optional[CURIE]:
+        """
+        :param iri:
+        :return: CURIE using the longest matching base, or None if none matches
+        """
+        match = self.trie.longest_match(iri)
+        return f"{match[0]}:{iri[match[1]:]}" if match else None
+
+    def expand_all(self, curies):
+        """
+        :param curies: list, NumPy array or Arrow array
+        :return: IRIs (None where the prefix is not known), of the same kind as curies
+        """
+        return _map_column(curies, self.expand)
+
+    def contract_all(self, iris):
+        """
+        :param iris: list, NumPy array or Arrow array
+        :return: CURIEs (None where no base matches), of the same kind as iris
+        """
+        return _map_column(iris, self.contract)
+
+
+def read_prefixes(con: sqlite3.Connection) -> PREFIX_MAP:
+    """
+    :param con:
+    :return: mapping of prefix to base, from the prefix table
+    """
+    return {
+        prefix: base
+        for prefix, base in con.execute("SELECT prefix, base FROM prefix")
+        # some dbs have a header row from the TSV import
+        if prefix and base and prefix != "prefix"
+    }
+
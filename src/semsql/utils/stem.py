@@ -0,0 +1,131 @@
+"""
+Batch text transformations (e.g. stemming) of literal values
+
+Each distinct value in statements is transformed, and the result is written to
+the textual_transformation table, which the processed_statement view joins on.
+
+Values are streamed from the db in sorted order and transformed in chunks,
+optionally across a pool of worker processes. Each chunk is inserted with a
+single executemany and committed, so a run that is interrupted can be resumed;
+values that already have a row for the predicate are skipped. Transformations are the normalizers of
+:mod:`semsql.ontlib.lexmatch`; stemming is memoized per token.
+"""
+import itertools
+import logging
+import multiprocessing
+import os
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from semsql.ontlib.lexmatch import get_normalizers
+from semsql.sqla.nlp import TextualTransformation
+
+CHUNK_SIZE = 10000
+DEFAULT_TRANSFORMS = ["stem"]
+PREDICATE_PREFIX = "semsql_nlp:"
+
+logger = logging.getLogger(__name__)
+
+_worker_normalizers = None
+
+
+def default_predicate(transforms: List[str]) -> str:
+    """
+    :param transforms: names of normalizers
+    :return: predicate for textual_transformation rows, e.g. semsql_nlp:stem
+    """
+    return PREDICATE_PREFIX + "_".join(transforms)
+
+
+def _init_worker(transforms: List[str]):
+    global _worker_normalizers
+    _worker_normalizers = get_normalizers(transforms)
+
+
+def _transform_chunk(values: List[str]) -> List[Tuple[str, str]]:
+    results = []
+    for v in values:
+        t = v
+        for fn in _worker_normalizers:
+            t = fn(t)
+        results.append((v, t))
+    return results
+
+
+def _chunks(conn: Connection, predicate: str, chunk_size: int) -> Iterator[List[str]]:
+    # booleans are never text to be processed; see the processed_statement view
+    q = (
+        "SELECT DISTINCT value FROM statements AS s WHERE value IS NOT NULL "
+        "AND datatype IS NOT 'xsd:boolean' AND NOT EXISTS "
+        "(SELECT 1 FROM textual_transformation AS t WHERE t.subject = s.value AND t.predicate = :predicate) "
+        "ORDER BY value"
+    )
+    result = conn.execution_options(stream_results=True).execute(text(q), {"predicate": predicate})
+    while True:
+        rows = result.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield [r[0] for r in rows]
+
+
+def transform_values(
+    db: str,
+    transforms: Optional[List[str]] = None,
+    predicate: Optional[str] = None,
+    workers: int = 1,
+    chunk_size: int = CHUNK_SIZE,
+    resume: bool = True,
+) -> int:
+    """
+    Transform all distinct literal values, writing to textual_transformation
+
+    :param db: path to a semsql db
+    :param transforms: names of normalizers, applied in order; defaults to stem
+    :param predicate: predicate for the rows written; defaults to one derived from the transforms
+    :param workers: number of processes; 0 for one per CPU
+    :param chunk_size: values per chunk, and per commit
+    :param resume: if True, only values with no row for this predicate are transformed;
+                   if False, existing rows for the predicate are replaced
+    :return: number of values transformed
+    :raises ValueError: if a transform is unknown, or needs a module that is not installed
+    """
+    if transforms is None:
+        transforms = DEFAULT_TRANSFORMS
+    get_normalizers(transforms)
+    if predicate is None:
+        predicate = default_predicate(transforms)
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    table = TextualTransformation.__table__
+    engine = create_engine(f"sqlite:///{db}")
+    table.create(engine, checkfirst=True)
+    n = 0
+    with engine.connect() as conn:
+        if not resume:
+            with conn.begin():
+                conn.execute(table.delete().where(table.c.predicate == predicate))
+        insert = table.insert().prefix_with("OR IGNORE")
+        chunks = _chunks(conn, predicate, chunk_size)
+        if workers > 1:
+            # chunks are read in this thread, as the connection cannot be shared
+            pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(transforms,))
+            groups = iter(lambda: list(itertools.islice(chunks, workers)), [])
+            results = itertools.chain.from_iterable(pool.map(_transform_chunk, g) for g in groups)
+        else:
+            pool = None
+            _init_worker(transforms)
+            results = map(_transform_chunk, chunks)
+        try:
+            for batch in results:
+                rows = [{"subject": v, "predicate": predicate, "value": t} for v, t in batch]
+                with conn.begin():
+                    conn.execute(insert, rows)
+                n += len(rows)
+                logger.info(f"Transformed {n} values")
+        finally:
+            if pool is not None:
+                pool.terminate()
+    engine.dispose()
+    return n
@@ -0,0 +1,6 @@
+-- lookups by label
+SELECT *
+  FROM statements
+  WHERE value = 'nucleus';
+
+SELECT subject FROM entailed_edge WHERE object='GO:0005634';
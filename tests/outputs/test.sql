@@ -0,0 +1,88 @@
+
+DROP TABLE node_to_node_statement;
+CREATE VIEW node_to_node_statement AS SELECT * FROM statements WHERE object IS NOT NULL;
+
+DROP TABLE node_to_value_statement;
+CREATE VIEW node_to_value_statement AS SELECT * FROM statements WHERE value IS NOT NULL;
+
+DROP TABLE rdf_type_statement;
+CREATE VIEW rdf_type_statement AS SELECT * FROM statements WHERE predicate='rdf:type';
+
+DROP TABLE rdfs_subclass_of_statement;
+CREATE VIEW rdfs_subclass_of_statement AS SELECT * FROM statements WHERE predicate='rdfs:subClassOf';
+
+DROP TABLE rdfs_subclass_of_named_statement;
+CREATE VIEW rdfs_subclass_of_named_statement AS SELECT * FROM rdfs_subclass_of_statement WHERE object NOT LIKE '_:%';
+
+DROP TABLE rdfs_subproperty_of_statement;
+CREATE VIEW rdfs_subproperty_of_statement AS SELECT * FROM statements WHERE predicate='rdfs:subPropertyOf';
+
+DROP TABLE rdfs_label_statement;
+CREATE VIEW rdfs_label_statement AS SELECT * FROM statements WHERE predicate='rdfs:label';
+
+DROP TABLE rdfs_domain_statement;
+CREATE VIEW rdfs_domain_statement AS SELECT * FROM statements WHERE predicate='rdfs:domain';
+
+DROP TABLE rdfs_range_statement;
+CREATE VIEW rdfs_range_statement AS SELECT * FROM statements WHERE predicate='rdfs:range';
+
+DROP TABLE rdf_first_statement;
+CREATE VIEW rdf_first_statement AS SELECT * FROM statements WHERE predicate='rdf:first';
+
+DROP TABLE rdf_rest_statement;
+CREATE VIEW rdf_rest_statement AS SELECT * FROM statements WHERE predicate='rdf:rest';
+
+DROP TABLE rdf_rest_transitive_statement;
+CREATE VIEW rdf_rest_transitive_statement AS WITH RECURSIVE rdf_rest_transitive_statement
+             (
+                   subject, object
+             )
+             AS
+             (SELECT subject, object
+                FROM rdf_rest_statement
+               UNION ALL
+              SELECT
+                   rest.subject, rest_t.object
+                FROM rdf_rest_statement AS rest
+                JOIN rdf_rest_transitive_statement AS rest_t
+                  ON rest.object = rest_t.subject
+             )
+          SELECT * FROM rdf_rest_transitive_statement;
+
+DROP TABLE rdf_list_member_statement;
+CREATE VIEW rdf_list_member_statement AS SELECT
+     rest_t.subject,
+     f.object
+    FROM rdf_rest_transitive_statement AS rest_t JOIN rdf_first_statement AS f ON (rest_t.object = f.subject)
+    UNION
+    SELECT subject,object FROM rdf_first_statement;
+
+DROP TABLE node;
+CREATE VIEW node AS SELECT distinct(subject) AS id FROM statements UNION SELECT distinct(object) AS id FROM statements WHERE datatype IS NOT NULL;
+
+DROP TABLE blank_node;
+CREATE VIEW blank_node AS SELECT * FROM node WHERE id LIKE '_:%';
+
+DROP TABLE rdf_list_node;
+CREATE VIEW rdf_list_node AS SELECT distinct subject AS id from rdf_type_statement WHERE object = 'rdf:List';
+
+DROP TABLE iri_node;
+CREATE VIEW iri_node AS SELECT * FROM node WHERE id NOT LIKE '_:%';
+
+DROP TABLE class_node;
+CREATE VIEW class_node AS SELECT distinct subject AS id from rdf_type_statement WHERE object = 'owl:Class';
+
+DROP TABLE property_node;
+CREATE VIEW property_node AS SELECT distinct subject AS id from rdf_type_statement WHERE object = 'owl:Property';
+
+DROP TABLE named_individual_node;
+CREATE VIEW named_individual_node AS SELECT distinct subject AS id from rdf_type_statement WHERE object = 'owl:NamedIndividual';
+
+DROP TABLE count_of_predicates;
+CREATE VIEW count_of_predicates AS SELECT predicate AS element, count(*) AS count_value FROM statements GROUP BY predicate ORDER BY count_value DESC;
+
+DROP TABLE count_of_instantiated_classes;
+CREATE VIEW count_of_instantiated_classes AS SELECT object AS element, count(*) AS count_value FROM rdf_type_statement GROUP BY element ORDER BY count_value DESC;
+
+DROP TABLE count_of_subclasses;
+CREATE VIEW count_of_subclasses AS SELECT sc.object AS element, count(distinct sc.subject) AS count_value FROM rdfs_subclass_of_statement AS sc GROUP BY sc.object ORDER BY count_value DESC;
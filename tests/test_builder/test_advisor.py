@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from semsql.builder.advisor import (IndexAdvisor, advise_indexes,
+                                    read_query_log)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-advisor.db")
+QUERY_LOG = os.path.join(OUTPUT_DIR, "query-log.sql")
+
+
+class IndexAdvisorTestCase(unittest.TestCase):
+    """
+    Tests query plan driven index selection
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB, isolation_level=None)
+
+    def tearDown(self):
+        self.con.close()
+
+    def _indexes(self):
+        return {r[0] for r in self.con.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+
+    def test_query_log(self):
+        with open(QUERY_LOG, "w") as stream:
+            stream.write("-- lookups by label\n")
+            stream.write("SELECT *\n  FROM statements\n  WHERE value = 'nucleus';\n\n")
+            stream.write("SELECT subject FROM entailed_edge WHERE object='GO:0005634';\n")
+        queries = read_query_log(QUERY_LOG)
+        self.assertEqual(2, len(queries))
+        before = self._indexes()
+        proposals, issues = advise_indexes(self.con, queries, include_views=False)
+        self.assertEqual(["SCAN statements", "SCAN entailed_edge"], [i.detail for i in issues])
+        self.assertCountEqual(
+            [("statements", ("value",)), ("entailed_edge", ("object",))],
+            [(p.table, p.columns) for p in proposals],
+        )
+        for p in proposals:
+            self.assertGreater(p.benefit, 0.1)
+            self.assertEqual(1, p.queries_improved)
+        self.assertEqual(before, self._indexes())
+        advise_indexes(self.con, queries, include_views=False, apply=True)
+        self.assertEqual(before | {"statements_value", "entailed_edge_object"}, self._indexes())
+
+    def test_views(self):
+        proposals, issues = advise_indexes(self.con, max_indexes=1)
+        self.assertGreater(len(issues), 0)
+        self.assertEqual(("predicate", "object"), proposals[0].columns)
+
+    def test_cost(self):
+        self.con.execute("ANALYZE")
+        advisor = IndexAdvisor(self.con, [])
+        advisor.workload_costs()
+        scan = advisor.cost("SELECT * FROM statements WHERE value='nucleus'")
+        search = advisor.cost("SELECT * FROM statements WHERE subject='GO:0005634'")
+        self.assertEqual(advisor.table_rows("statements"), scan)
+        self.assertLess(search, scan / 10)
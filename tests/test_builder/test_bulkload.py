@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import unittest
+
+from click.testing import CliRunner
+
+from semsql.builder.bulkload import (PROFILES, build_db, get_profile,
+                                     profile_for_size)
+from semsql.builder.cli import main
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_OWL = os.path.join(DB_DIR, "go-nucleus.owl")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-bulkload.db")
+TEST_TSV = os.path.join(OUTPUT_DIR, "go-nucleus-relation-graph.tsv")
+
+
+class BulkLoadTestCase(unittest.TestCase):
+    """
+    Tests building a db in-process with bulk-load profiles
+    """
+
+    def setUp(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def test_profiles(self):
+        self.assertEqual("small", profile_for_size(1000).name)
+        self.assertEqual("large", profile_for_size(10**12).name)
+        profile = get_profile("medium", [SRC_OWL], page_size=4096, workers=None)
+        self.assertEqual(4096, profile.page_size)
+        self.assertEqual(PROFILES["medium"].cache_size, profile.cache_size)
+        self.assertEqual(8192, PROFILES["medium"].page_size)
+        with self.assertRaises(ValueError):
+            get_profile("huge", [SRC_OWL])
+
+    def test_build(self):
+        profile = get_profile("medium", [SRC_OWL], vacuum=True)
+        timings = build_db(TEST_DB, [SRC_OWL], profile=profile)
+        self.assertEqual(["create", "load", "closure", "index", "analyze", "vacuum"], list(timings))
+        self.assertFalse(os.path.exists(f"{TEST_DB}.tmp"))
+        con = sqlite3.connect(TEST_DB)
+        self.assertEqual(8192, con.execute("PRAGMA page_size").fetchone()[0])
+        tables = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        self.assertNotIn("statements_staging", tables)
+        self.assertIn("sqlite_stat1", tables)
+        indexes = [r[0] for r in con.execute("SELECT name FROM sqlite_master WHERE type='index'")]
+        self.assertIn("statements_spo", indexes)
+        self.assertIn("entailed_edge_spo", indexes)
+        src = sqlite3.connect(SRC_DB)
+        q = "SELECT COUNT(*) FROM statements WHERE subject != 'subject'"
+        self.assertEqual(src.execute(q).fetchone(), con.execute(q).fetchone())
+        q = "SELECT COUNT(*) FROM entailed_edge WHERE predicate='rdfs:subClassOf' AND subject='GO:0005634'"
+        self.assertEqual(src.execute(q).fetchone(), con.execute(q).fetchone())
+
+    def test_build_with_closure_tsv(self):
+        src = sqlite3.connect(SRC_DB)
+        rows = src.execute("SELECT subject, predicate, object FROM entailed_edge WHERE subject != 'subject'").fetchall()
+        src.close()
+        with open(TEST_TSV, "w") as stream:
+            stream.write("subject\tpredicate\tobject\n")
+            for row in rows:
+                stream.write("\t".join(row) + "\n")
+        # several batches
+        profile = get_profile("small", [SRC_OWL], batch_size=1000)
+        build_db(TEST_DB, [SRC_OWL], profile=profile, closure=TEST_TSV)
+        con = sqlite3.connect(TEST_DB)
+        self.assertEqual(len(rows), con.execute("SELECT COUNT(*) FROM entailed_edge").fetchone()[0])
+        self.assertEqual(0, con.execute("SELECT COUNT(*) FROM entailed_edge WHERE subject='subject'").fetchone()[0])
+        con.close()
+
+    def test_build_command(self):
+        result = CliRunner(mix_stderr=False).invoke(main, ["build", "-p", "small", TEST_DB, SRC_OWL])
+        self.assertEqual(0, result.exit_code, result.stderr)
+        self.assertIn("load\t", result.stdout)
+        self.assertIn("total\t", result.stdout)
+
+    def test_build_optional_phases(self):
+        timings = build_db(
+            TEST_DB,
+            [SRC_OWL],
+            profile=get_profile("small", [SRC_OWL]),
+            information_content=True,
+            search_index=True,
+        )
+        self.assertIn("information_content", timings)
+        self.assertIn("search_index", timings)
+        con = sqlite3.connect(TEST_DB)
+        (n,) = con.execute("SELECT COUNT(*) FROM information_content WHERE id='GO:0005634'").fetchone()
+        self.assertEqual(1, n)
+        (n,) = con.execute("SELECT COUNT(*) FROM term_search_fts WHERE term_search_fts MATCH 'nucleus'").fetchone()
+        self.assertGreater(n, 0)
+        con.close()
@@ -30,9 +30,27 @@ class TestCommandLineInterface(unittest.TestCase):
         self.assertIn("download", out)
         self.assertEqual(0, result.exit_code)
         self.assertEqual(0, self.runner.invoke(main, ["download", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["materialize", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["advise-indexes", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["generate-synthetic", "--help"]).exit_code)
         self.assertEqual(0, self.runner.invoke(main, ["make", "--help"]).exit_code)
         self.assertEqual(0, self.runner.invoke(main, ["query", "--help"]).exit_code)
         self.assertEqual(0, self.runner.invoke(main, ["view2table", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["closure", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["update-closure", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["build-all", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["load", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["build", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["stats", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["intern", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["index-closure", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["snapshot", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["similarity", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["information-content", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["lexmatch", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["nlp", "transform", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["search-index", "--help"]).exit_code)
+        self.assertEqual(0, self.runner.invoke(main, ["search", "--help"]).exit_code)
 
     def test_view2table(self):
         result = self.runner.invoke(main, ["view2table", TEST_DB])
@@ -0,0 +1,118 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from semsql.builder.closure import (ClosureEngine, compute_entailed_edges,
+                                   update_entailed_edges)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-closure.db")
+
+
+def _relation_graph_edges(con):
+    # the test db has a stray header row from the TSV import
+    return set(con.execute("SELECT * FROM entailed_edge WHERE subject != 'subject'"))
+
+
+class ClosureTestCase(unittest.TestCase):
+    """
+    Tests in-process entailed edge computation against relation-graph output
+    """
+
+    def test_matches_relation_graph(self):
+        con = sqlite3.connect(SRC_DB)
+        expected = _relation_graph_edges(con)
+        engine = ClosureEngine.from_connection(con)
+        edges = set(engine.entailed_edges())
+        con.close()
+        self.assertEqual(expected, edges)
+        self.assertIn(("GO:0005634", "rdfs:subClassOf", "GO:0005634"), edges)
+        self.assertIn(("GO:0005634", "BFO:0000050", "CL:0000000"), edges)
+
+    def test_seeds(self):
+        con = sqlite3.connect(SRC_DB)
+        expected = {e for e in _relation_graph_edges(con) if e[0] == "GO:0031965"}
+        engine = ClosureEngine.from_connection(con)
+        con.close()
+        edges = set(engine.entailed_edges(seeds=["GO:0031965"]))
+        self.assertEqual(expected, edges)
+
+    def test_cycles(self):
+        engine = ClosureEngine()
+        engine.add_subclass("X:1", "X:2")
+        engine.add_subclass("X:2", "X:1")
+        engine.add_subclass("X:2", "X:3")
+        engine.add_existential("X:3", "P:1", "X:4")
+        engine.add_existential("X:4", "P:1", "X:3")
+        engine.transitive_properties.add("P:1")
+        edges = set(engine.entailed_edges())
+        self.assertIn(("X:1", "rdfs:subClassOf", "X:2"), edges)
+        self.assertIn(("X:2", "rdfs:subClassOf", "X:1"), edges)
+        self.assertIn(("X:1", "P:1", "X:3"), edges)
+        self.assertIn(("X:4", "P:1", "X:4"), edges)
+        self.assertNotIn(("X:3", "P:1", "X:1"), edges)
+
+    def test_compute_entailed_edges(self):
+        copyfile(SRC_DB, TEST_DB)
+        n = compute_entailed_edges(TEST_DB)
+        con = sqlite3.connect(TEST_DB)
+        self.assertEqual(n, con.execute("SELECT COUNT(*) FROM entailed_edge").fetchone()[0])
+        con.close()
+
+
+class IncrementalClosureTestCase(unittest.TestCase):
+    """
+    Tests incremental maintenance of entailed edges against full recomputation
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        compute_entailed_edges(TEST_DB)
+
+    def _check_consistent(self):
+        con = sqlite3.connect(TEST_DB)
+        actual = set(con.execute("SELECT * FROM entailed_edge"))
+        expected = set(ClosureEngine.from_connection(con).entailed_edges())
+        con.close()
+        self.assertEqual(expected, actual)
+        return actual
+
+    def test_remove_and_add_subclass(self):
+        removed = [
+            ("GO:0005634", "GO:0005634", "rdfs:subClassOf", "GO:0043231", None, None, None)
+        ]
+        added = [
+            {"stanza": "GO:0005634", "subject": "GO:0005634",
+             "predicate": "rdfs:subClassOf", "object": "GO:0043226"},
+        ]
+        n_ins, n_del = update_entailed_edges(TEST_DB, added=added, removed=removed)
+        self.assertGreater(n_del, 0)
+        edges = self._check_consistent()
+        self.assertNotIn(("GO:0005634", "rdfs:subClassOf", "GO:0043231"), edges)
+        self.assertNotIn(("GO:0031965", "rdfs:subClassOf", "GO:0043231"), edges)
+        self.assertIn(("GO:0005634", "rdfs:subClassOf", "GO:0043226"), edges)
+
+    def test_add_existential(self):
+        added = [
+            ("GO:0016020", "GO:0016020", "rdfs:subClassOf", "_:new1", None, None, None),
+            ("GO:0016020", "_:new1", "owl:onProperty", "BFO:0000050", None, None, None),
+            ("GO:0016020", "_:new1", "owl:someValuesFrom", "GO:0005634", None, None, None),
+        ]
+        update_entailed_edges(TEST_DB, added=added)
+        edges = self._check_consistent()
+        self.assertIn(("GO:0031965", "BFO:0000050", "GO:0005634"), edges)
+        self.assertIn(("GO:0016020", "BFO:0000050", "GO:0043231"), edges)
+
+    def test_non_axiom_change(self):
+        added = [("GO:0005634", "GO:0005634", "rdfs:comment", None, "x", "xsd:string", None)]
+        self.assertEqual((0, 0), update_entailed_edges(TEST_DB, added=added))
+
+    def test_property_change(self):
+        removed = [("BFO:0000050", "BFO:0000050", "rdf:type", "owl:TransitiveProperty", None, None, None)]
+        n_ins, n_del = update_entailed_edges(TEST_DB, removed=removed)
+        self.assertGreater(n_del, 0)
+        self._check_consistent()
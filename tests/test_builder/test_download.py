@@ -0,0 +1,203 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from semsql.builder.download import (ChecksumError, download_many,
+                                     download_obo_sqlite, download_url,
+                                     metadata_path, report)
+from semsql.builder.registry.registry_schema import Ontology
+from semsql.builder.scheduler import DOWNLOAD, BuildScheduler
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-download.db")
+DOWNLOAD_DIR = os.path.join(OUTPUT_DIR, "downloads")
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    Serves gzipped files from memory, with support for ranges and conditional requests
+    """
+
+    files = {}
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        data = self.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        rng = self.headers.get("Range")
+        if rng and self.headers.get("If-Range") == ETAG:
+            start = int(rng.split("=")[1].rstrip("-"))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloadTestCase(unittest.TestCase):
+    """
+    Tests streaming download against a local HTTP server
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        with open(SRC_DB, "rb") as stream:
+            cls.content = stream.read()
+        cls.sha256 = hashlib.sha256(cls.content).hexdigest()
+        cls.gz = gzip.compress(cls.content)
+        Handler.files = {"/go-nucleus.db.gz": cls.gz, "/truncated.db.gz": cls.gz[:-100]}
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        Handler.requests.clear()
+        for path in [TEST_DB, metadata_path(TEST_DB), f"{TEST_DB}.part", f"{TEST_DB}.gz.part"]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read(self):
+        with open(TEST_DB, "rb") as stream:
+            return stream.read()
+
+    def test_download_and_unchanged(self):
+        progress = []
+        r = download_obo_sqlite(
+            "go-nucleus",
+            TEST_DB,
+            base_url=self.base_url,
+            expected_sha256=self.sha256,
+            progress=lambda *args: progress.append(args),
+        )
+        self.assertEqual("downloaded", r.status)
+        self.assertEqual(self.content, self._read())
+        self.assertEqual(len(self.gz), r.bytes_transferred)
+        self.assertEqual(("go-nucleus", len(self.gz), len(self.gz)), progress[-1])
+        self.assertFalse(os.path.exists(f"{TEST_DB}.gz.part"))
+        r = download_obo_sqlite("go-nucleus", TEST_DB, base_url=self.base_url)
+        self.assertEqual("unchanged", r.status)
+        self.assertEqual(self.sha256, r.sha256)
+        self.assertEqual(ETAG, Handler.requests[-1][1]["If-None-Match"])
+        r = download_obo_sqlite("go-nucleus", TEST_DB, base_url=self.base_url, force=True)
+        self.assertEqual("downloaded", r.status)
+        # a db whose recorded checksum is not the expected one is fetched again
+        with open(metadata_path(TEST_DB)) as stream:
+            metadata = json.load(stream)
+        metadata["sha256"] = "0" * 64
+        with open(metadata_path(TEST_DB), "w") as stream:
+            json.dump(metadata, stream)
+        r = download_obo_sqlite("go-nucleus", TEST_DB, base_url=self.base_url, expected_sha256=self.sha256)
+        self.assertEqual("downloaded", r.status)
+        self.assertNotIn("If-None-Match", Handler.requests[-1][1])
+        self.assertEqual(self.sha256, r.sha256)
+
+    def test_resume(self):
+        with self.assertRaises(IOError):
+            download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        self.assertFalse(os.path.exists(TEST_DB))
+        # the server now has the full file under the same ETag
+        Handler.files["/truncated.db.gz"] = self.gz
+        r = download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        self.assertEqual("resumed", r.status)
+        self.assertEqual(100, r.bytes_transferred)
+        self.assertEqual(self.sha256, r.sha256)
+        self.assertEqual(self.content, self._read())
+        Handler.files["/truncated.db.gz"] = self.gz[:-100]
+
+    def test_resume_complete_part(self):
+        with self.assertRaises(IOError):
+            download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        Handler.files["/truncated.db.gz"] = self.gz
+        # the interrupted download had already received every byte
+        with open(f"{TEST_DB}.gz.part", "wb") as stream:
+            stream.write(self.gz)
+        r = download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        self.assertEqual("resumed", r.status)
+        self.assertEqual(0, r.bytes_transferred)
+        self.assertEqual(self.content, self._read())
+        self.assertFalse(os.path.exists(f"{TEST_DB}.gz.part"))
+        with open(metadata_path(TEST_DB)) as stream:
+            self.assertEqual(ETAG, json.load(stream)["etag"])
+        Handler.files["/truncated.db.gz"] = self.gz[:-100]
+
+    def test_resume_oversized_part(self):
+        with self.assertRaises(IOError):
+            download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        Handler.files["/truncated.db.gz"] = self.gz
+        with open(f"{TEST_DB}.gz.part", "ab") as stream:
+            stream.write(b"x" * 200)
+        r = download_obo_sqlite("truncated", TEST_DB, base_url=self.base_url)
+        self.assertEqual("downloaded", r.status)
+        self.assertEqual(len(self.gz), r.bytes_transferred)
+        self.assertEqual(self.content, self._read())
+        Handler.files["/truncated.db.gz"] = self.gz[:-100]
+
+    def test_checksum_mismatch(self):
+        with self.assertRaises(ChecksumError):
+            download_obo_sqlite(
+                "go-nucleus", TEST_DB, base_url=self.base_url, expected_sha256="0" * 64
+            )
+        self.assertFalse(os.path.exists(TEST_DB))
+
+    def test_download_many(self):
+        results = download_many(
+            ["go-nucleus", "no-such-ontology"], DOWNLOAD_DIR, jobs=2, base_url=self.base_url
+        )
+        self.assertEqual(["downloaded", "failed"], [r.status for r in results])
+        self.assertEqual(self.sha256, results[0].sha256)
+        self.assertIn("no-such-ontology\tfailed", report(results))
+        shutil.rmtree(DOWNLOAD_DIR)
+
+    def test_registry_download(self):
+        Handler.files["/test.owl"] = b"<rdf:RDF/>"
+        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+        path = os.path.join(DOWNLOAD_DIR, "test.owl")
+        r = download_url("test", f"{self.base_url}/test.owl", path)
+        self.assertEqual("downloaded", r.status)
+        os.utime(path, (0, 0))
+        ont = Ontology(id="test", url=f"{self.base_url}/test.owl")
+        sched = BuildScheduler([ont], directory=DOWNLOAD_DIR)
+        # an existing file is checked with a conditional request, and kept if unchanged
+        self.assertTrue(sched.run_stage(ont, DOWNLOAD))
+        self.assertEqual(ETAG, Handler.requests[-1][1]["If-None-Match"])
+        self.assertEqual(0, os.path.getmtime(path))
+        Handler.files["/test.owl"] = b"<rdf:RDF></rdf:RDF>"
+        sched = BuildScheduler([ont], directory=DOWNLOAD_DIR, refresh=True)
+        self.assertTrue(sched.run_stage(ont, DOWNLOAD))
+        self.assertNotIn("If-None-Match", Handler.requests[-1][1])
+        with open(path, "rb") as stream:
+            self.assertEqual(b"<rdf:RDF></rdf:RDF>", stream.read())
+        shutil.rmtree(DOWNLOAD_DIR)
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from semsql.builder.interning import expand_db, intern_db, is_interned
+from semsql.sqla.semsql import RdfsLabelStatement
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-interned.db")
+NUCLEUS = "GO:0005634"
+
+QUERIES = [
+    "SELECT * FROM statements",
+    "SELECT * FROM edge",
+    "SELECT * FROM owl_subclass_of_some_values_from",
+    f"SELECT * FROM entailed_edge WHERE subject='{NUCLEUS}'",
+    f"SELECT * FROM statements WHERE object='{NUCLEUS}'",
+]
+
+
+def _results(con):
+    return [sorted(con.execute(q), key=str) for q in QUERIES]
+
+
+class InterningTestCase(unittest.TestCase):
+    """
+    Tests interned node storage
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB, isolation_level=None)
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_intern(self):
+        expected = _results(self.con)
+        size = os.path.getsize(TEST_DB)
+        counts = intern_db(self.con, vacuum=True)
+        self.assertTrue(is_interned(self.con))
+        self.assertEqual(len(expected[0]), counts["statements"])
+        self.assertLess(os.path.getsize(TEST_DB), size)
+        self.assertEqual(expected, _results(self.con))
+        session = sessionmaker(bind=create_engine(f"sqlite:///{TEST_DB}"))()
+        labels = [r.value for r in session.query(RdfsLabelStatement).filter(RdfsLabelStatement.subject == NUCLEUS)]
+        self.assertEqual(["nucleus"], labels)
+        session.close()
+        with self.assertRaises(ValueError):
+            intern_db(self.con)
+        expand_db(self.con)
+        self.assertFalse(is_interned(self.con))
+        self.assertEqual(expected, _results(self.con))
+
+    def test_bound_lookups_use_indexes(self):
+        intern_db(self.con)
+        for q in [
+            f"SELECT * FROM statements WHERE object='{NUCLEUS}'",
+            "SELECT * FROM rdf_type_statement WHERE object='owl:Class'",
+            "SELECT * FROM rdfs_label_statement WHERE value='nucleus'",
+            f"SELECT * FROM entailed_edge WHERE object='{NUCLEUS}'",
+        ]:
+            plan = [r[3] for r in self.con.execute(f"EXPLAIN QUERY PLAN {q}")]
+            self.assertFalse([p for p in plan if p.startswith("SCAN")], f"{q}: {plan}")
+
+    def test_insert_and_delete(self):
+        intern_db(self.con)
+        self.con.execute("INSERT INTO entailed_edge VALUES ('X:1', 'rdfs:subClassOf', ?)", (NUCLEUS,))
+        self.con.execute("INSERT INTO statements VALUES ('X:1', 'X:1', 'rdfs:label', NULL, 'x', NULL, NULL)")
+        self.assertEqual(
+            [("X:1", "rdfs:subClassOf", NUCLEUS)],
+            self.con.execute("SELECT * FROM entailed_edge WHERE subject='X:1'").fetchall(),
+        )
+        self.assertEqual(
+            [("x",)], self.con.execute("SELECT value FROM rdfs_label_statement WHERE subject='X:1'").fetchall()
+        )
+        self.con.execute("DELETE FROM entailed_edge WHERE subject='X:1'")
+        self.assertEqual([], self.con.execute("SELECT * FROM entailed_edge WHERE subject='X:1'").fetchall())
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from semsql.builder.intervals import (IntervalIndex, build_interval_index,
+                                      is_replaced, postorder,
+                                      replace_entailed_edge, runs)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-intervals.db")
+NUCLEUS = "GO:0005634"
+ORGANELLE = "GO:0043226"
+PART_OF = "BFO:0000050"
+SUBCLASS_OF = "rdfs:subClassOf"
+
+
+class IntervalsTestCase(unittest.TestCase):
+    """
+    Tests interval encoding of the closure
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB, isolation_level=None)
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_postorder_and_runs(self):
+        order = postorder(["a", "b", "c", "d"], {"a": ["b", "d"], "b": ["c"]})
+        self.assertEqual({"c": 0, "b": 1, "d": 2, "a": 3}, order)
+        self.assertEqual([(1, 3), (5, 5)], list(runs([3, 1, 2, 5, 2])))
+
+    def test_encoding(self):
+        counts = build_interval_index(self.con)
+        self.assertLess(counts["intervals"], counts["entailed_edges"] / 2)
+        expected = set(self.con.execute("SELECT * FROM entailed_edge"))
+        self.assertEqual(expected, set(self.con.execute("SELECT * FROM interval_entailed_edge")))
+        ix = IntervalIndex(self.con)
+        for node in [NUCLEUS, ORGANELLE]:
+            for predicates in [None, [SUBCLASS_OF], [PART_OF]]:
+                self.assertEqual(
+                    {o for s, p, o in expected if s == node and (predicates is None or p in predicates)},
+                    ix.ancestors(node, predicates),
+                )
+                self.assertEqual(
+                    {s for s, p, o in expected if o == node and (predicates is None or p in predicates)},
+                    ix.descendants(node, predicates),
+                )
+        self.assertTrue(ix.is_ancestor(ORGANELLE, NUCLEUS))
+        self.assertTrue(ix.is_ancestor(ORGANELLE, NUCLEUS, [SUBCLASS_OF]))
+        self.assertFalse(ix.is_ancestor(ORGANELLE, NUCLEUS, [PART_OF]))
+        self.assertFalse(ix.is_ancestor(NUCLEUS, ORGANELLE))
+
+    def test_replace(self):
+        expected = set(self.con.execute("SELECT * FROM entailed_edge"))
+        with self.assertRaises(ValueError):
+            replace_entailed_edge(self.con)
+        build_interval_index(self.con)
+        replace_entailed_edge(self.con)
+        self.assertTrue(is_replaced(self.con))
+        self.assertEqual(expected, set(self.con.execute("SELECT * FROM entailed_edge")))
+        with self.assertRaises(ValueError):
+            build_interval_index(self.con)
+        for i, column, node in [(0, "subject", NUCLEUS), (2, "object", ORGANELLE)]:
+            q = f"SELECT * FROM entailed_edge WHERE {column} = ?"
+            self.assertEqual({e for e in expected if e[i] == node}, set(self.con.execute(q, (node,))))
+            # lookups by subject and by object are both index searches, with no full scans
+            plan = [r[3] for r in self.con.execute(f"EXPLAIN QUERY PLAN {q}", (node,))]
+            scans = [step for step in plan if step.startswith("SCAN") and not step.startswith("SCAN r VIRTUAL")]
+            self.assertEqual([], scans, plan)
+            self.assertNotIn("SCAN r VIRTUAL TABLE INDEX 2:", plan, plan)
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from semsql.builder.materialize import (AccessPattern, MaterializedView,
+                                        dematerialize, get_materialized,
+                                        materialize, materialize_profile,
+                                        select_indexes)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-materialize.db")
+VIEWS = ["rdfs_label_statement", "owl_subclass_of_some_values_from", "edge", "rdf_list_member_statement"]
+
+
+class MaterializeTestCase(unittest.TestCase):
+    """
+    Tests materializing views as indexed tables
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB, isolation_level=None)
+
+    def tearDown(self):
+        self.con.close()
+
+    def _type(self, name):
+        return self.con.execute("SELECT type FROM sqlite_master WHERE name=?", (name,)).fetchone()[0]
+
+    def _rows(self, name):
+        return sorted(self.con.execute(f"SELECT * FROM {name}"), key=str)
+
+    def test_select_indexes(self):
+        indexes = select_indexes(
+            [
+                AccessPattern(("subject",)),
+                AccessPattern(("subject", "predicate"), ("object",)),
+                AccessPattern(("object",), ("subject",)),
+            ]
+        )
+        self.assertEqual([("subject", "predicate", "object"), ("object", "subject")], indexes)
+
+    def test_materialize_profile(self):
+        expected = {v: self._rows(v) for v in VIEWS}
+        counts = materialize_profile(self.con, "obo-default")
+        for v in VIEWS:
+            self.assertEqual("table", self._type(v))
+            self.assertEqual(expected[v], self._rows(v))
+            self.assertEqual(len(expected[v]), counts[v])
+        md = get_materialized(self.con)
+        self.assertEqual(
+            "subject,predicate,object;object,predicate,subject;predicate,subject,object",
+            md["edge"]["indexes"],
+        )
+        plan = self.con.execute(
+            "EXPLAIN QUERY PLAN SELECT value FROM rdfs_label_statement WHERE subject='GO:0005634'"
+        ).fetchall()
+        self.assertIn("COVERING INDEX rdfs_label_statement_subject_value", str(plan))
+        # refresh picks up changes to underlying statements
+        self.con.execute("DELETE FROM statements WHERE subject='GO:0005634' AND predicate='rdfs:label'")
+        counts = materialize_profile(self.con, "obo-default")
+        self.assertEqual(len(expected["rdfs_label_statement"]) - 1, counts["rdfs_label_statement"])
+        self.assertEqual(VIEWS, sorted(dematerialize(self.con), key=VIEWS.index))
+        for v in VIEWS:
+            self.assertEqual("view", self._type(v))
+        self.assertEqual({}, get_materialized(self.con))
+
+    def test_rollback(self):
+        with self.assertRaises(ValueError):
+            materialize(self.con, [MaterializedView("edge"), MaterializedView("no_such_view")])
+        self.assertEqual("view", self._type("edge"))
+        self.assertEqual({}, get_materialized(self.con))
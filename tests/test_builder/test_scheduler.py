@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+import unittest
+
+import semsql.builder.builder as builder
+from semsql.builder.scheduler import (CLOSURE, DB, DOWNLOAD, BuildScheduler,
+                                      parse_memory, report)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+REGISTRY = os.path.join(cwd, "../../src/semsql/builder/registry/ontologies.yaml")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+
+
+class SchedulerTestCase(unittest.TestCase):
+    """
+    Tests scheduling of registry builds, using a stand-in for the build commands
+    """
+
+    def setUp(self):
+        self.ontologies = list(builder.load_registry(REGISTRY).ontologies.values())
+
+    def test_parse_memory(self):
+        self.assertEqual(32 * 1024**3, parse_memory("32g"))
+        self.assertEqual(512 * 1024**2, parse_memory("512M"))
+        with self.assertRaises(ValueError):
+            parse_memory("lots")
+
+    def test_parallel_with_retries(self):
+        lock = threading.Lock()
+        state = {"running": 0, "max_running": 0, "failures": set()}
+
+        def runner(ont, stage):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(state["max_running"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+            # the first attempt at each closure for phenio fails
+            if ont.id == "phenio" and stage == CLOSURE and "phenio" not in state["failures"]:
+                state["failures"].add("phenio")
+                return False
+            return True
+
+        sched = BuildScheduler(self.ontologies, directory=OUTPUT_DIR, jobs=4, runner=runner)
+        results = sched.run()
+        self.assertEqual(len(self.ontologies) * 3 + 1, len(results))
+        self.assertLessEqual(state["max_running"], 4)
+        self.assertGreater(state["max_running"], 1)
+        phenio = [r for r in results if r.ontology == "phenio"]
+        self.assertEqual([DOWNLOAD, CLOSURE, CLOSURE, DB], [r.stage for r in phenio])
+        self.assertEqual(2, phenio[2].attempts)
+        self.assertTrue(all(r.success for r in phenio[2:]))
+        self.assertIn("phenio\tclosure\tFalse\t1", report(results))
+
+    def test_memory_limit(self):
+        lock = threading.Lock()
+        state = {"running": 0, "max_running": 0}
+
+        def runner(ont, stage):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(state["max_running"], state["running"])
+            time.sleep(0.01)
+            with lock:
+                state["running"] -= 1
+            return ont.id != "bero"
+
+        # only one stage fits at a time
+        sched = BuildScheduler(
+            self.ontologies[0:4],
+            directory=OUTPUT_DIR,
+            jobs=4,
+            max_memory=parse_memory("768m"),
+            retries=0,
+            native_closure=True,
+            runner=runner,
+        )
+        results = sched.run()
+        self.assertEqual(1, state["max_running"])
+        bero = [r for r in results if r.ontology == "bero"]
+        self.assertEqual(1, len(bero))
+        self.assertFalse(bero[0].success)
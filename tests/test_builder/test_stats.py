@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from click.testing import CliRunner
+
+from semsql.builder.cli import main
+from semsql.builder.stats import (analyze, has_statistics, index_stats,
+                                  predicate_stats)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-stats.db")
+
+
+class StatsTestCase(unittest.TestCase):
+    """
+    Tests reporting of db statistics
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB)
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_predicate_stats(self):
+        ps = {s.predicate: s for s in predicate_stats(self.con)}
+        n, subjects = self.con.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT subject) FROM statements WHERE predicate='rdfs:label'"
+        ).fetchone()
+        self.assertEqual(n, ps["rdfs:label"].rows)
+        self.assertEqual(subjects, ps["rdfs:label"].subjects)
+        edges = predicate_stats(self.con, "entailed_edge")
+        self.assertEqual("rdfs:subClassOf", edges[0].predicate)
+        self.assertGreaterEqual(edges[0].rows, edges[0].subjects)
+
+    def test_index_stats(self):
+        self.con.execute("DROP TABLE IF EXISTS sqlite_stat1")
+        self.assertFalse(has_statistics(self.con))
+        self.assertEqual([], index_stats(self.con))
+        analyze(self.con)
+        self.assertTrue(has_statistics(self.con))
+        by_index = {s.index: s for s in index_stats(self.con)}
+        spo = by_index["statements_spo"]
+        self.assertEqual(3, len(spo.rows_per_key))
+        # a subject lookup is much more selective than a predicate lookup
+        self.assertLess(spo.rows_per_key[0], by_index["statements_p"].rows_per_key[0])
+
+    def test_stats_command(self):
+        result = CliRunner(mix_stderr=False).invoke(main, ["stats", "--analyze", "-n", "3", TEST_DB])
+        self.assertEqual(0, result.exit_code, result.stderr)
+        self.assertIn("statements\trdfs:subClassOf", result.stdout)
+        self.assertIn("statements_spo", result.stdout)
@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import shutil
+import sqlite3
+import unittest
+
+from click.testing import CliRunner
+
+from semsql.builder.cli import main
+from semsql.utils.stem import transform_values
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-stem.db")
+PREDICATE = "semsql_nlp:case_punctuation"
+DISTINCT_VALUES = "SELECT COUNT(DISTINCT value) FROM statements WHERE datatype IS NOT 'xsd:boolean'"
+
+
+class TransformTestCase(unittest.TestCase):
+    """
+    Tests batch transformation of literal values
+    """
+
+    def setUp(self):
+        shutil.copyfile(SRC_DB, TEST_DB)
+
+    def _rows(self):
+        con = sqlite3.connect(TEST_DB)
+        rows = dict(con.execute("SELECT subject, value FROM textual_transformation WHERE predicate=?", (PREDICATE,)))
+        (expected,) = con.execute(DISTINCT_VALUES).fetchone()
+        con.close()
+        return rows, expected
+
+    def test_transform(self):
+        n = transform_values(TEST_DB, ["case", "punctuation"], chunk_size=100)
+        rows, expected = self._rows()
+        self.assertEqual(expected, n)
+        self.assertEqual(expected, len(rows))
+        self.assertEqual("p block element atom", rows["p-block element atom"])
+        self.assertEqual("nuclear envelope", rows["nuclear envelope"])
+        self.assertEqual(0, transform_values(TEST_DB, ["case", "punctuation"]))
+
+    def test_resume(self):
+        con = sqlite3.connect(TEST_DB)
+        # simulate a run interrupted after the first chunk
+        con.execute("CREATE TABLE textual_transformation (subject TEXT, predicate TEXT, value TEXT, "
+                    "PRIMARY KEY (subject, predicate, value))")
+        values = [r[0] for r in con.execute(
+            "SELECT DISTINCT value FROM statements WHERE value IS NOT NULL "
+            "AND datatype IS NOT 'xsd:boolean' ORDER BY value")]
+        # values below the last one written, e.g. added since, are still transformed
+        done = values[:100] + values[-1:]
+        con.executemany("INSERT INTO textual_transformation VALUES (?,?,?)", [(v, PREDICATE, v.lower()) for v in done])
+        con.commit()
+        con.close()
+        n = transform_values(TEST_DB, ["case", "punctuation"], chunk_size=100, workers=2)
+        rows, expected = self._rows()
+        self.assertEqual(expected - 101, n)
+        self.assertEqual(expected, len(rows))
+
+    def test_command(self):
+        result = CliRunner(mix_stderr=False).invoke(main, ["nlp", "transform", "-T", "case", TEST_DB])
+        self.assertEqual(0, result.exit_code, result.stderr)
+        self.assertIn("Transformed", result.stdout)
+
+    @unittest.skipIf(importlib.util.find_spec("nltk") is not None, "nltk is installed")
+    def test_missing_nltk(self):
+        result = CliRunner(mix_stderr=False).invoke(main, ["nlp", "transform", TEST_DB])
+        self.assertEqual(1, result.exit_code)
+        self.assertIsInstance(result.exception, SystemExit)
+        self.assertIn("pip install semsql[nlp]", result.stderr)
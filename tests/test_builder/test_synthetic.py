@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import unittest
+
+from semsql.builder.closure import ClosureEngine
+from semsql.builder.synthetic import SyntheticConfig, generate_db
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+TEST_DB = os.path.join(OUTPUT_DIR, "synthetic.db")
+
+
+class SyntheticTestCase(unittest.TestCase):
+    """
+    Tests generation of synthetic ontologies
+    """
+
+    def setUp(self):
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
+
+    def _count(self, con, view):
+        return con.execute(f"SELECT COUNT(*) FROM {view}").fetchone()[0]
+
+    def test_generate(self):
+        config = SyntheticConfig.for_statements(20000)
+        stats = generate_db(TEST_DB, config)
+        self.assertAlmostEqual(20000, stats["statements"], delta=2000)
+        con = sqlite3.connect(TEST_DB)
+        self.assertEqual(config.num_classes, self._count(con, "class_node"))
+        self.assertEqual(config.num_classes, self._count(con, "rdfs_label_statement") - 1)
+        # every class except the root has a named parent
+        self.assertEqual(
+            config.num_classes - 1,
+            self._count(con, "(SELECT DISTINCT subject FROM rdfs_subclass_of_named_statement)"),
+        )
+        self.assertGreater(self._count(con, "owl_subclass_of_some_values_from"), 0)
+        self.assertGreater(self._count(con, "has_exact_synonym_statement"), 0)
+        self.assertGreater(self._count(con, "has_text_definition_statement"), 0)
+        self.assertGreater(self._count(con, "axiom_dbxref_annotation"), 0)
+        self.assertEqual(stats["entailed_edges"], self._count(con, "entailed_edge"))
+        self.assertEqual(0, self._count(con, "entailed_edge_cycle WHERE subject != object"))
+        engine = ClosureEngine.from_connection(con)
+        self.assertEqual(stats["entailed_edges"], len(list(engine.entailed_edges())))
+        q = "SELECT * FROM statements ORDER BY subject, predicate, object, value"
+        rows = con.execute(q).fetchall()
+        con.close()
+        # deterministic for a given seed
+        os.remove(TEST_DB)
+        generate_db(TEST_DB, config, closure=False)
+        con = sqlite3.connect(TEST_DB)
+        self.assertEqual(rows, con.execute(q).fetchall())
+        con.close()
+        with self.assertRaises(FileExistsError):
+            generate_db(TEST_DB, config)
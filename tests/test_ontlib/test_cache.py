@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import unittest
+from shutil import copyfile
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from semsql.ontlib.cache import LookupCache, configure_cache, get_cache
+from semsql.ontlib.common_queries import get_label, get_labels, get_prefixes
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-cache.db")
+
+
+class LookupCacheTestCase(unittest.TestCase):
+    """
+    Tests the process-wide lookup cache
+    """
+
+    def setUp(self):
+        copyfile(SRC_DB, TEST_DB)
+        engine = create_engine(f"sqlite:///{TEST_DB}")
+        Session = sessionmaker(bind=engine)
+        self.session = Session()
+        configure_cache()
+
+    def tearDown(self):
+        self.session.close()
+        configure_cache()
+
+    def test_hits_and_misses(self):
+        cache = get_cache()
+        self.assertEqual("nucleus", get_label(self.session, "GO:0005634"))
+        self.assertEqual(1, cache.info().misses)
+        self.assertEqual("nucleus", get_label(self.session, "GO:0005634"))
+        self.assertEqual(1, cache.info().hits)
+        labels = get_labels(self.session, ["GO:0005634", "GO:0005575", "NO:SUCH_ID"])
+        self.assertEqual("nucleus", labels["GO:0005634"])
+        self.assertEqual(2, cache.info().hits)
+        self.assertIsNone(get_label(self.session, "NO:SUCH_ID"))
+        self.assertEqual(3, cache.info().hits)
+        self.assertIn("GO", get_prefixes(self.session))
+
+    def test_invalidation_on_change(self):
+        cache = get_cache()
+        self.assertEqual("nucleus", get_label(self.session, "GO:0005634"))
+        con = sqlite3.connect(TEST_DB)
+        con.execute(
+            "UPDATE statements SET value='cell nucleus' "
+            "WHERE subject='GO:0005634' AND predicate='rdfs:label'"
+        )
+        con.commit()
+        con.close()
+        # ensure mtime changes even on filesystems with coarse timestamps
+        st = os.stat(TEST_DB)
+        os.utime(TEST_DB, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual("cell nucleus", get_label(self.session, "GO:0005634"))
+        self.assertEqual(1, cache.info().invalidations)
+        self.assertEqual(1, cache.info().currsize)
+
+    def test_lru_and_ttl(self):
+        cache = LookupCache(maxsize=2)
+        v = ("x.db", 1)
+        cache.put(v, "t", "a", 1)
+        cache.put(v, "t", "b", 2)
+        cache.get(v, "t", "a")
+        cache.put(v, "t", "c", 3)
+        self.assertEqual((True, 1), cache.get(v, "t", "a"))
+        self.assertEqual((False, None), cache.get(v, "t", "b"))
+        cache = LookupCache(ttl=0)
+        cache.put(v, "t", "a", 1)
+        self.assertEqual((False, None), cache.get(v, "t", "a"))
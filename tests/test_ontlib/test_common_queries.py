@@ -4,7 +4,8 @@ import unittest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from semsql.ontlib.common_queries import term_search
+from semsql.ontlib.common_queries import (get_label, get_labels,
+                                          get_text_definitions, term_search)
 from semsql.sqla.semsql import RdfsLabelStatement
 
 cwd = os.path.abspath(os.path.dirname(__file__))
@@ -27,3 +28,13 @@ class CommonQueriesTestCase(unittest.TestCase):
 
         ids = term_search(self.session, ["%nucleus%"], RdfsLabelStatement)
         self.assertIn("GO:0005634", ids)
+
+    def test_bulk_lookups(self):
+        ids = ["GO:0005634", "GO:0005575", "BFO:0000050", "NO:SUCH_ID"]
+        labels = get_labels(self.session, ids, chunk_size=2)
+        self.assertEqual("nucleus", labels["GO:0005634"])
+        self.assertNotIn("NO:SUCH_ID", labels)
+        for id in ids[0:2]:
+            self.assertEqual(get_label(self.session, id), labels[id])
+        defs = get_text_definitions(self.session, ids)
+        self.assertTrue(defs["GO:0005634"].startswith("A membrane-bounded organelle"))
@@ -0,0 +1,84 @@
+import os
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from semsql.ontlib.graph import OntologyGraph
+from semsql.ontlib.subgraph import TRAVERSAL_VIEWS, extract_subgraph
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+SNAPSHOT = os.path.join(OUTPUT_DIR, "go-nucleus.closure")
+NUCLEUS = "GO:0005634"
+ORGANELLE = "GO:0043226"
+PART_OF = "BFO:0000050"
+SUBCLASS_OF = "rdfs:subClassOf"
+
+
+def _as_set(rows):
+    return {(r.subject, r.predicate, r.object, r.anchor_predicate, r.anchor_object) for r in rows}
+
+
+class OntologyGraphTestCase(unittest.TestCase):
+    """
+    Tests in-memory traversal against the SQL views
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = OntologyGraph.from_db(SRC_DB)
+
+    def setUp(self):
+        self.session = sessionmaker(bind=create_engine(f"sqlite:///{SRC_DB}"))()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_neighbors(self):
+        self.assertIn((SUBCLASS_OF, "GO:0043231"), self.graph.parents(NUCLEUS))
+        self.assertIn((SUBCLASS_OF, NUCLEUS), self.graph.children("GO:0043231"))
+        self.assertIn(ORGANELLE, self.graph.ancestors(NUCLEUS, [SUBCLASS_OF]))
+        self.assertNotIn(ORGANELLE, self.graph.ancestors(NUCLEUS, [PART_OF]))
+        self.assertIn(NUCLEUS, self.graph.descendants(ORGANELLE))
+        self.assertEqual([], self.graph.parents("X:1"))
+
+    def test_same_as_views(self):
+        for name, view in TRAVERSAL_VIEWS.items():
+            for terms, predicates, anchor_predicates in [
+                ([NUCLEUS], None, None),
+                ([NUCLEUS, ORGANELLE], [SUBCLASS_OF], None),
+                ([ORGANELLE], None, [SUBCLASS_OF, PART_OF]),
+            ]:
+                expected = _as_set(
+                    extract_subgraph(self.session, terms, predicates, anchor_predicates, view=view)
+                )
+                self.assertEqual(
+                    expected,
+                    _as_set(self.graph.extract_subgraph(terms, predicates, anchor_predicates, view=name)),
+                    f"{name} {terms}",
+                )
+                self.assertEqual(
+                    expected,
+                    _as_set(self.graph.extract_subgraph(terms, predicates, anchor_predicates, view=view)),
+                )
+        with self.assertRaises(ValueError):
+            self.graph.extract_subgraph([NUCLEUS], view="sideways")
+
+    def test_snapshot(self):
+        self.graph.save(SNAPSHOT)
+        snapshot = OntologyGraph.from_snapshot(SNAPSHOT)
+        self.assertEqual("nucleus", snapshot.label(NUCLEUS))
+        self.assertIsNone(snapshot.label("X:1"))
+        self.assertEqual(self.graph.parents(NUCLEUS), snapshot.parents(NUCLEUS))
+        self.assertEqual(self.graph.descendants(ORGANELLE), snapshot.descendants(ORGANELLE))
+        for name in TRAVERSAL_VIEWS:
+            self.assertEqual(
+                self.graph.extract_subgraph([NUCLEUS, ORGANELLE], view=name),
+                snapshot.extract_subgraph([NUCLEUS, ORGANELLE], view=name),
+            )
+        snapshot.close()
+        with self.assertRaises(ValueError):
+            OntologyGraph.from_snapshot(SRC_DB)
@@ -0,0 +1,92 @@
+import importlib.util
+import math
+import os
+import shutil
+import sqlite3
+import unittest
+
+from semsql.builder.closure import update_entailed_edges
+from semsql.ontlib.information_content import (TERM_ASSOCIATION,
+                                               InformationContent,
+                                               build_information_content,
+                                               compute_information_content,
+                                               get_information_content,
+                                               get_metadata)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-ic.db")
+NUCLEUS = "GO:0005634"
+ORGANELLE = "GO:0043226"
+INTRACELLULAR_ORGANELLE = "GO:0043229"
+MEMBRANE_BOUNDED_ORGANELLE = "GO:0043227"
+IMBO = "GO:0043231"
+
+
+class InformationContentTestCase(unittest.TestCase):
+    """
+    Tests storing and refreshing information content
+    """
+
+    def setUp(self):
+        shutil.copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB)
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_intrinsic(self):
+        n = build_information_content(self.con)
+        ic = InformationContent.from_connection(self.con)
+        self.assertEqual(n, len(ic))
+        self.assertEqual(compute_information_content(self.con), ic.ic)
+        self.assertGreater(ic[NUCLEUS], ic[ORGANELLE])
+        self.assertGreaterEqual(min(ic.ic.values()), 0.0)
+        self.assertEqual([ic[NUCLEUS], None], ic.lookup([NUCLEUS, "X:1"]))
+        self.assertEqual(NUCLEUS, ic.most_informative([NUCLEUS, ORGANELLE, "X:1"]))
+        self.assertEqual("intrinsic", get_metadata(self.con)["source"])
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy is not installed")
+    def test_lookup_array(self):
+        import numpy as np
+
+        build_information_content(self.con)
+        ic = InformationContent.from_connection(self.con)
+        values = ic.lookup(np.array([NUCLEUS, "X:1", ORGANELLE, "ZZZ:1"]))
+        self.assertEqual([ic[NUCLEUS], ic[ORGANELLE]], values[[0, 2]].tolist())
+        self.assertTrue(np.isnan(values[[1, 3]]).all())
+        self.assertTrue(np.isnan(InformationContent({}).lookup(np.array([NUCLEUS]))).all())
+
+    def test_term_association(self):
+        rows = [
+            ("a1", "gene:1", "enables", NUCLEUS),
+            ("a2", "gene:2", "enables", IMBO),
+            ("a3", "gene:3", "enables", ORGANELLE),
+            ("a4", "gene:3", "enables", NUCLEUS),
+        ]
+        self.con.executemany(f"INSERT INTO {TERM_ASSOCIATION}(id, subject, predicate, object) VALUES (?,?,?,?)", rows)
+        build_information_content(self.con, TERM_ASSOCIATION)
+        ic = InformationContent.from_connection(self.con)
+        self.assertAlmostEqual(0.0, ic[ORGANELLE])
+        self.assertAlmostEqual(-math.log2(2 / 3), ic[NUCLEUS])
+        self.assertAlmostEqual(-math.log2(3 / 3), ic[IMBO])
+        self.assertIsNone(ic.get("GO:0005737"))
+        # stored IC is used for the same predicates, whatever its source
+        self.assertEqual(ic.ic, get_information_content(self.con).ic)
+        self.assertNotEqual(ic.ic, get_information_content(self.con, ["BFO:0000050"]).ic)
+
+    def test_refresh_on_update(self):
+        build_information_content(self.con)
+        before = InformationContent.from_connection(self.con)
+        self.con.close()
+        removed = [(NUCLEUS, NUCLEUS, "rdfs:subClassOf", IMBO, None, None, None)]
+        added = [(NUCLEUS, NUCLEUS, "rdfs:subClassOf", ORGANELLE, None, None, None)]
+        update_entailed_edges(TEST_DB, added=added, removed=removed)
+        self.con = sqlite3.connect(TEST_DB)
+        after = InformationContent.from_connection(self.con)
+        # the nucleus and its descendants are no longer under IMBO
+        self.assertGreater(after[IMBO], before[IMBO])
+        build_information_content(self.con)
+        self.assertEqual(InformationContent.from_connection(self.con).ic, after.ic)
@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import sqlite3
+import unittest
+
+from semsql.ontlib.lexmatch import (CLOSE_MATCH, EXACT_MATCH, LexicalIndex,
+                                    write_sssom)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-lexmatch.db")
+NUCLEUS = "GO:0005634"
+
+
+class LexicalMatchTestCase(unittest.TestCase):
+    """
+    Tests lexical matching over labels and synonyms
+    """
+
+    def setUp(self):
+        shutil.copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB)
+        rows = [
+            ("X:1", "rdfs:label", "  Nucleus"),
+            ("X:2", "rdfs:label", "cell nucleus"),
+            ("X:2", "oio:hasRelatedSynonym", "NUCLEUS"),
+            ("X:3", "rdfs:label", "nucleus"),
+        ]
+        self.con.executemany(
+            "INSERT INTO statements(stanza, subject, predicate, value) VALUES (?,?,?,?)",
+            [(s, s, p, v) for s, p, v in rows],
+        )
+
+    def tearDown(self):
+        self.con.close()
+
+    def test_matches(self):
+        index = LexicalIndex.from_connection(self.con, ["rdfs:label", "oio:hasRelatedSynonym"])
+        matches = {(m.subject_id, m.object_id): m for m in index.matches()}
+        self.assertEqual(EXACT_MATCH, matches[(NUCLEUS, "X:1")].predicate_id)
+        self.assertEqual("nucleus", matches[(NUCLEUS, "X:1")].match_string)
+        self.assertEqual("  Nucleus", matches[(NUCLEUS, "X:1")].object_label)
+        self.assertEqual(CLOSE_MATCH, matches[(NUCLEUS, "X:2")].predicate_id)
+        self.assertEqual("cell nucleus", matches[(NUCLEUS, "X:2")].object_label)
+        self.assertNotIn(("X:1", "X:3"), matches)
+        matches = {(m.subject_id, m.object_id) for m in index.matches(same_source=True)}
+        self.assertIn(("X:1", "X:3"), matches)
+
+    def test_normalizers(self):
+        index = LexicalIndex.from_connection(self.con, normalizers=["whitespace"])
+        # "cell nucleus" is an exact synonym of the nucleus
+        self.assertEqual({"X:2", "X:3"}, {m.object_id for m in index.matches() if m.subject_id == NUCLEUS})
+        index = LexicalIndex.from_connection(
+            self.con, ["rdfs:label"], normalizers=["case", lambda s: s.replace("cell ", "")]
+        )
+        self.assertIn("X:2", {m.object_id for m in index.matches() if m.subject_id == NUCLEUS})
+        with self.assertRaises(ValueError):
+            LexicalIndex(["nope"])
+
+    def test_write_sssom(self):
+        out = io.StringIO()
+        n = write_sssom(LexicalIndex.from_connection(self.con).matches(), out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(n + 1, len(lines))
+        self.assertTrue(lines[0].startswith("subject_id\tsubject_label\tpredicate_id"))
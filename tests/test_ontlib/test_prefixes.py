@@ -0,0 +1,52 @@
+import os
+import sqlite3
+import unittest
+
+from semsql.ontlib.cache import get_cache
+from semsql.ontlib.subgraph import _id_to_markdown_link
+from semsql.prefixes import PrefixMap, split_curie
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+OBO = "http://purl.obolibrary.org/obo/"
+PREFIXES = {"obo": OBO, "GO": f"{OBO}GO_", "dcterms": "http://purl.org/dc/terms/"}
+
+
+class PrefixMapTestCase(unittest.TestCase):
+    """
+    Tests CURIE expansion and contraction
+    """
+
+    def setUp(self):
+        self.pm = PrefixMap(PREFIXES)
+
+    def test_contract_expand(self):
+        self.assertEqual("GO:0005634", self.pm.contract(f"{OBO}GO_0005634"))
+        self.assertEqual("obo:BFO_0000050", self.pm.contract(f"{OBO}BFO_0000050"))
+        self.assertIsNone(self.pm.contract("http://example.org/x"))
+        self.assertEqual(f"{OBO}GO_0005634", self.pm.expand("GO:0005634"))
+        self.assertIsNone(self.pm.expand("X:1"))
+        self.assertIsNone(self.pm.expand("nocolon"))
+        self.assertEqual(("dcterms", "a:b"), split_curie("dcterms:a:b"))
+        self.assertEqual("http://purl.org/dc/terms/a:b", self.pm.expand("dcterms:a:b"))
+
+    def test_batch(self):
+        curies = ["GO:1", "X:1", None, "GO:1"]
+        self.assertEqual([f"{OBO}GO_1", None, None, f"{OBO}GO_1"], self.pm.expand_all(curies))
+        self.assertEqual(curies[:1] + [None], self.pm.contract_all([f"{OBO}GO_1", "http://example.org/x"]))
+
+    def test_from_connection(self):
+        get_cache().clear()
+        con = sqlite3.connect(SRC_DB)
+        pm = PrefixMap.from_connection(con)
+        self.assertNotIn("prefix", pm.prefixes)
+        self.assertEqual("GO:0005634", pm.contract(f"{OBO}GO_0005634"))
+        self.assertIs(pm, PrefixMap.from_connection(con))
+        con.close()
+
+    def test_markdown_link(self):
+        self.assertEqual(f"[GO:1]({OBO}GO_1)", _id_to_markdown_link("GO:1", self.pm))
+        self.assertEqual("X:1", _id_to_markdown_link("X:1", self.pm))
+        self.assertEqual("_:b0", _id_to_markdown_link("_:b0", self.pm))
+        self.assertEqual("nocolon", _id_to_markdown_link("nocolon", self.pm))
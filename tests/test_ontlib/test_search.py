@@ -0,0 +1,88 @@
+import os
+import shutil
+import sqlite3
+import unittest
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from semsql.ontlib.common_queries import term_search
+from semsql.ontlib.search import (LIKE, PREFIX, TOKEN, build_search_index,
+                                  drop_search_index, has_search_index,
+                                  is_search_index_current, search)
+from semsql.sqla.semsql import HasOioSynonymStatement, RdfsLabelStatement
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-search.db")
+NUCLEUS = "GO:0005634"
+NUCLEAR_ENVELOPE = "GO:0005635"
+QUERIES = ["nucle%", "%envelope", "%MEMBRANE%", "nucleus", "no such term", "%", "blank%"]
+
+
+class SearchTestCase(unittest.TestCase):
+    """
+    Tests the full text search index
+    """
+
+    def setUp(self):
+        shutil.copyfile(SRC_DB, TEST_DB)
+        self.con = sqlite3.connect(TEST_DB)
+        self.session = sessionmaker(bind=create_engine(f"sqlite:///{TEST_DB}"))()
+
+    def tearDown(self):
+        self.session.close()
+        self.con.close()
+
+    def test_term_search(self):
+        """
+        term_search gives the same results with and without the index
+        """
+        expected = {q: set(term_search(self.session, [q], RdfsLabelStatement)) for q in QUERIES}
+        self.assertIn(NUCLEUS, expected["nucle%"])
+        build_search_index(self.con)
+        self.assertTrue(has_search_index(self.con))
+        for q in QUERIES:
+            self.assertEqual(expected[q], set(term_search(self.session, [q], RdfsLabelStatement)), q)
+        self.assertIn(NUCLEUS, term_search(self.session, ["cell nucleus"], HasOioSynonymStatement))
+
+    def test_term_search_modes(self):
+        with self.assertRaises(ValueError):
+            term_search(self.session, ["nuclear env"], RdfsLabelStatement, mode=PREFIX)
+        build_search_index(self.con)
+        ids = term_search(self.session, ["nuclear env"], RdfsLabelStatement, mode=PREFIX)
+        self.assertEqual(NUCLEAR_ENVELOPE, ids[0])
+        ids = term_search(self.session, ["envelope nuclear"], RdfsLabelStatement, mode=TOKEN)
+        self.assertEqual([NUCLEAR_ENVELOPE], ids)
+
+    def test_stale_index(self):
+        """
+        A search index is not used once statements change
+        """
+        build_search_index(self.con)
+        self.assertTrue(is_search_index_current(self.con))
+        with self.con:
+            self.con.execute("INSERT INTO statements(subject, predicate, value) VALUES ('X:1', 'rdfs:label', 'zzz')")
+        self.assertFalse(is_search_index_current(self.con))
+        self.assertEqual(["X:1"], term_search(self.session, ["zz%"], RdfsLabelStatement))
+        build_search_index(self.con)
+        self.assertTrue(is_search_index_current(self.con))
+
+    def test_search(self):
+        build_search_index(self.con)
+        results = search(self.con, "nuclear env", PREFIX)
+        self.assertEqual(NUCLEAR_ENVELOPE, results[0].subject)
+        self.assertEqual("nuclear envelope", results[0].value)
+        results = search(self.con, "envelope nuclear", TOKEN, fields=["rdfs:label"])
+        self.assertEqual({NUCLEAR_ENVELOPE}, {r.subject for r in results})
+        results = search(self.con, "%clear env%", LIKE, limit=None)
+        self.assertIn(NUCLEAR_ENVELOPE, {r.subject for r in results})
+        self.assertEqual([], search(self.con, "!!", TOKEN))
+        with self.assertRaises(ValueError):
+            search(self.con, "x", "nope")
+        drop_search_index(self.con)
+        self.assertFalse(has_search_index(self.con))
+        with self.assertRaises(ValueError):
+            search(self.con, "nucleus")
@@ -0,0 +1,76 @@
+import os
+import shutil
+import sqlite3
+import unittest
+
+from semsql.ontlib.similarity import (TABLE, SimilarityEngine,
+                                      save_similarities)
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+OUTPUT_DIR = os.path.join(cwd, "../outputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+TEST_DB = os.path.join(OUTPUT_DIR, "go-nucleus-similarity.db")
+NUCLEUS = "GO:0005634"
+CYTOPLASM = "GO:0005737"
+ORGANELLE = "GO:0043226"
+SUBCLASS_OF = "rdfs:subClassOf"
+
+
+class SimilarityTestCase(unittest.TestCase):
+    """
+    Tests similarity scores against set operations on entailed edges
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        con = sqlite3.connect(SRC_DB)
+        cls.engine = SimilarityEngine.from_connection(con)
+        con.close()
+
+    def _ancestors(self, node):
+        return self.engine.graph.ancestors(node, [SUBCLASS_OF]) | {node}
+
+    def test_pairwise_similarity(self):
+        ic = self.engine.index.ic
+        for x, y in [(NUCLEUS, CYTOPLASM), (NUCLEUS, ORGANELLE), (NUCLEUS, NUCLEUS)]:
+            sim = self.engine.pairwise_similarity(x, y)
+            a1, a2 = self._ancestors(x), self._ancestors(y)
+            self.assertAlmostEqual(len(a1 & a2) / len(a1 | a2), sim.jaccard_similarity)
+            self.assertAlmostEqual(max(ic[a] for a in a1 & a2), sim.ancestor_information_content)
+            self.assertAlmostEqual(ic[sim.ancestor_id], sim.ancestor_information_content)
+        self.assertEqual(ORGANELLE, self.engine.pairwise_similarity(NUCLEUS, ORGANELLE).ancestor_id)
+        self.assertAlmostEqual(1.0, self.engine.pairwise_similarity(NUCLEUS, NUCLEUS).lin_similarity)
+
+    def test_all_vs_all(self):
+        terms = [NUCLEUS, CYTOPLASM, ORGANELLE]
+        results = list(self.engine.all_vs_all(terms))
+        self.assertEqual(3, len(results))
+        results = list(self.engine.all_vs_all(terms, [NUCLEUS]))
+        self.assertEqual(3, len(results))
+        self.assertEqual([NUCLEUS] * 3, [r.node2 for r in results])
+        self.assertEqual(2, len(list(self.engine.one_vs_many(NUCLEUS, [CYTOPLASM, ORGANELLE]))))
+
+    def test_top_k(self):
+        for metric in ["jaccard_similarity", "phenodigm_score"]:
+            top = self.engine.top_k(NUCLEUS, k=5, metric=metric)
+            self.assertEqual(5, len(top))
+            scores = [getattr(r, metric) for r in top]
+            self.assertEqual(sorted(scores, reverse=True), scores)
+            everything = self.engine.one_vs_many(NUCLEUS, [n for n in self.engine.nodes() if n != NUCLEUS])
+            self.assertEqual(max(getattr(r, metric) for r in everything), scores[0])
+        with self.assertRaises(ValueError):
+            self.engine.top_k(NUCLEUS, metric="nope")
+
+    def test_save(self):
+        shutil.copyfile(SRC_DB, TEST_DB)
+        con = sqlite3.connect(TEST_DB)
+        results = list(self.engine.all_vs_all([NUCLEUS, CYTOPLASM, ORGANELLE]))
+        self.assertEqual(3, save_similarities(con, results))
+        save_similarities(con, results)
+        self.assertEqual(3, con.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0])
+        (mica,) = con.execute(
+            f"SELECT ancestor_id FROM {TABLE} WHERE node1=? AND node2=?", (NUCLEUS, ORGANELLE)
+        ).fetchone()
+        self.assertEqual(ORGANELLE, mica)
+        con.close()
@@ -0,0 +1,106 @@
+import importlib.util
+import os
+import random
+import sqlite3
+import unittest
+
+from semsql.ontlib.subsumption import NO_ANCESTOR, AncestorIndex
+
+cwd = os.path.abspath(os.path.dirname(__file__))
+DB_DIR = os.path.join(cwd, "../inputs")
+SRC_DB = os.path.join(DB_DIR, "go-nucleus.db")
+NUCLEUS = "GO:0005634"
+ORGANELLE = "GO:0043226"
+SUBCLASS_OF = "rdfs:subClassOf"
+
+
+class SubsumptionTestCase(unittest.TestCase):
+    """
+    Tests batch subsumption and MICA against the entailed edges
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        con = sqlite3.connect(SRC_DB)
+        cls.index = AncestorIndex.from_connection(con)
+        con.close()
+        cls.graph = cls.index.graph
+
+    def test_ancestors(self):
+        expected = self.graph.ancestors(NUCLEUS, [SUBCLASS_OF]) | {NUCLEUS}
+        self.assertEqual(expected, self.index.ancestors(NUCLEUS))
+
+    def test_size(self):
+        g = self.graph
+        pid = g.ids[SUBCLASS_OF]
+        # one rank per non-reflexive entailed edge
+        expected = sum(
+            1 for i in range(len(g.curies)) for _, t in g.out_entailed.neighbors(i, {pid}) if t != i
+        )
+        self.assertEqual(expected, len(self.index.ancestor_ranks))
+        i = g.ids[NUCLEUS]
+        self.assertEqual(len(self.index.ancestors(NUCLEUS)), self.index.size(i))
+
+    def test_reflexive(self):
+        g = self.graph
+        i, j = g.ids[NUCLEUS], g.ids[ORGANELLE]
+        self.assertEqual([True, True, True, False], self.index.is_descendant_batch([(i, i), (j, j), (i, j), (j, i)]))
+        self.assertEqual(ORGANELLE, self.index.mica(NUCLEUS, ORGANELLE))
+        self.assertEqual(ORGANELLE, self.index.mica(ORGANELLE, NUCLEUS))
+        self.assertEqual(self.index.ancestors(ORGANELLE), self.index.common_ancestors(NUCLEUS, ORGANELLE))
+        self.assertEqual(self.index.ancestors(NUCLEUS), self.index.common_ancestors(NUCLEUS, NUCLEUS))
+
+    def test_is_descendant_batch(self):
+        g = self.graph
+        nodes = [g.curies[i] for i in range(len(g.curies)) if g.curies[i].startswith("GO:")]
+        rng = random.Random(42)
+        pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(2000)]
+        pairs.append((NUCLEUS, ORGANELLE))
+        results = self.index.is_descendant_batch([(g.ids[x], g.ids[y]) for x, y in pairs])
+        for (x, y), result in zip(pairs, results):
+            expected = x == y or y in g.ancestors(x, [SUBCLASS_OF])
+            self.assertEqual(expected, result, f"{x} {y}")
+        self.assertTrue(results[-1])
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy is not installed")
+    def test_is_descendant_array(self):
+        import numpy as np
+
+        n = len(self.graph.curies)
+        rng = random.Random(3)
+        pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(2000)]
+        pairs += [(i, i) for i in range(10)]
+        results = self.index.is_descendant_batch(np.array(pairs))
+        self.assertEqual(self.index.is_descendant_batch(pairs), results.tolist())
+
+    @unittest.skipIf(importlib.util.find_spec("numpy") is None, "numpy is not installed")
+    def test_mica_array(self):
+        import numpy as np
+
+        n = len(self.graph.curies)
+        rng = random.Random(5)
+        pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(3000)]
+        pairs += [(i, i) for i in range(10)]
+        g = self.graph
+        pairs += [(g.ids[NUCLEUS], g.ids[ORGANELLE]), (g.ids[ORGANELLE], g.ids[NUCLEUS])]
+        micas, ics = self.index.mica_batch(np.array(pairs))
+        expected_micas, expected_ics = self.index.mica_batch(pairs)
+        self.assertEqual(expected_micas, micas.tolist())
+        self.assertEqual(expected_ics, ics.tolist())
+
+    def test_mica(self):
+        g = self.graph
+        ic = self.index.ic
+        nodes = [n for n in ic if n.startswith("GO:")]
+        rng = random.Random(7)
+        pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(500)]
+        micas, ics = self.index.mica_batch([(g.ids[x], g.ids[y]) for x, y in pairs])
+        for (x, y), m, m_ic in zip(pairs, micas, ics):
+            common = (g.ancestors(x, [SUBCLASS_OF]) | {x}) & (g.ancestors(y, [SUBCLASS_OF]) | {y})
+            self.assertEqual(common, self.index.common_ancestors(x, y))
+            if not common:
+                self.assertEqual(NO_ANCESTOR, m)
+                continue
+            self.assertIn(g.curies[m], common)
+            self.assertEqual(max(ic[a] for a in common), m_ic)
+        self.assertEqual(NUCLEUS, self.index.mica(NUCLEUS, NUCLEUS))
@@ -1,39 +1,26 @@
 import click
-from nltk.stem import PorterStemmer
-from nltk.tokenize import word_tokenize
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 
-from src.semsql.sqla import Statements, TextualTransformation
-
-ps = PorterStemmer()
-
-
-def stem(s: str):
-    toks = word_tokenize(s)
-    toks = [ps.stem(tok) for tok in toks]
-    return " ".join(toks)
+from semsql.utils.stem import transform_values
 
 
 @click.command()
 @click.argument("inputs", nargs=-1)
 def cli(inputs):
+    """
+    Stems all literal values into textual_transformation, with predicate stem
+
+    Kept for compatibility; values are tokenized with nltk word_tokenize and
+    written with predicate "stem", as before. This is the same as:
+
+        semsql nlp transform -T word_stem --predicate stem DB
+
+    The default for semsql nlp transform (-T stem) instead splits on whitespace
+    and writes predicate semsql_nlp:stem; queries on processed_statement or
+    textual_transformation that filter on "stem" must be changed to use it.
+    Boolean values are no longer stemmed.
+    """
     for db in inputs:
-        engine = create_engine(f"sqlite:///{db}")
-        Session = sessionmaker(bind=engine)
-        session = Session()
-        for row in (
-            session.query(Statements.value)
-            .where(Statements.value.isnot(None))
-            .distinct()
-        ):
-            s = row.value
-            tv = stem(s)
-            tt = TextualTransformation(subject=s, predicate="stem", value=tv)
-            session.add(tt)
-            # print(tt)
-            # session.flush()
-        session.commit()
+        transform_values(db, ["word_stem"], predicate="stem")
 
 
 if __name__ == "__main__":